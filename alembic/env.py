@@ -15,6 +15,11 @@ from alembic import context
 # Import SQLModel metadata from the application
 from symbiosis.database import metadata
 
+# Import the table models so they're registered with the metadata
+import symbiosis.catalog.models  # noqa: F401
+import symbiosis.projects.models  # noqa: F401
+import symbiosis.requestlog.models  # noqa: F401
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -0,0 +1,56 @@
+"""Add the response cache.
+
+Revision ID: 3d7e1b9c5a40
+Revises: 0a6f3b8e2c91
+Create Date: 2026-10-18 19:04:12.318547
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3d7e1b9c5a40"
+down_revision: Union[str, Sequence[str], None] = "0a6f3b8e2c91"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "projects", sa.Column("response_cache_ttl", sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        "request_logs",
+        sa.Column("cache_hit", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+    # Losing cached responses in a crash only costs a few requests to the
+    # providers, so the table skips the write-ahead log.
+    op.create_table(
+        "response_cache",
+        sa.Column("key", sa.Text(), nullable=False),
+        sa.Column("content", sa.LargeBinary(), nullable=False),
+        sa.Column("media_type", sa.Text(), nullable=True),
+        sa.Column("streamed", sa.Boolean(), nullable=False),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=False),
+        sa.Column("completion_tokens", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+        prefixes=["UNLOGGED"],
+    )
+    op.create_index(
+        "ix_response_cache_expires_at", "response_cache", ["expires_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_response_cache_expires_at", table_name="response_cache")
+    op.drop_table("response_cache")
+    op.drop_column("request_logs", "cache_hit")
+    op.drop_column("projects", "response_cache_ttl")
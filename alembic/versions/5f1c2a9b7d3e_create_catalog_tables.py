@@ -0,0 +1,98 @@
+"""Create the projects and model catalog tables.
+
+Revision ID: 5f1c2a9b7d3e
+Revises:
+Create Date: 2026-10-18 09:12:44.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5f1c2a9b7d3e"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CATALOG_TABLES = ("projects", "catalog_models", "project_models")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "projects",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("name", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+        sa.Column("description", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_table(
+        "catalog_models",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column(
+            "alias", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False
+        ),
+        sa.Column(
+            "provider", sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False
+        ),
+        sa.Column(
+            "deployment", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False
+        ),
+        sa.Column(
+            "prompt_token_price", sa.Numeric(precision=12, scale=6), nullable=False
+        ),
+        sa.Column(
+            "completion_token_price", sa.Numeric(precision=12, scale=6), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("alias"),
+    )
+    op.create_table(
+        "project_models",
+        sa.Column("project_id", sa.Uuid(), nullable=False),
+        sa.Column("model_id", sa.Uuid(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["model_id"], ["catalog_models.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("project_id", "model_id"),
+    )
+
+    # Tell running gateways to reload the catalog when it changes.
+    op.execute(
+        """
+        CREATE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('symbiosis_catalog', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    for table in CATALOG_TABLES:
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_notify_catalog_change
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change()
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER {table}_notify_catalog_change ON {table}")
+
+    op.execute("DROP FUNCTION notify_catalog_change()")
+    op.drop_table("project_models")
+    op.drop_table("catalog_models")
+    op.drop_table("projects")
@@ -0,0 +1,48 @@
+"""Create the virtual API keys table.
+
+Revision ID: 8b3e4d1c6a2f
+Revises: 5f1c2a9b7d3e
+Create Date: 2026-10-18 11:04:27.552913
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8b3e4d1c6a2f"
+down_revision: Union[str, Sequence[str], None] = "5f1c2a9b7d3e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "api_keys",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("project_id", sa.Uuid(), nullable=False),
+        sa.Column(
+            "key_prefix", sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False
+        ),
+        sa.Column(
+            "key_hash", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_api_keys_key_prefix"), "api_keys", ["key_prefix"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_api_keys_key_prefix"), table_name="api_keys")
+    op.drop_table("api_keys")
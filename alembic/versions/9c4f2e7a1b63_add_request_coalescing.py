@@ -0,0 +1,37 @@
+"""Add request coalescing to projects.
+
+Revision ID: 9c4f2e7a1b63
+Revises: 3d7e1b9c5a40
+Create Date: 2026-10-18 19:48:37.905126
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9c4f2e7a1b63"
+down_revision: Union[str, Sequence[str], None] = "3d7e1b9c5a40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "projects",
+        sa.Column(
+            "coalesce_requests",
+            sa.Boolean(),
+            nullable=False,
+            server_default=sa.false(),
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("projects", "coalesce_requests")
@@ -0,0 +1 @@
+"""Database migration scripts."""
@@ -0,0 +1,84 @@
+"""Return the unused tokens of rate limit leases.
+
+Revision ID: a9e4c7b2d5f3
+Revises: f2b7c4e8a1d6
+Create Date: 2026-10-19 10:12:37.519284
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a9e4c7b2d5f3"
+down_revision: Union[str, Sequence[str], None] = "f2b7c4e8a1d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TAKE_RATE_LIMIT_TOKENS = """
+    CREATE FUNCTION take_rate_limit_tokens(
+        bucket_key text,
+        capacity double precision,
+        refill_rate double precision,
+        requested double precision,
+        allow_debt boolean{returned_parameter}
+    ) RETURNS double precision AS $$
+    DECLARE
+        now_ts double precision := extract(epoch FROM clock_timestamp());
+        available double precision;
+        granted double precision;
+    BEGIN
+        INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+        VALUES (bucket_key, capacity, now_ts)
+        ON CONFLICT (key) DO NOTHING;
+
+        SELECT LEAST(
+            capacity, tokens + (now_ts - updated_at) * refill_rate{returned}
+        )
+        INTO available
+        FROM rate_limit_buckets
+        WHERE key = bucket_key
+        FOR UPDATE;
+
+        IF allow_debt THEN
+            granted := requested;
+        ELSE
+            granted := GREATEST(LEAST(requested, available), 0);
+        END IF;
+
+        UPDATE rate_limit_buckets
+        SET tokens = available - granted, updated_at = now_ts
+        WHERE key = bucket_key;
+
+        RETURN granted;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "DROP FUNCTION take_rate_limit_tokens("
+        "text, double precision, double precision, double precision, boolean)"
+    )
+    # The unused tokens of expired leases are returned in the same roundtrip
+    # that takes new tokens.
+    op.execute(
+        TAKE_RATE_LIMIT_TOKENS.format(
+            returned_parameter=",\n        returned double precision",
+            returned=" + returned",
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "DROP FUNCTION take_rate_limit_tokens("
+        "text, double precision, double precision, double precision, boolean, "
+        "double precision)"
+    )
+    op.execute(TAKE_RATE_LIMIT_TOKENS.format(returned_parameter="", returned=""))
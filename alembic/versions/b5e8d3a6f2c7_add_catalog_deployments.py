@@ -0,0 +1,56 @@
+"""Add additional deployments of catalog models.
+
+Revision ID: b5e8d3a6f2c7
+Revises: 9c4f2e7a1b63
+Create Date: 2026-10-18 20:31:09.442816
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5e8d3a6f2c7"
+down_revision: Union[str, Sequence[str], None] = "9c4f2e7a1b63"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "catalog_deployments",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("model_id", sa.Uuid(), nullable=False),
+        sa.Column(
+            "provider", sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False
+        ),
+        sa.Column(
+            "deployment", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ["model_id"], ["catalog_models.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    # Tell running gateways to reload the catalog when it changes.
+    op.execute(
+        """
+        CREATE TRIGGER catalog_deployments_notify_catalog_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON catalog_deployments
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "DROP TRIGGER catalog_deployments_notify_catalog_change ON catalog_deployments"
+    )
+    op.drop_table("catalog_deployments")
@@ -0,0 +1,94 @@
+"""Add rate limits to projects and API keys.
+
+Revision ID: c7d2a5e9f1b4
+Revises: 8b3e4d1c6a2f
+Create Date: 2026-10-18 13:21:09.804117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c7d2a5e9f1b4"
+down_revision: Union[str, Sequence[str], None] = "8b3e4d1c6a2f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ("projects", "api_keys"):
+        op.add_column(
+            table, sa.Column("requests_per_minute", sa.Integer(), nullable=True)
+        )
+        op.add_column(
+            table, sa.Column("tokens_per_minute", sa.Integer(), nullable=True)
+        )
+
+    # The buckets are short-lived state; losing them in a crash only resets
+    # the rate limits, so the table skips the write-ahead log.
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("key", sa.Text(), nullable=False),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+        prefixes=["UNLOGGED"],
+    )
+
+    op.execute(
+        """
+        CREATE FUNCTION take_rate_limit_tokens(
+            bucket_key text,
+            capacity double precision,
+            refill_rate double precision,
+            requested double precision,
+            allow_debt boolean
+        ) RETURNS double precision AS $$
+        DECLARE
+            now_ts double precision := extract(epoch FROM clock_timestamp());
+            available double precision;
+            granted double precision;
+        BEGIN
+            INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+            VALUES (bucket_key, capacity, now_ts)
+            ON CONFLICT (key) DO NOTHING;
+
+            SELECT LEAST(capacity, tokens + (now_ts - updated_at) * refill_rate)
+            INTO available
+            FROM rate_limit_buckets
+            WHERE key = bucket_key
+            FOR UPDATE;
+
+            IF allow_debt THEN
+                granted := requested;
+            ELSE
+                granted := GREATEST(LEAST(requested, available), 0);
+            END IF;
+
+            UPDATE rate_limit_buckets
+            SET tokens = available - granted, updated_at = now_ts
+            WHERE key = bucket_key;
+
+            RETURN granted;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "DROP FUNCTION take_rate_limit_tokens("
+        "text, double precision, double precision, double precision, boolean)"
+    )
+    op.drop_table("rate_limit_buckets")
+
+    for table in ("api_keys", "projects"):
+        op.drop_column(table, "tokens_per_minute")
+        op.drop_column(table, "requests_per_minute")
@@ -0,0 +1,38 @@
+"""Add the priority class of projects.
+
+Revision ID: d8f3b6c1e9a5
+Revises: b5e8d3a6f2c7
+Create Date: 2026-10-18 21:12:44.318207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d8f3b6c1e9a5"
+down_revision: Union[str, Sequence[str], None] = "b5e8d3a6f2c7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "projects",
+        sa.Column(
+            "priority",
+            sqlmodel.sql.sqltypes.AutoString(length=16),
+            nullable=False,
+            server_default="standard",
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("projects", "priority")
@@ -0,0 +1,56 @@
+"""Add budgets to projects and the cost ledger.
+
+Revision ID: e4a91f7c3d58
+Revises: c7d2a5e9f1b4
+Create Date: 2026-10-18 15:47:33.019462
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4a91f7c3d58"
+down_revision: Union[str, Sequence[str], None] = "c7d2a5e9f1b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "projects",
+        sa.Column("monthly_budget", sa.Numeric(precision=12, scale=2), nullable=True),
+    )
+    op.create_table(
+        "cost_ledger",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Uuid(), nullable=False),
+        sa.Column("key_id", sa.Uuid(), nullable=False),
+        sa.Column(
+            "model", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False
+        ),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=False),
+        sa.Column("completion_tokens", sa.Integer(), nullable=False),
+        sa.Column("cost", sa.Numeric(precision=14, scale=8), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_cost_ledger_project_id_created_at",
+        "cost_ledger",
+        ["project_id", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_cost_ledger_project_id_created_at", table_name="cost_ledger")
+    op.drop_table("cost_ledger")
+    op.drop_column("projects", "monthly_budget")
@@ -0,0 +1,37 @@
+"""Add the guardrails of projects.
+
+Revision ID: f2b7c4e8a1d6
+Revises: d8f3b6c1e9a5
+Create Date: 2026-10-18 23:04:51.672930
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b7c4e8a1d6"
+down_revision: Union[str, Sequence[str], None] = "d8f3b6c1e9a5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "projects",
+        sa.Column("guardrails", sa.JSON(), nullable=False, server_default="[]"),
+    )
+    op.add_column(
+        "projects",
+        sa.Column("blocked_terms", sa.JSON(), nullable=False, server_default="[]"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("projects", "blocked_terms")
+    op.drop_column("projects", "guardrails")
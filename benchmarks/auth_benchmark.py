@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Benchmark the token validation hot path of symbiosis.auth.
+
+The benchmark starts an in-process OIDC provider that serves a discovery
+document and a JWKS, and measures TokenValidator.validate and the
+authenticated_user dependencies against it for several scenarios:
+
+- cold: a new validator per token, so every token fetches configuration and keys
+- warm: a shared validator with cached keys, every token is new
+- cached: a shared validator validating the same token over and over
+- rotation: the provider rotates its signing key every 100 tokens
+- invalid: a flood of tokens with a forged signature or unknown key ID
+
+Run it with `uv run benchmarks/auth_benchmark.py`. Use `--check` to exit with
+a non-zero status when the median latency of a steady-state scenario exceeds
+the 10ms overhead budget from the non-functional requirements.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from fastapi import HTTPException
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm, RSAAlgorithm
+
+from symbiosis.auth import async_authenticated_user, authenticated_user
+from symbiosis.auth.validation import TokenValidator
+
+OVERHEAD_BUDGET_MS = 10.0
+STEADY_STATE_SCENARIOS = ("warm", "cached")
+
+KEY_TYPES = {
+    "RS256": (
+        lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        RSAAlgorithm,
+    ),
+    "ES256": (lambda: ec.generate_private_key(ec.SECP256R1()), ECAlgorithm),
+    "EdDSA": (ed25519.Ed25519PrivateKey.generate, OKPAlgorithm),
+}
+
+
+class StubProvider:
+    """In-process OIDC provider serving a discovery document and a JWKS."""
+
+    def __init__(self, algorithm: str) -> None:
+        """Initialize the provider with a single signing key.
+
+        Parameters
+        ----------
+        algorithm : str
+            The JWS algorithm used to sign tokens.
+        """
+        self.algorithm = algorithm
+        self.keys = {}
+        self.current_kid = None
+        self.base_url = None
+        self.rotate_key()
+
+    def rotate_key(self) -> dict:
+        """Replace the signing key with a new one.
+
+        Returns
+        -------
+        dict
+            The new key set, which can be restored with `use_keys`.
+        """
+        generate_key, _ = KEY_TYPES[self.algorithm]
+        self.use_keys({uuid.uuid4().hex: generate_key()})
+        return self.keys
+
+    def use_keys(self, keys: dict) -> None:
+        """Serve a previously generated key set and sign tokens with it."""
+        self.keys = keys
+        self.current_kid = next(iter(keys))
+
+    def issue_token(self) -> str:
+        """Issue a token signed with the current signing key."""
+        now = int(time.time())
+        payload = {
+            "iss": self.base_url,
+            "sub": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + 300,
+        }
+
+        return jwt.encode(
+            payload,
+            self.keys[self.current_kid],
+            algorithm=self.algorithm,
+            headers={"kid": self.current_kid},
+        )
+
+    def documents(self) -> dict[str, dict]:
+        """Get the documents served by the provider, keyed by path."""
+        _, algorithm_type = KEY_TYPES[self.algorithm]
+        jwks = [
+            {
+                **algorithm_type.to_jwk(private_key.public_key(), as_dict=True),
+                "kid": kid,
+                "use": "sig",
+            }
+            for kid, private_key in self.keys.items()
+        ]
+
+        return {
+            "/.well-known/openid-configuration": {
+                "issuer": self.base_url,
+                "jwks_uri": f"{self.base_url}/jwks",
+                "id_token_signing_alg_values_supported": [self.algorithm],
+            },
+            "/jwks": {"keys": jwks},
+        }
+
+    @property
+    def discovery_url(self) -> str:
+        """Get the OIDC discovery URL of the provider."""
+        return f"{self.base_url}/.well-known/openid-configuration"
+
+    @contextmanager
+    def serve(self) -> Iterator["StubProvider"]:
+        """Serve the provider on a random local port."""
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = json.dumps(provider.documents()[self.path]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{server.server_port}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            yield self
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+@dataclass
+class Result:
+    """Latency statistics for a single benchmark scenario."""
+
+    target: str
+    algorithm: str
+    scenario: str
+    p50_ms: float
+    p99_ms: float
+    ops_per_sec: float
+
+
+def measure(operation: Callable[[], None], iterations: int) -> list[float]:
+    """Measure the latency of an operation in milliseconds."""
+    samples = []
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return samples
+
+
+def summarize(
+    target: str, algorithm: str, scenario: str, samples: list[float]
+) -> Result:
+    """Compute the latency percentiles and throughput of a scenario."""
+    quantiles = statistics.quantiles(samples, n=100)
+
+    return Result(
+        target=target,
+        algorithm=algorithm,
+        scenario=scenario,
+        p50_ms=statistics.median(samples),
+        p99_ms=quantiles[98],
+        ops_per_sec=len(samples) / (sum(samples) / 1000),
+    )
+
+
+def forge_token(provider: StubProvider, index: int) -> str:
+    """Create a token with a forged signature or an unknown key ID."""
+    header, payload, _ = provider.issue_token().split(".")
+
+    if index % 2:
+        return jwt.encode({"sub": "attacker"}, "x" * 32, headers={"kid": "unknown"})
+
+    return f"{header}.{payload}.{'A' * 86}"
+
+
+def run_scenarios(
+    provider: StubProvider,
+    target: str,
+    validate: Callable[[TokenValidator, str], None],
+    iterations: int,
+    loop: asyncio.AbstractEventLoop,
+) -> Iterator[Result]:
+    """Run all scenarios for a single validation target."""
+    validators: list[TokenValidator] = []
+
+    def new_validator(min_refetch_interval: float = 0) -> TokenValidator:
+        validator = TokenValidator(
+            discovery_url=provider.discovery_url,
+            min_refetch_interval=min_refetch_interval,
+        )
+        validators.append(validator)
+        return validator
+
+    try:
+        yield from _run_scenarios(provider, target, validate, iterations, new_validator)
+    finally:
+        # The validators are closed on the loop their HTTP clients use.
+        for validator in validators:
+            loop.run_until_complete(validator.close())
+
+
+def _run_scenarios(
+    provider: StubProvider,
+    target: str,
+    validate: Callable[[TokenValidator, str], None],
+    iterations: int,
+    new_validator: Callable[..., TokenValidator],
+) -> Iterator[Result]:
+    algorithm = provider.algorithm
+
+    cold_iterations = max(iterations // 10, 10)
+    tokens = iter([provider.issue_token() for _ in range(cold_iterations)])
+    samples = measure(lambda: validate(new_validator(), next(tokens)), cold_iterations)
+    yield summarize(target, algorithm, "cold", samples)
+
+    validator = new_validator()
+    validate(validator, provider.issue_token())
+    tokens = iter([provider.issue_token() for _ in range(iterations)])
+    samples = measure(lambda: validate(validator, next(tokens)), iterations)
+    yield summarize(target, algorithm, "warm", samples)
+
+    token = provider.issue_token()
+    validate(validator, token)
+    samples = measure(lambda: validate(validator, token), iterations)
+    yield summarize(target, algorithm, "cached", samples)
+
+    # Keys are generated upfront so key generation doesn't end up in the
+    # measurements. Switching the served key set is a cheap assignment.
+    epochs = []
+    for _ in range(max(iterations // 100, 1)):
+        keys = provider.rotate_key()
+        epochs.append((keys, [provider.issue_token() for _ in range(100)]))
+
+    rotation = iter(
+        (keys if index == 0 else None, token)
+        for keys, epoch_tokens in epochs
+        for index, token in enumerate(epoch_tokens)
+    )
+
+    def validate_with_rotation() -> None:
+        keys, token = next(rotation)
+        if keys is not None:
+            provider.use_keys(keys)
+        validate(validator, token)
+
+    samples = measure(validate_with_rotation, len(epochs) * 100)
+    yield summarize(target, algorithm, "rotation", samples)
+
+    # The flood uses the default refetch interval, which is what protects the
+    # identity provider from tokens with made-up key IDs.
+    validator = new_validator(min_refetch_interval=30)
+    validate(validator, provider.issue_token())
+    tokens = iter([forge_token(provider, index) for index in range(iterations)])
+    samples = measure(lambda: validate(validator, next(tokens)), iterations)
+    yield summarize(target, algorithm, "invalid", samples)
+
+
+def targets(
+    loop: asyncio.AbstractEventLoop,
+) -> dict[str, Callable[[TokenValidator, str], None]]:
+    """Get the validation entry points to benchmark."""
+
+    def call_validate(validator: TokenValidator, token: str) -> None:
+        with contextlib.suppress(jwt.InvalidTokenError):
+            validator.validate(token)
+
+    def call_dependency(validator: TokenValidator, token: str) -> None:
+        with contextlib.suppress(HTTPException):
+            authenticated_user(f"Bearer {token}", validator)
+
+    def call_async_dependency(validator: TokenValidator, token: str) -> None:
+        with contextlib.suppress(HTTPException):
+            loop.run_until_complete(
+                async_authenticated_user(f"Bearer {token}", validator)
+            )
+
+    return {
+        "validate": call_validate,
+        "authenticated_user": call_dependency,
+        "async_authenticated_user": call_async_dependency,
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print a report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--algorithm", choices=KEY_TYPES, action="append")
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    results = []
+    loop = asyncio.new_event_loop()
+
+    try:
+        for algorithm in args.algorithm or KEY_TYPES:
+            with StubProvider(algorithm).serve() as provider:
+                for target, validate in targets(loop).items():
+                    results.extend(
+                        run_scenarios(provider, target, validate, args.iterations, loop)
+                    )
+    finally:
+        loop.close()
+
+    print(
+        f"{'target':<26}{'alg':<7}{'scenario':<10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'ops/sec':>12}"
+    )
+
+    for result in results:
+        print(
+            f"{result.target:<26}{result.algorithm:<7}{result.scenario:<10}"
+            f"{result.p50_ms:>10.3f}{result.p99_ms:>10.3f}"
+            f"{result.ops_per_sec:>12.0f}"
+        )
+
+    over_budget = [
+        result
+        for result in results
+        if result.scenario in STEADY_STATE_SCENARIOS
+        and result.p50_ms > OVERHEAD_BUDGET_MS
+    ]
+
+    if args.check and over_budget:
+        print(f"\n{len(over_budget)} scenario(s) exceed {OVERHEAD_BUDGET_MS}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
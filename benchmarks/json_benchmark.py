@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Benchmark the encoding of JSON responses of symbiosis.server.
+
+The benchmark encodes typical payloads the way FastAPI does for the response
+classes the gateway could use:
+
+- json: the FastAPI default, jsonable_encoder followed by JSONResponse
+- orjson: jsonable_encoder followed by ORJSONResponse, what endpoints
+  returning plain data get with the default response class of the gateway
+- orjson-direct: ORJSONResponse without jsonable_encoder, what endpoints and
+  exception handlers returning the response themselves get
+
+The payloads are a chat completion and a list of 500 request log records.
+
+Run it with `uv run benchmarks/json_benchmark.py`.
+"""
+
+import argparse
+import functools
+import statistics
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from symbiosis.server.responses import ORJSONResponse
+
+
+def completion_payload() -> dict:
+    """Create a chat completion like the ones providers return."""
+    content = " ".join(["The quick brown fox jumps over the lazy dog."] * 40)
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "gpt-4o-2024-08-06",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 1234,
+            "completion_tokens": 456,
+            "total_tokens": 1690,
+        },
+        "system_fingerprint": "fp_6b68a8204b",
+    }
+
+
+def list_payload(size: int = 500) -> list[dict]:
+    """Create a list of request log records, like a page of a listing."""
+    started_at = datetime(2026, 1, 1, tzinfo=UTC)
+
+    return [
+        {
+            "id": index,
+            "project_id": str(uuid.uuid4()),
+            "key_id": str(uuid.uuid4()),
+            "model": "gpt-4o",
+            "provider": "azure-openai",
+            "status_code": 200,
+            "streamed": index % 2 == 0,
+            "latency_ms": 812.5 + index,
+            "prompt_tokens": 1234,
+            "completion_tokens": 456,
+            "cache_hit": False,
+            "created_at": (started_at + timedelta(seconds=index)).isoformat(),
+        }
+        for index in range(size)
+    ]
+
+
+@dataclass
+class Result:
+    """Latency statistics for a single payload and response class."""
+
+    target: str
+    payload: str
+    p50_us: float
+    p99_us: float
+    size: int
+
+
+def measure(operation: Callable[[], bytes], iterations: int) -> list[float]:
+    """Measure the latency of an operation in microseconds."""
+    samples = []
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - start) * 1_000_000)
+
+    return samples
+
+
+def targets() -> dict[str, Callable[[object], bytes]]:
+    """Get the ways of encoding a payload to benchmark."""
+    return {
+        "json": lambda payload: JSONResponse(jsonable_encoder(payload)).body,
+        "orjson": lambda payload: ORJSONResponse(jsonable_encoder(payload)).body,
+        "orjson-direct": lambda payload: ORJSONResponse(payload).body,
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print a report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    payloads = {"completion": completion_payload(), "list": list_payload()}
+    results = []
+
+    for payload_name, payload in payloads.items():
+        for target, encode in targets().items():
+            samples = measure(functools.partial(encode, payload), args.iterations)
+            quantiles = statistics.quantiles(samples, n=100)
+            results.append(
+                Result(
+                    target=target,
+                    payload=payload_name,
+                    p50_us=statistics.median(samples),
+                    p99_us=quantiles[98],
+                    size=len(encode(payload)),
+                )
+            )
+
+    print(f"{'target':<15}{'payload':<12}{'p50 us':>10}{'p99 us':>10}{'bytes':>10}")
+
+    for result in results:
+        print(
+            f"{result.target:<15}{result.payload:<12}"
+            f"{result.p50_us:>10.1f}{result.p99_us:>10.1f}{result.size:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
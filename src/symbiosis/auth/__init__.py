@@ -1,6 +1,8 @@
 """Authentication middleware for the application."""
 
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Annotated
 from jwt import InvalidTokenError
 from pydantic import BaseModel, Field
@@ -20,11 +22,11 @@ class AuthenticatedUser(BaseModel):
     claims: dict = Field(default_factory=dict)
 
 
-def get_token_validator() -> TokenValidator:
-    """Get a configured TokenValidator instance.
+def create_token_validator() -> TokenValidator:
+    """Create a TokenValidator from the environment.
 
-    This dependency provides a TokenValidator configured with the OIDC
-    discovery URL from the environment variable OIDC_DISCOVERY_URL.
+    The validator is configured with the OIDC discovery URL from the
+    environment variable OIDC_DISCOVERY_URL.
 
     Returns
     -------
@@ -43,6 +45,65 @@ def get_token_validator() -> TokenValidator:
     return TokenValidator(discovery_url=discovery_url)
 
 
+# Global token validator instance (lazily initialized)
+_token_validator: TokenValidator | None = None
+
+
+async def get_token_validator() -> TokenValidator:
+    """Get the shared TokenValidator instance.
+
+    The validator is shared by all requests in the process so the cached
+    OIDC configuration and signing keys are reused between requests. As a
+    coroutine, the dependency is resolved on the event loop instead of in
+    the thread pool FastAPI runs synchronous dependencies in.
+
+    Returns
+    -------
+    TokenValidator
+        The shared token validator instance.
+
+    Raises
+    ------
+    ValueError
+        If OIDC_DISCOVERY_URL environment variable is not set.
+    """
+    global _token_validator
+    if _token_validator is None:
+        _token_validator = create_token_validator()
+    return _token_validator
+
+
+@asynccontextmanager
+async def token_validator_lifespan() -> AsyncIterator[None]:
+    """Keep the shared TokenValidator warm for the lifetime of the application.
+
+    The OIDC configuration and signing keys are refreshed in the background
+    while the application runs. Nothing happens when OIDC_DISCOVERY_URL is not
+    configured.
+    """
+    global _token_validator
+
+    if not os.getenv("OIDC_DISCOVERY_URL"):
+        yield
+        return
+
+    token_validator = await get_token_validator()
+    await token_validator.start()
+
+    try:
+        yield
+    finally:
+        await token_validator.close()
+        _token_validator = None
+
+
+def _bearer_token(authorization: str) -> str:
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Bearer token required")
+
+    return authorization[len("Bearer ") :]
+
+
 def authenticated_user(
     authorization: Annotated[str, Header()],
     token_validator: Annotated[TokenValidator, Depends(get_token_validator)],
@@ -66,10 +127,7 @@ def authenticated_user(
     HTTPException
         If the authorization header is missing or invalid.
     """
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Bearer token required")
-
-    token = authorization[len("Bearer ") :]
+    token = _bearer_token(authorization)
 
     try:
         token_payload = token_validator.validate(token)
@@ -77,3 +135,40 @@ def authenticated_user(
         raise HTTPException(status_code=401, detail="Invalid token") from err
 
     return AuthenticatedUser(claims=token_payload)
+
+
+async def async_authenticated_user(
+    authorization: Annotated[str, Header()],
+    token_validator: Annotated[TokenValidator, Depends(get_token_validator)],
+) -> AuthenticatedUser:
+    """Extract and validate the authenticated user without blocking the event loop.
+
+    Use this dependency instead of `authenticated_user` in async endpoints.
+    It runs on the event loop rather than occupying a threadpool slot for
+    each request.
+
+    Parameters
+    ----------
+    authorization : str
+        The authorization header from the request.
+    token_validator : TokenValidator
+        The token validator instance (injected dependency).
+
+    Returns
+    -------
+    AuthenticatedUser
+        The authenticated user object.
+
+    Raises
+    ------
+    HTTPException
+        If the authorization header is missing or invalid.
+    """
+    token = _bearer_token(authorization)
+
+    try:
+        token_payload = await token_validator.avalidate(token)
+    except InvalidTokenError as err:
+        raise HTTPException(status_code=401, detail="Invalid token") from err
+
+    return AuthenticatedUser(claims=token_payload)
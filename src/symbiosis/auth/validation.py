@@ -1,26 +1,67 @@
 """JSON Web Token validation."""
 
+import asyncio
+import contextlib
+import hashlib
+import logging
 import os
+import threading
 import time
 
+import httpx
 import jwt
 import requests
-from jwt import PyJWKClient
+from jwt import PyJWK, PyJWKSet
+from jwt.exceptions import PyJWKSetError
+
+from symbiosis.caching import TTLCache
+
+logger = logging.getLogger(__name__)
 
 
 class TokenValidator:
-    """Implementation of JWT validation using OIDC configuration."""
+    """Implementation of JWT validation using OIDC configuration.
+
+    The validator caches the OIDC discovery document and the JSON Web Key Set
+    of the identity provider. Both are refreshed in the background by
+    :meth:`start` before they expire, so validating a token does not require
+    a round trip to the identity provider in steady state. Tokens signed with
+    a key we haven't seen yet trigger a single refetch of the key set, shared
+    by all concurrent callers.
+
+    Validated claims are cached by a hash of the token until the token
+    expires, so clients reusing a token skip signature verification. The cache
+    is cleared when the identity provider rotates its keys.
+
+    Use :meth:`avalidate` from async code. It fetches the OIDC configuration
+    and keys with a pooled async HTTP client and never blocks the event loop.
+    """
 
     _discovery_url: str
     _oidc_config: dict | None
     _config_last_fetch: float | None
     _config_ttl: int
-    _jwk_client: PyJWKClient | None
+    _signing_keys: dict[str | None, PyJWK]
+    _jwks_last_fetch: float | None
+    _jwks_generation: int
+    _config_lock: threading.Lock
+    _async_config_lock: asyncio.Lock
+    _jwks_lock: threading.Lock
+    _async_jwks_lock: asyncio.Lock
+    _http_client: httpx.AsyncClient | None
+    _min_refetch_interval: float
+    _refresh_task: asyncio.Task | None
+    _token_cache: TTLCache[bytes, dict]
     _expected_audience: str | None
     _expected_issuer: str | None
 
     def __init__(
-        self, discovery_url: str, timeout: int = 3, config_ttl: int = 3600
+        self,
+        discovery_url: str,
+        timeout: int = 3,
+        config_ttl: int = 3600,
+        min_refetch_interval: float = 30.0,
+        token_cache_size: int = 10000,
     ) -> None:
         """Initialize the TokenValidator with the OIDC discovery URL.
 
@@ -31,17 +72,66 @@ class TokenValidator:
         timeout : int, optional
             Timeout in seconds for HTTP requests, by default 3.
         config_ttl : int, optional
-            Time-to-live in seconds for cached OIDC configuration, by default 3600.
+            Time-to-live in seconds for the cached OIDC configuration and key
+            set, by default 3600.
+        min_refetch_interval : float, optional
+            Minimum time in seconds between two key set refetches caused by
+            tokens with an unknown key ID, by default 30.
+        token_cache_size : int, optional
+            Maximum number of validated tokens to cache, by default 10000.
         """
         self._discovery_url = discovery_url
         self._timeout = timeout
         self._config_ttl = config_ttl
+        self._min_refetch_interval = min_refetch_interval
         self._oidc_config = None
         self._config_last_fetch = None
-        self._jwk_client = None
+        self._signing_keys = {}
+        self._jwks_last_fetch = None
+        self._jwks_generation = 0
+        self._config_lock = threading.Lock()
+        self._async_config_lock = asyncio.Lock()
+        self._jwks_lock = threading.Lock()
+        self._async_jwks_lock = asyncio.Lock()
+        self._http_client = None
+        self._refresh_task = None
+        self._token_cache = TTLCache("token", maxsize=token_cache_size)
         self._expected_audience = os.getenv("OIDC_EXPECTED_AUDIENCE")
         self._expected_issuer = None  # Will be set from OIDC config
 
+    def _is_stale(self, last_fetch: float | None) -> bool:
+        return last_fetch is None or time.time() - last_fetch > self._config_ttl
+
+    @property
+    def has_fresh_keys(self) -> bool:
+        """Whether signing keys were fetched within the configuration TTL.
+
+        The keys go stale once the identity provider can't be reached for
+        longer than the TTL.
+        """
+        return bool(self._signing_keys) and not self._is_stale(self._jwks_last_fetch)
+
+    def _fetch_json(self, url: str, description: str) -> dict:
+        try:
+            response = requests.get(url, timeout=self._timeout)
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException as err:
+            error_msg = f"Failed to fetch {description}"
+            raise ValueError(error_msg) from err
+
+    async def _afetch_json(self, url: str, description: str) -> dict:
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(timeout=self._timeout)
+
+        try:
+            response = await self._http_client.get(url)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as err:
+            error_msg = f"Failed to fetch {description}"
+            raise ValueError(error_msg) from err
+
     def _get_oidc_config(self) -> dict:
         """Get the OIDC configuration, using cache if available.
 
@@ -55,61 +145,280 @@ class TokenValidator:
         ValueError
             If the OIDC configuration cannot be fetched.
         """
-        now = time.time()
-        if (
-            self._oidc_config is None
-            or self._config_last_fetch is None
-            or now - self._config_last_fetch > self._config_ttl
-        ):
-            try:
-                response = requests.get(self._discovery_url, timeout=self._timeout)
-                response.raise_for_status()
-                self._oidc_config = response.json()
-                self._config_last_fetch = now
+        if self._oidc_config is None or self._is_stale(self._config_last_fetch):
+            with self._config_lock:
+                if self._is_stale(self._config_last_fetch):
+                    self._set_oidc_config(
+                        self._fetch_json(self._discovery_url, "OIDC configuration")
+                    )
+
+        return self._oidc_config
+
+    async def _aget_oidc_config(self) -> dict:
+        """Get the OIDC configuration without blocking the event loop.
+
+        Returns
+        -------
+        dict
+            The OIDC configuration.
 
-                # Set expected issuer from OIDC config
-                self._expected_issuer = self._oidc_config.get("issuer")
-            except requests.RequestException as err:
-                error_msg = "Failed to fetch OIDC configuration"
-                raise ValueError(error_msg) from err
+        Raises
+        ------
+        ValueError
+            If the OIDC configuration cannot be fetched.
+        """
+        if self._oidc_config is None or self._is_stale(self._config_last_fetch):
+            async with self._async_config_lock:
+                if self._is_stale(self._config_last_fetch):
+                    self._set_oidc_config(
+                        await self._afetch_json(
+                            self._discovery_url, "OIDC configuration"
+                        )
+                    )
 
         return self._oidc_config
 
-    def validate(self, token: str) -> dict:
-        """Validate a token and return the payload.
+    def _set_oidc_config(self, oidc_config: dict) -> None:
+        self._oidc_config = oidc_config
+        self._config_last_fetch = time.time()
+
+        # Set expected issuer from OIDC config
+        self._expected_issuer = oidc_config.get("issuer")
+
+    def _get_jwks_uri(self, oidc_config: dict) -> str:
+        jwks_uri = oidc_config.get("jwks_uri")
+
+        if not jwks_uri:
+            error_msg = "JWKS URI not found in OIDC configuration."
+            raise ValueError(error_msg)
+
+        return jwks_uri
+
+    def _refresh_signing_keys(self) -> None:
+        jwks_uri = self._get_jwks_uri(self._get_oidc_config())
+        self._set_signing_keys(self._fetch_json(jwks_uri, "JWKS"))
+
+    async def _arefresh_signing_keys(self) -> None:
+        jwks_uri = self._get_jwks_uri(await self._aget_oidc_config())
+        self._set_signing_keys(await self._afetch_json(jwks_uri, "JWKS"))
+
+    def _set_signing_keys(self, jwks: dict) -> None:
+        try:
+            key_set = PyJWKSet.from_dict(jwks)
+        except PyJWKSetError as err:
+            error_msg = "The JWKS does not contain any usable signing keys."
+            raise ValueError(error_msg) from err
+
+        signing_keys = {
+            key.key_id: key
+            for key in key_set.keys
+            if key.public_key_use in ("sig", None)
+        }
+
+        # Tokens signed with a key that was rotated out must not be accepted
+        # from the cache anymore.
+        if signing_keys.keys() != self._signing_keys.keys():
+            self._token_cache.clear()
+
+        self._signing_keys = signing_keys
+        self._jwks_last_fetch = time.time()
+        self._jwks_generation += 1
+
+    def _should_refetch_signing_keys(self, generation: int) -> bool:
+        # Another caller refreshed the keys while we were waiting for the lock,
+        # or the keys were fetched so recently that an unknown key ID is more
+        # likely a forged token than a key rotation.
+        return generation == self._jwks_generation and (
+            self._jwks_last_fetch is None
+            or time.time() - self._jwks_last_fetch >= self._min_refetch_interval
+        )
+
+    def _refetch_signing_keys(self, generation: int) -> None:
+        """Refetch the key set, sharing a single fetch among concurrent callers.
+
+        Parameters
+        ----------
+        generation : int
+            The key set generation the caller looked at. When another caller
+            refreshed the keys in the meantime, no new fetch is performed.
+        """
+        with self._jwks_lock:
+            if self._should_refetch_signing_keys(generation):
+                self._refresh_signing_keys()
+
+    async def _arefetch_signing_keys(self, generation: int) -> None:
+        """Refetch the key set, sharing a single fetch among concurrent tasks.
+
+        Parameters
+        ----------
+        generation : int
+            The key set generation the caller looked at. When another task
+            refreshed the keys in the meantime, no new fetch is performed.
+        """
+        async with self._async_jwks_lock:
+            if self._should_refetch_signing_keys(generation):
+                await self._arefresh_signing_keys()
+
+    def _find_signing_key(self, kid: str | None) -> PyJWK | None:
+        if kid is None and len(self._signing_keys) == 1:
+            return next(iter(self._signing_keys.values()))
+
+        return self._signing_keys.get(kid)
+
+    def _get_signing_key(self, token: str) -> PyJWK:
+        """Get the signing key for a token.
 
         Parameters
         ----------
         token : str
-            The JWT token to validate.
+            The JWT token to find the signing key for.
 
         Returns
         -------
-        dict
-            The payload of the validated token.
+        jwt.PyJWK
+            The signing key matching the key ID in the token header.
 
         Raises
         ------
-        ValueError
-            If the OIDC configuration is invalid.
         jwt.InvalidTokenError
-            If the token is invalid or expired.
+            If the token is malformed or signed with an unknown key.
         """
-        oidc_config = self._get_oidc_config()
-        signing_algorithms = oidc_config.get(
-            "id_token_signing_alg_values_supported", []
+        kid = jwt.get_unverified_header(token).get("kid")
+
+        if not self._signing_keys or self._is_stale(self._jwks_last_fetch):
+            with self._jwks_lock:
+                if not self._signing_keys or self._is_stale(self._jwks_last_fetch):
+                    self._refresh_signing_keys()
+
+        signing_key = self._find_signing_key(kid)
+
+        if signing_key is None:
+            self._refetch_signing_keys(self._jwks_generation)
+            signing_key = self._find_signing_key(kid)
+
+        if signing_key is None:
+            error_msg = "Unable to find a signing key that matches the token."
+            raise jwt.InvalidTokenError(error_msg)
+
+        return signing_key
+
+    async def _aget_signing_key(self, token: str) -> PyJWK:
+        """Get the signing key for a token without blocking the event loop.
+
+        Parameters
+        ----------
+        token : str
+            The JWT token to find the signing key for.
+
+        Returns
+        -------
+        jwt.PyJWK
+            The signing key matching the key ID in the token header.
+
+        Raises
+        ------
+        jwt.InvalidTokenError
+            If the token is malformed or signed with an unknown key.
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+
+        if not self._signing_keys or self._is_stale(self._jwks_last_fetch):
+            async with self._async_jwks_lock:
+                if not self._signing_keys or self._is_stale(self._jwks_last_fetch):
+                    await self._arefresh_signing_keys()
+
+        signing_key = self._find_signing_key(kid)
+
+        if signing_key is None:
+            await self._arefetch_signing_keys(self._jwks_generation)
+            signing_key = self._find_signing_key(kid)
+
+        if signing_key is None:
+            error_msg = "Unable to find a signing key that matches the token."
+            raise jwt.InvalidTokenError(error_msg)
+
+        return signing_key
+
+    def refresh(self) -> None:
+        """Fetch the OIDC configuration and signing keys.
+
+        Raises
+        ------
+        ValueError
+            If the OIDC configuration or the key set cannot be fetched.
+        """
+        self._set_oidc_config(
+            self._fetch_json(self._discovery_url, "OIDC configuration")
         )
-        jwks_uri = oidc_config.get("jwks_uri")
 
-        if not jwks_uri:
-            error_msg = "JWKS URI not found in OIDC configuration."
-            raise ValueError(error_msg)
+        with self._jwks_lock:
+            self._refresh_signing_keys()
 
-        # Reuse PyJWKClient instance
-        if self._jwk_client is None:
-            self._jwk_client = PyJWKClient(jwks_uri)
+    async def arefresh(self) -> None:
+        """Fetch the OIDC configuration and signing keys asynchronously.
 
-        signing_key = self._jwk_client.get_signing_key_from_jwt(token)
+        Raises
+        ------
+        ValueError
+            If the OIDC configuration or the key set cannot be fetched.
+        """
+        self._set_oidc_config(
+            await self._afetch_json(self._discovery_url, "OIDC configuration")
+        )
+
+        async with self._async_jwks_lock:
+            await self._arefresh_signing_keys()
+
+    async def _refresh_periodically(self) -> None:
+        # We refresh well ahead of the TTL so requests never observe stale data.
+        # When the identity provider is unreachable we keep the cached data
+        # and retry sooner.
+        refresh_interval = self._config_ttl * 0.8
+        retry_interval = min(self._min_refetch_interval, refresh_interval)
+
+        while True:
+            try:
+                await self.arefresh()
+                delay = refresh_interval
+            except ValueError:
+                logger.warning("Failed to refresh the OIDC configuration and keys")
+                delay = retry_interval
+
+            await asyncio.sleep(delay)
+
+    async def start(self) -> None:
+        """Start refreshing the OIDC configuration and keys in the background."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def close(self) -> None:
+        """Stop the background refresh and close the HTTP client."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._refresh_task
+
+            self._refresh_task = None
+
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def _get_cached_claims(self, token_hash: bytes) -> dict | None:
+        claims = self._token_cache.get(token_hash)
+        return dict(claims) if claims is not None else None
+
+    def _cache_claims(self, token_hash: bytes, claims: dict) -> None:
+        expires_at = claims.get("exp")
+
+        if isinstance(expires_at, int | float):
+            self._token_cache.set(token_hash, dict(claims), expires_at=expires_at)
+
+    def _decode(self, token: str, signing_key: PyJWK, oidc_config: dict) -> dict:
+        signing_algorithms = oidc_config.get(
+            "id_token_signing_alg_values_supported", []
+        )
 
         # Decode and return only the payload (claims)
         decode_options = {
@@ -134,3 +443,65 @@ class TokenValidator:
             decode_kwargs["issuer"] = self._expected_issuer
 
         return jwt.decode(**decode_kwargs)
+
+    def validate(self, token: str) -> dict:
+        """Validate a token and return the payload.
+
+        Parameters
+        ----------
+        token : str
+            The JWT token to validate.
+
+        Returns
+        -------
+        dict
+            The payload of the validated token.
+
+        Raises
+        ------
+        ValueError
+            If the OIDC configuration is invalid.
+        jwt.InvalidTokenError
+            If the token is invalid or expired.
+        """
+        token_hash = hashlib.sha256(token.encode()).digest()
+        claims = self._get_cached_claims(token_hash)
+
+        if claims is None:
+            oidc_config = self._get_oidc_config()
+            signing_key = self._get_signing_key(token)
+            claims = self._decode(token, signing_key, oidc_config)
+            self._cache_claims(token_hash, claims)
+
+        return claims
+
+    async def avalidate(self, token: str) -> dict:
+        """Validate a token and return the payload without blocking the event loop.
+
+        Parameters
+        ----------
+        token : str
+            The JWT token to validate.
+
+        Returns
+        -------
+        dict
+            The payload of the validated token.
+
+        Raises
+        ------
+        ValueError
+            If the OIDC configuration is invalid.
+        jwt.InvalidTokenError
+            If the token is invalid or expired.
+        """
+        token_hash = hashlib.sha256(token.encode()).digest()
+        claims = self._get_cached_claims(token_hash)
+
+        if claims is None:
+            oidc_config = await self._aget_oidc_config()
+            signing_key = await self._aget_signing_key(token)
+            claims = self._decode(token, signing_key, oidc_config)
+            self._cache_claims(token_hash, claims)
+
+        return claims
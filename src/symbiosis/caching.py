@@ -0,0 +1,132 @@
+"""In-process caching utilities.
+
+This module provides a bounded least-recently-used cache with per-entry
+expiration. Cache hits, misses, and evictions are recorded as Prometheus
+counters labeled with the name of the cache, so they show up on the metrics
+endpoint of the application.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, TypeVar
+
+from prometheus_client import Counter
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+cache_hits = Counter("symbiosis_cache_hits_total", "Number of cache hits.", ["cache"])
+cache_misses = Counter(
+    "symbiosis_cache_misses_total", "Number of cache misses.", ["cache"]
+)
+cache_evictions = Counter(
+    "symbiosis_cache_evictions_total",
+    "Number of entries evicted from the cache because it was full.",
+    ["cache"],
+)
+
+
+class TTLCache(Generic[K, V]):
+    """Bounded LRU cache where every entry has its own expiration time.
+
+    The cache is safe to use from multiple threads.
+    """
+
+    _entries: OrderedDict[K, tuple[V, float | None]]
+
+    def __init__(self, name: str, maxsize: int, ttl: float | None = None) -> None:
+        """Initialize the cache.
+
+        Parameters
+        ----------
+        name : str
+            The name of the cache, used as label for the cache metrics.
+        maxsize : int
+            The maximum number of entries in the cache.
+        ttl : float, optional
+            The default time-to-live in seconds for entries. Entries don't
+            expire by default.
+        """
+        self._name = name
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = cache_hits.labels(name)
+        self._misses = cache_misses.labels(name)
+        self._evictions = cache_evictions.labels(name)
+
+    def __len__(self) -> int:
+        """Get the number of entries in the cache."""
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        """Get a value from the cache.
+
+        Parameters
+        ----------
+        key : K
+            The key of the entry.
+
+        Returns
+        -------
+        V | None
+            The cached value, or None when the key is unknown or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                value, expires_at = entry
+
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self._hits.inc()
+                    return value
+
+                del self._entries[key]
+
+        self._misses.inc()
+        return None
+
+    def set(self, key: K, value: V, expires_at: float | None = None) -> None:
+        """Store a value in the cache.
+
+        Parameters
+        ----------
+        key : K
+            The key of the entry.
+        value : V
+            The value to store.
+        expires_at : float, optional
+            The UNIX timestamp at which the entry expires. Defaults to now plus
+            the time-to-live of the cache.
+        """
+        if expires_at is None and self._ttl is not None:
+            expires_at = time.time() + self._ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._evictions.inc()
+
+    def invalidate(self, key: K) -> None:
+        """Remove an entry from the cache.
+
+        Parameters
+        ----------
+        key : K
+            The key of the entry to remove.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
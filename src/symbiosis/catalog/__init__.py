@@ -1 +1,218 @@
-"""The model catalog manages configuration of available models."""
\ No newline at end of file
+"""The model catalog manages configuration of available models.
+
+The catalog is consulted on every request to the universal API, so it's kept
+in memory as an immutable snapshot. Resolving a model is a dictionary lookup
+instead of a database query.
+
+The database notifies the gateway of changes to the catalog through the
+PostgreSQL LISTEN/NOTIFY mechanism. When a notification arrives, the catalog
+loads a new snapshot and swaps it in atomically. Requests in flight keep
+using the snapshot they started with.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from symbiosis.catalog.snapshot import (
+    CatalogSnapshot,
+    Deployment,
+    ModelEntry,
+    ProjectEntry,
+    load_snapshot,
+)
+from symbiosis.database import get_async_engine, get_async_session_factory
+
+__all__ = [
+    "CATALOG_CHANNEL",
+    "CatalogSnapshot",
+    "Deployment",
+    "ModelCatalog",
+    "ModelEntry",
+    "ProjectEntry",
+    "catalog_lifespan",
+    "get_catalog",
+]
+
+logger = logging.getLogger(__name__)
+
+# The notification channel the database triggers publish catalog changes on.
+CATALOG_CHANNEL = "symbiosis_catalog"
+
+
+class ModelCatalog:
+    """Holds the current snapshot of the catalog and reloads it on change."""
+
+    _snapshot: CatalogSnapshot
+    _tasks: list[asyncio.Task]
+
+    def __init__(
+        self,
+        load: Callable[[int], Awaitable[CatalogSnapshot]],
+        resync_interval: float = 300.0,
+        retry_interval: float = 5.0,
+    ) -> None:
+        """Initialize the catalog with an empty snapshot.
+
+        Parameters
+        ----------
+        load : Callable[[int], Awaitable[CatalogSnapshot]]
+            Loads a snapshot of the catalog with the given version.
+        resync_interval : float, optional
+            Seconds after which the catalog is reloaded even without a change
+            notification, by default 300.
+        retry_interval : float, optional
+            Seconds to wait before reconnecting to the database after losing
+            the connection used for notifications, by default 5.
+        """
+        self._load = load
+        self._resync_interval = resync_interval
+        self._retry_interval = retry_interval
+        self._snapshot = CatalogSnapshot()
+        self._changed = asyncio.Event()
+        self._tasks = []
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Get the current snapshot of the catalog."""
+        return self._snapshot
+
+    async def reload(self) -> None:
+        """Load a new snapshot of the catalog and swap it in."""
+        self._snapshot = await self._load(self._snapshot.version + 1)
+
+    def notify_changed(self) -> None:
+        """Schedule a reload of the catalog."""
+        self._changed.set()
+
+    async def _reload_on_change(self) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self._changed.wait(), timeout=self._resync_interval
+                )
+
+            self._changed.clear()
+
+            try:
+                await self.reload()
+            except (OSError, SQLAlchemyError):
+                logger.exception("Failed to reload the model catalog")
+
+    async def _listen_until_disconnected(self, engine: AsyncEngine) -> None:
+        async with engine.connect() as connection:
+            raw_connection = await connection.get_raw_connection()
+            driver_connection = raw_connection.driver_connection
+            terminated = asyncio.Event()
+
+            def on_notification(*_: object) -> None:
+                self.notify_changed()
+
+            def on_termination(*_: object) -> None:
+                terminated.set()
+
+            await driver_connection.add_listener(CATALOG_CHANNEL, on_notification)
+            driver_connection.add_termination_listener(on_termination)
+
+            try:
+                # Changes made while we weren't listening would go unnoticed
+                # otherwise.
+                self.notify_changed()
+                await terminated.wait()
+            finally:
+                driver_connection.remove_termination_listener(on_termination)
+
+                if not driver_connection.is_closed():
+                    await driver_connection.remove_listener(
+                        CATALOG_CHANNEL, on_notification
+                    )
+
+    async def _listen_for_changes(self, engine: AsyncEngine) -> None:
+        while True:
+            try:
+                await self._listen_until_disconnected(engine)
+            except (OSError, SQLAlchemyError):
+                logger.warning("Lost the connection for catalog change notifications")
+
+            await asyncio.sleep(self._retry_interval)
+
+    async def start(self, engine: AsyncEngine) -> None:
+        """Load the catalog and start listening for changes.
+
+        Parameters
+        ----------
+        engine : AsyncEngine
+            The database engine to receive change notifications with.
+        """
+        try:
+            await self.reload()
+        except (OSError, SQLAlchemyError):
+            logger.exception("Failed to load the model catalog")
+
+        self._tasks = [
+            asyncio.create_task(self._reload_on_change()),
+            asyncio.create_task(self._listen_for_changes(engine)),
+        ]
+
+    async def close(self) -> None:
+        """Stop listening for changes."""
+        for task in self._tasks:
+            task.cancel()
+
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        self._tasks = []
+
+
+async def _load_from_database(version: int) -> CatalogSnapshot:
+    async with get_async_session_factory()() as session:
+        return await load_snapshot(session, version)
+
+
+# Global catalog instance (lazily initialized)
+_catalog: ModelCatalog | None = None
+
+
+async def get_catalog() -> ModelCatalog:
+    """Get the shared model catalog.
+
+    Returns
+    -------
+    ModelCatalog
+        The model catalog.
+    """
+    global _catalog
+    if _catalog is None:
+        _catalog = ModelCatalog(load=_load_from_database)
+    return _catalog
+
+
+@asynccontextmanager
+async def catalog_lifespan() -> AsyncIterator[None]:
+    """Keep the model catalog up to date for the lifetime of the application.
+
+    The catalog is loaded on startup and reloaded when the database reports a
+    change. The catalog stays empty when DATABASE_URL is not configured.
+    """
+    global _catalog
+
+    if not os.getenv("DATABASE_URL"):
+        yield
+        return
+
+    catalog = await get_catalog()
+    await catalog.start(get_async_engine())
+
+    try:
+        yield
+    finally:
+        await catalog.close()
+        _catalog = None
@@ -0,0 +1,87 @@
+"""Database models for the model catalog."""
+
+import uuid
+from decimal import Decimal
+
+from sqlmodel import Field, SQLModel
+
+
+class CatalogModel(SQLModel, table=True):
+    """A model available through the gateway.
+
+    Attributes
+    ----------
+    id : uuid.UUID
+        The unique identifier of the model.
+    alias : str
+        The name clients use to request the model.
+    provider : str
+        The name of the provider serving the model.
+    deployment : str
+        The name of the model or deployment at the provider.
+    prompt_token_price : Decimal
+        The price per million prompt tokens.
+    completion_token_price : Decimal
+        The price per million completion tokens.
+    """
+
+    __tablename__ = "catalog_models"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    alias: str = Field(unique=True, max_length=255)
+    provider: str = Field(max_length=100)
+    deployment: str = Field(max_length=255)
+    prompt_token_price: Decimal = Field(
+        default=Decimal(0), max_digits=12, decimal_places=6
+    )
+    completion_token_price: Decimal = Field(
+        default=Decimal(0), max_digits=12, decimal_places=6
+    )
+
+
+class CatalogDeployment(SQLModel, table=True):
+    """An additional deployment serving a model in the catalog.
+
+    Requests for the model are balanced across the deployment configured on
+    the model and its additional deployments, for example the same model
+    deployed in several Azure OpenAI regions.
+
+    Attributes
+    ----------
+    id : uuid.UUID
+        The unique identifier of the deployment.
+    model_id : uuid.UUID
+        The model the deployment serves.
+    provider : str
+        The name of the provider serving the deployment.
+    deployment : str
+        The name of the model or deployment at the provider.
+    """
+
+    __tablename__ = "catalog_deployments"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    model_id: uuid.UUID = Field(foreign_key="catalog_models.id", ondelete="CASCADE")
+    provider: str = Field(max_length=100)
+    deployment: str = Field(max_length=255)
+
+
+class ProjectModel(SQLModel, table=True):
+    """Grants a project access to a model in the catalog.
+
+    Attributes
+    ----------
+    project_id : uuid.UUID
+        The project that can use the model.
+    model_id : uuid.UUID
+        The model the project can use.
+    """
+
+    __tablename__ = "project_models"
+
+    project_id: uuid.UUID = Field(
+        foreign_key="projects.id", primary_key=True, ondelete="CASCADE"
+    )
+    model_id: uuid.UUID = Field(
+        foreign_key="catalog_models.id", primary_key=True, ondelete="CASCADE"
+    )
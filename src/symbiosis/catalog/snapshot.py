@@ -0,0 +1,229 @@
+"""Immutable in-memory snapshot of the model catalog."""
+
+import uuid
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from decimal import Decimal
+from types import MappingProxyType
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from symbiosis.catalog.models import CatalogDeployment, CatalogModel, ProjectModel
+from symbiosis.projects.models import Priority, Project
+
+
+@dataclass(frozen=True)
+class Deployment:
+    """A deployment of a model at a provider."""
+
+    provider: str
+    deployment: str
+
+    def __str__(self) -> str:
+        """Get the name of the deployment, qualified with its provider."""
+        return f"{self.provider}/{self.deployment}"
+
+
+@dataclass(frozen=True)
+class ModelEntry:
+    """Configuration of a model in the catalog.
+
+    The provider and deployment identify the primary deployment of the model.
+    Requests are balanced across it and the additional deployments.
+    """
+
+    alias: str
+    provider: str
+    deployment: str
+    prompt_token_price: Decimal = Decimal(0)
+    completion_token_price: Decimal = Decimal(0)
+    additional_deployments: tuple[Deployment, ...] = ()
+
+    @property
+    def deployments(self) -> tuple[Deployment, ...]:
+        """Get all deployments serving the model, the primary one first."""
+        return (
+            Deployment(self.provider, self.deployment),
+            *self.additional_deployments,
+        )
+
+
+@dataclass(frozen=True)
+class ProjectEntry:
+    """Configuration of a project in the catalog."""
+
+    id: uuid.UUID
+    name: str
+    models: frozenset[str] = frozenset()
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    monthly_budget: Decimal | None = None
+    response_cache_ttl: int | None = None
+    coalesce_requests: bool = False
+    priority: Priority = Priority.STANDARD
+    guardrails: frozenset[str] = frozenset()
+    blocked_terms: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """A consistent, read-only view of the catalog.
+
+    The snapshot is indexed by model alias, project, and provider, so looking
+    up a model is a dictionary lookup. Snapshots are never modified; the
+    catalog replaces the whole snapshot when the configuration changes.
+    """
+
+    models: Mapping[str, ModelEntry] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    projects: Mapping[uuid.UUID, ProjectEntry] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    providers: Mapping[str, tuple[ModelEntry, ...]] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    version: int = 0
+
+    @classmethod
+    def build(
+        cls,
+        models: Iterable[ModelEntry],
+        projects: Iterable[ProjectEntry],
+        version: int = 0,
+    ) -> "CatalogSnapshot":
+        """Build a snapshot with all indexes.
+
+        Parameters
+        ----------
+        models : Iterable[ModelEntry]
+            The models in the catalog.
+        projects : Iterable[ProjectEntry]
+            The projects with the aliases of the models they can use.
+        version : int, optional
+            The version of the snapshot, by default 0.
+
+        Returns
+        -------
+        CatalogSnapshot
+            The indexed snapshot.
+        """
+        models_by_alias = {model.alias: model for model in models}
+        models_by_provider: dict[str, list[ModelEntry]] = {}
+
+        for model in models_by_alias.values():
+            for provider in dict.fromkeys(
+                deployment.provider for deployment in model.deployments
+            ):
+                models_by_provider.setdefault(provider, []).append(model)
+
+        return cls(
+            models=MappingProxyType(models_by_alias),
+            projects=MappingProxyType({project.id: project for project in projects}),
+            providers=MappingProxyType(
+                {
+                    provider: tuple(entries)
+                    for provider, entries in models_by_provider.items()
+                }
+            ),
+            version=version,
+        )
+
+    def resolve(
+        self, alias: str, project_id: uuid.UUID | None = None
+    ) -> ModelEntry | None:
+        """Resolve a model alias to its configuration.
+
+        Parameters
+        ----------
+        alias : str
+            The alias of the model.
+        project_id : uuid.UUID, optional
+            The project requesting the model. When provided, only models the
+            project has access to are resolved.
+
+        Returns
+        -------
+        ModelEntry | None
+            The configuration of the model, or None if it isn't available.
+        """
+        model = self.models.get(alias)
+
+        if model is None or project_id is None:
+            return model
+
+        project = self.projects.get(project_id)
+
+        if project is None or alias not in project.models:
+            return None
+
+        return model
+
+
+async def load_snapshot(session: AsyncSession, version: int = 0) -> CatalogSnapshot:
+    """Load a catalog snapshot from the database.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        The database session to load the catalog with.
+    version : int, optional
+        The version to assign to the snapshot, by default 0.
+
+    Returns
+    -------
+    CatalogSnapshot
+        The snapshot of the catalog.
+    """
+    catalog_models = (await session.exec(select(CatalogModel))).all()
+    projects = (await session.exec(select(Project))).all()
+    project_models = (await session.exec(select(ProjectModel))).all()
+    catalog_deployments = (await session.exec(select(CatalogDeployment))).all()
+
+    aliases = {model.id: model.alias for model in catalog_models}
+    project_aliases: dict[uuid.UUID, set[str]] = {}
+
+    for project_model in project_models:
+        if project_model.model_id in aliases:
+            project_aliases.setdefault(project_model.project_id, set()).add(
+                aliases[project_model.model_id]
+            )
+
+    additional_deployments: dict[uuid.UUID, list[Deployment]] = {}
+
+    for catalog_deployment in catalog_deployments:
+        additional_deployments.setdefault(catalog_deployment.model_id, []).append(
+            Deployment(catalog_deployment.provider, catalog_deployment.deployment)
+        )
+
+    return CatalogSnapshot.build(
+        models=[
+            ModelEntry(
+                alias=model.alias,
+                provider=model.provider,
+                deployment=model.deployment,
+                prompt_token_price=model.prompt_token_price,
+                completion_token_price=model.completion_token_price,
+                additional_deployments=tuple(additional_deployments.get(model.id, ())),
+            )
+            for model in catalog_models
+        ],
+        projects=[
+            ProjectEntry(
+                id=project.id,
+                name=project.name,
+                models=frozenset(project_aliases.get(project.id, ())),
+                requests_per_minute=project.requests_per_minute,
+                tokens_per_minute=project.tokens_per_minute,
+                monthly_budget=project.monthly_budget,
+                response_cache_ttl=project.response_cache_ttl,
+                coalesce_requests=project.coalesce_requests,
+                priority=Priority(project.priority),
+                guardrails=frozenset(project.guardrails),
+                blocked_terms=tuple(project.blocked_terms),
+            )
+            for project in projects
+        ],
+        version=version,
+    )
@@ -1,9 +1,12 @@
 """Symbiosis CLI module."""
 
 import os
+import socket
 import sys
+from enum import StrEnum
 from typing import Annotated
-from typer import Typer, Option
+from click.core import ParameterSource
+from typer import BadParameter, Context, Typer, Option
 import uvicorn
 from alembic.config import Config
 from alembic import command
@@ -12,21 +15,148 @@ app = Typer(help="Symbiosis Gateway")
 database_app = Typer(help="Database management commands")
 
 
+class EventLoop(StrEnum):
+    """Event loop implementations supported by the server."""
+
+    AUTO = "auto"
+    ASYNCIO = "asyncio"
+    UVLOOP = "uvloop"
+
+
+class HttpProtocol(StrEnum):
+    """HTTP protocol implementations supported by the server."""
+
+    AUTO = "auto"
+    H11 = "h11"
+    HTTPTOOLS = "httptools"
+
+
+# Options tuning the production server, which --dev doesn't use.
+SERVER_TUNING_OPTIONS = (
+    "workers",
+    "loop",
+    "http",
+    "timeout_keep_alive",
+    "backlog",
+    "timeout_graceful_shutdown",
+    "reuse_port",
+)
+
+
+def _bind_reuse_port_socket(address: str, port: int, backlog: int) -> socket.socket:
+    """Bind a listening socket with SO_REUSEPORT enabled.
+
+    The worker processes of the server all accept connections from this one
+    socket. SO_REUSEPORT lets other servers bind the same address and port
+    meanwhile, for example a new release starting before the old one stops,
+    and the kernel balances incoming connections between the servers.
+
+    Parameters
+    ----------
+    address : str
+        The address to bind the socket to.
+    port : int
+        The port to bind the socket to.
+    backlog : int
+        The maximum number of pending connections.
+
+    Returns
+    -------
+    socket.socket
+        The listening socket.
+    """
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((address, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
 @app.command()
 def serve(
-    port: Annotated[int, Option(help="The port to bind the server to")] = 4321, 
+    ctx: Context,
+    port: Annotated[int, Option(help="The port to bind the server to")] = 4321,
     address: Annotated[str, Option(help="The address to bind the server to")] = "127.0.0.1",  # noqa: E501
+    dev: Annotated[bool, Option("--dev", help="Run a single process that reloads on code changes")] = False,  # noqa: E501, FBT002
+    workers: Annotated[int | None, Option(help="Number of worker processes, defaults to the number of CPU cores")] = None,  # noqa: E501
+    loop: Annotated[EventLoop, Option(help="The event loop implementation")] = EventLoop.AUTO,  # noqa: E501
+    http: Annotated[HttpProtocol, Option(help="The HTTP protocol implementation")] = HttpProtocol.AUTO,  # noqa: E501
+    timeout_keep_alive: Annotated[int, Option(help="Seconds to keep idle connections open")] = 5,  # noqa: E501
+    backlog: Annotated[int, Option(help="Maximum number of pending connections")] = 2048,  # noqa: E501
+    timeout_graceful_shutdown: Annotated[int, Option(help="Seconds to wait for open requests on shutdown")] = 30,  # noqa: E501
+    reuse_port: Annotated[bool, Option("--reuse-port", help="Bind the port with SO_REUSEPORT, so other servers can share it")] = False,  # noqa: E501, FBT002
 ) -> None:
     """Start the Symbiosis Gateway server.
 
+    By default the server runs in production mode with one worker process per
+    CPU core. Use --dev to run a single process that reloads on code changes.
+
     Parameters
     ----------
+    ctx : Context
+        The context of the command, to tell which options were given.
     port : int
         The port to bind the server to.
     address : str
         The address to bind the server to.
+    dev : bool
+        Run a single process that reloads on code changes.
+    workers : int, optional
+        Number of worker processes, defaults to the number of CPU cores.
+    loop : EventLoop
+        The event loop implementation.
+    http : HttpProtocol
+        The HTTP protocol implementation.
+    timeout_keep_alive : int
+        Seconds to keep idle connections open.
+    backlog : int
+        Maximum number of pending connections.
+    timeout_graceful_shutdown : int
+        Seconds to wait for open requests to complete on shutdown.
+    reuse_port : bool
+        Bind the port with SO_REUSEPORT, so other servers can share it.
+
+    Raises
+    ------
+    BadParameter
+        If tuning options are combined with --dev, or SO_REUSEPORT is not
+        supported on this platform.
     """
-    uvicorn.run("symbiosis.server:app", host=address, port=port, reload=True)
+    if dev:
+        tuning_options = [
+            f"--{name.replace('_', '-')}"
+            for name in SERVER_TUNING_OPTIONS
+            if ctx.get_parameter_source(name) is not ParameterSource.DEFAULT
+        ]
+
+        if tuning_options:
+            msg = f"{', '.join(tuning_options)} cannot be combined with --dev"
+            raise BadParameter(msg, param_hint="--dev")
+
+        uvicorn.run("symbiosis.server:app", host=address, port=port, reload=True)
+        return
+
+    server_options = {
+        "workers": workers or os.cpu_count() or 1,
+        "loop": loop.value,
+        "http": http.value,
+        "timeout_keep_alive": timeout_keep_alive,
+        "backlog": backlog,
+        "timeout_graceful_shutdown": timeout_graceful_shutdown,
+    }
+
+    if reuse_port:
+        if not hasattr(socket, "SO_REUSEPORT"):
+            msg = "SO_REUSEPORT is not supported on this platform"
+            raise BadParameter(msg, param_hint="--reuse-port")
+
+        sock = _bind_reuse_port_socket(address, port, backlog)
+        uvicorn.run("symbiosis.server:app", fd=sock.fileno(), **server_options)
+    else:
+        uvicorn.run("symbiosis.server:app", host=address, port=port, **server_options)
 
 
 @database_app.command()
@@ -4,14 +4,32 @@ This module provides database configuration and connection management
 for the Symbiosis Gateway. It creates a SQLAlchemy engine and exposes
 SQLModel metadata for use with Alembic migrations.
 
+The FastAPI application uses the async engine, backed by asyncpg, so database
+access doesn't occupy a threadpool slot per request. The connection pool of
+the async engine is configured with the following environment variables:
+
+- DATABASE_POOL_SIZE - Number of connections kept open, by default 10.
+- DATABASE_MAX_OVERFLOW - Connections allowed on top of the pool size, by
+  default 20.
+- DATABASE_POOL_PRE_PING - Test connections before using them, by default true.
+- DATABASE_POOL_RECYCLE - Seconds after which connections are replaced, by
+  default 1800.
+- DATABASE_STATEMENT_CACHE_SIZE - Number of prepared statements cached per
+  connection, by default 100.
+
 The database connection string is read from the DATABASE_URL environment
 variable.
 """
 
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 def get_database_url() -> str:
@@ -72,5 +90,158 @@ def get_engine() -> Engine:
     return _engine
 
 
+def _get_int_setting(name: str, default: int) -> int:
+    value = os.getenv(name)
+
+    if value is None:
+        return default
+
+    try:
+        return int(value)
+    except ValueError as err:
+        msg = f"{name} environment variable must be an integer."
+        raise ValueError(msg) from err
+
+
+def _get_bool_setting(name: str, *, default: bool) -> bool:
+    value = os.getenv(name)
+
+    if value is None:
+        return default
+
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_async_database_url() -> str:
+    """Get the database URL for the async engine.
+
+    The URL from the DATABASE_URL environment variable is rewritten to use
+    the asyncpg driver.
+
+    Returns
+    -------
+    str
+        The database connection URL using the asyncpg driver.
+
+    Raises
+    ------
+    ValueError
+        If the DATABASE_URL environment variable is not set.
+    """
+    url = make_url(get_database_url())
+
+    if url.drivername in ("postgres", "postgresql") or url.drivername.startswith(
+        "postgresql+"
+    ):
+        url = url.set(drivername="postgresql+asyncpg")
+
+    return url.render_as_string(hide_password=False)
+
+
+def create_async_db_engine() -> AsyncEngine:
+    """Create and return an async SQLAlchemy engine.
+
+    The connection pool is configured from the environment variables
+    described in the module documentation.
+
+    Returns
+    -------
+    sqlalchemy.ext.asyncio.AsyncEngine
+        The async database engine instance.
+
+    Raises
+    ------
+    ValueError
+        If the DATABASE_URL environment variable is not set or a pool
+        setting is invalid.
+    """
+    url = make_url(get_async_database_url())
+
+    statement_cache_size = _get_int_setting("DATABASE_STATEMENT_CACHE_SIZE", 100)
+    url = url.update_query_dict(
+        {"prepared_statement_cache_size": str(statement_cache_size)}
+    )
+
+    return create_async_engine(
+        url,
+        echo=False,
+        pool_size=_get_int_setting("DATABASE_POOL_SIZE", 10),
+        max_overflow=_get_int_setting("DATABASE_MAX_OVERFLOW", 20),
+        pool_pre_ping=_get_bool_setting("DATABASE_POOL_PRE_PING", default=True),
+        pool_recycle=_get_int_setting("DATABASE_POOL_RECYCLE", 1800),
+    )
+
+
+# Global async engine and session factory (lazily initialized)
+_async_engine: AsyncEngine | None = None
+_async_session_factory: async_sessionmaker[AsyncSession] | None = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Get or create the async database engine.
+
+    Returns
+    -------
+    sqlalchemy.ext.asyncio.AsyncEngine
+        The async database engine instance.
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine()
+    return _async_engine
+
+
+def get_async_session_factory() -> async_sessionmaker[AsyncSession]:
+    """Get or create the factory for async database sessions.
+
+    Returns
+    -------
+    sqlalchemy.ext.asyncio.async_sessionmaker
+        The factory producing sessions bound to the async engine.
+    """
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(
+            get_async_engine(), class_=AsyncSession, expire_on_commit=False
+        )
+    return _async_session_factory
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """Provide an async database session for the duration of a request.
+
+    Yields
+    ------
+    AsyncSession
+        A database session bound to the async engine.
+    """
+    async with get_async_session_factory()() as session:
+        yield session
+
+
+@asynccontextmanager
+async def database_lifespan() -> AsyncIterator[None]:
+    """Manage the async database engine for the lifetime of the application.
+
+    The engine is created on startup so the first request doesn't pay for it,
+    and its connection pool is disposed on shutdown. Nothing happens when
+    DATABASE_URL is not configured.
+    """
+    global _async_engine, _async_session_factory
+
+    if not os.getenv("DATABASE_URL"):
+        yield
+        return
+
+    engine = get_async_engine()
+
+    try:
+        yield
+    finally:
+        await engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
+
+
 # SQLModel metadata for Alembic
 metadata = SQLModel.metadata
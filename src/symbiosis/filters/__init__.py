@@ -8,4 +8,195 @@ We support the following types of filters in the AI gateway:
 - Rate limiting filters
 
 Each filter type is implemented as a separate module within this package.
-"""
\ No newline at end of file
+
+Rate limits are shared between replicas through the store selected with the
+RATE_LIMIT_STORE environment variable: "postgres" (the default when
+DATABASE_URL is set) or "memory" for a single process.
+
+Budgets are enforced when DATABASE_URL is set, because the spend of projects
+is recorded in the cost ledger in the database.
+
+Guardrails check the requests and completions of projects that enable them,
+as described in :mod:`symbiosis.filters.guardrails`. Texts of at least
+GUARDRAIL_OFFLOAD_SIZE characters (32768 by default) are scanned in a pool
+of GUARDRAIL_PROCESSES processes per worker (1 by default).
+
+The filters that apply to a project are compiled into a chain once per
+catalog snapshot, as described in :mod:`symbiosis.filters.pipeline`.
+"""
+
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from symbiosis.database import get_async_engine
+from symbiosis.filters.base import Filter, FilterError, RequestContext
+from symbiosis.filters.budget import (
+    BudgetFilter,
+    SpendTracker,
+    calculate_cost,
+    load_spend_from_database,
+)
+from symbiosis.filters.guardrails import (
+    GuardrailFilter,
+    GuardrailScanner,
+    OutputGuard,
+    StreamGuard,
+    compile_matcher,
+)
+from symbiosis.filters.pipeline import FilterChain, FilterPipeline, compile_chain
+from symbiosis.filters.rate_limit import (
+    InMemoryRateLimitStore,
+    PostgresRateLimitStore,
+    RateLimiter,
+    RateLimitFilter,
+    RateLimitStore,
+)
+from symbiosis.projects.ledger import CostLedger, write_to_database
+
+__all__ = [
+    "BudgetFilter",
+    "Filter",
+    "FilterChain",
+    "FilterError",
+    "FilterPipeline",
+    "GuardrailFilter",
+    "GuardrailScanner",
+    "InMemoryRateLimitStore",
+    "OutputGuard",
+    "PostgresRateLimitStore",
+    "RateLimitFilter",
+    "RateLimitStore",
+    "RateLimiter",
+    "RequestContext",
+    "SpendTracker",
+    "StreamGuard",
+    "calculate_cost",
+    "compile_chain",
+    "compile_matcher",
+    "create_filters",
+    "filters_lifespan",
+    "get_filter_pipeline",
+    "get_filters",
+]
+
+
+def create_rate_limit_store() -> RateLimitStore:
+    """Create the rate limit store configured in the environment.
+
+    Returns
+    -------
+    RateLimitStore
+        The store shared by all replicas of the gateway.
+
+    Raises
+    ------
+    ValueError
+        If RATE_LIMIT_STORE is not a supported store.
+    """
+    default_store = "postgres" if os.getenv("DATABASE_URL") else "memory"
+    store = os.getenv("RATE_LIMIT_STORE", default_store)
+
+    if store == "postgres":
+        return PostgresRateLimitStore(get_async_engine())
+
+    if store == "memory":
+        return InMemoryRateLimitStore()
+
+    msg = f"RATE_LIMIT_STORE must be 'postgres' or 'memory', got '{store}'."
+    raise ValueError(msg)
+
+
+def create_guardrail_scanner() -> GuardrailScanner:
+    """Create the guardrail scanner configured in the environment.
+
+    Returns
+    -------
+    GuardrailScanner
+        The scanner checking requests and completions against guardrails.
+    """
+    return GuardrailScanner(
+        offload_size=int(os.getenv("GUARDRAIL_OFFLOAD_SIZE", "32768")),
+        processes=int(os.getenv("GUARDRAIL_PROCESSES", "1")),
+    )
+
+
+def create_filters() -> list[Filter]:
+    """Create the filters applied to requests, in order.
+
+    Returns
+    -------
+    list[Filter]
+        The filters.
+    """
+    filters: list[Filter] = [
+        RateLimitFilter(RateLimiter(create_rate_limit_store())),
+        GuardrailFilter(create_guardrail_scanner()),
+    ]
+
+    if os.getenv("DATABASE_URL"):
+        ledger = CostLedger(write=write_to_database)
+        tracker = SpendTracker(load_spend=load_spend_from_database, ledger=ledger)
+        filters.append(BudgetFilter(tracker, ledger))
+
+    return filters
+
+
+# Global filter instances (lazily initialized)
+_filters: list[Filter] | None = None
+
+
+def get_filters() -> list[Filter]:
+    """Get the filters applied to requests.
+
+    Returns
+    -------
+    list[Filter]
+        The filters, in the order they're applied.
+    """
+    global _filters
+    if _filters is None:
+        _filters = create_filters()
+    return _filters
+
+
+# Global filter pipeline (lazily initialized)
+_filter_pipeline: FilterPipeline | None = None
+
+
+async def get_filter_pipeline() -> FilterPipeline:
+    """Get the pipeline compiling the filters that apply to each project.
+
+    Returns
+    -------
+    FilterPipeline
+        The shared filter pipeline.
+    """
+    global _filter_pipeline
+    if _filter_pipeline is None:
+        _filter_pipeline = FilterPipeline(get_filters())
+    return _filter_pipeline
+
+
+@asynccontextmanager
+async def filters_lifespan() -> AsyncIterator[None]:
+    """Run the background work of the filters for the lifetime of the app.
+
+    On shutdown, the filters are stopped in reverse order, so for example the
+    remaining cost ledger records are written.
+    """
+    global _filters, _filter_pipeline
+
+    filters = get_filters()
+
+    for request_filter in filters:
+        await request_filter.start()
+
+    try:
+        yield
+    finally:
+        for request_filter in reversed(filters):
+            await request_filter.close()
+
+        _filters = None
+        _filter_pipeline = None
@@ -0,0 +1,151 @@
+"""Base class for filters applied to requests to the universal API."""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, ClassVar
+
+from symbiosis.catalog import Deployment, ModelEntry, ProjectEntry
+from symbiosis.projects import AuthenticatedProject
+from symbiosis.providers.body import RequestBody
+from symbiosis.providers.tokens import TokenUsage
+
+if TYPE_CHECKING:
+    from symbiosis.filters.guardrails import OutputGuard
+
+
+@dataclass
+class RequestContext:
+    """Everything filters know about a request to the universal API.
+
+    Attributes
+    ----------
+    project : AuthenticatedProject
+        The project calling the API and the key it authenticated with.
+    project_settings : ProjectEntry
+        The configuration of the project in the model catalog.
+    model : ModelEntry
+        The requested model.
+    body : RequestBody
+        The request body. Filters that rewrite it replace it, with
+        :meth:`RequestBody.replace`.
+    prompt_tokens : int
+        The estimated number of prompt tokens.
+    cache_hit : bool
+        Whether the response was served from the response cache.
+    coalesced : bool
+        Whether the response was received for an identical request in flight.
+    deployment : Deployment, optional
+        The deployment the request is sent to, once it's chosen.
+    output_guard : OutputGuard, optional
+        Checks the completion against the guardrails of the project, when it
+        has any.
+    completed : bool
+        Whether the filters were told about the outcome of the request.
+    state : dict
+        Data filters keep between handling the request and the response.
+    """
+
+    project: AuthenticatedProject
+    project_settings: ProjectEntry
+    model: ModelEntry
+    body: RequestBody
+    prompt_tokens: int = 0
+    cache_hit: bool = False
+    coalesced: bool = False
+    deployment: Deployment | None = None
+    output_guard: "OutputGuard | None" = None
+    completed: bool = False
+    state: dict[str, Any] = field(default_factory=dict)
+
+
+class FilterError(Exception):
+    """Raised by a filter to reject a request."""
+
+    def __init__(
+        self, status_code: int, detail: str, headers: dict[str, str] | None = None
+    ) -> None:
+        """Initialize the error.
+
+        Parameters
+        ----------
+        status_code : int
+            The HTTP status code to respond with.
+        detail : str
+            The reason the request is rejected.
+        headers : dict[str, str], optional
+            Additional headers for the response, for example Retry-After.
+        """
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+class Filter(ABC):
+    """Inspects requests before they're forwarded to a provider.
+
+    Attributes
+    ----------
+    name : str
+        The name of the filter, used as label for the metrics.
+    cost : int
+        The relative cost of the filter. Cheaper filters run first, so they
+        reject requests before more expensive filters do any work.
+    concurrent : bool
+        Whether the filter doesn't depend on the outcome of other filters,
+        and may run concurrently with other such filters.
+    """
+
+    name: ClassVar[str] = "filter"
+    cost: ClassVar[int] = 0
+    concurrent: ClassVar[bool] = False
+
+    def applies_to(self, project: ProjectEntry) -> bool:  # noqa: ARG002
+        """Check whether the filter applies to the requests of a project.
+
+        Parameters
+        ----------
+        project : ProjectEntry
+            The configuration of the project.
+
+        Returns
+        -------
+        bool
+            True if the filter checks the requests of the project.
+        """
+        return True
+
+    async def start(self) -> None:  # noqa: B027
+        """Start background work of the filter when the application starts."""
+
+    async def close(self) -> None:  # noqa: B027
+        """Stop background work of the filter when the application stops."""
+
+    @abstractmethod
+    async def before_request(self, context: RequestContext) -> None:
+        """Check a request before it's forwarded to the provider.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request.
+
+        Raises
+        ------
+        FilterError
+            If the request is rejected.
+        """
+
+    async def after_response(  # noqa: B027
+        self, context: RequestContext, usage: TokenUsage | None
+    ) -> None:
+        """Process the outcome of a request that passed the filter.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request.
+        usage : TokenUsage | None
+            The tokens used by the request, or None if they're unknown, for
+            example because the provider failed.
+        """
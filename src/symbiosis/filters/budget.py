@@ -0,0 +1,350 @@
+"""Enforcement of the monthly budgets of projects.
+
+The spend of every project in the current month is kept in memory, so
+checking a budget doesn't need the database. Before a request is forwarded,
+its estimated cost is reserved against the budget. When the response is
+complete, the reservation is released and the actual cost is added to the
+spend and recorded in the cost ledger.
+
+Each process periodically reloads the spend from the cost ledger to pick up
+the spend of other replicas. Between reloads, a project can exceed its budget
+by what the other replicas spent in the meantime.
+"""
+
+import asyncio
+import contextlib
+import logging
+import uuid
+from collections.abc import Awaitable, Callable, Mapping
+from datetime import UTC, datetime
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from symbiosis.catalog import ModelEntry
+from symbiosis.database import get_async_engine
+from symbiosis.filters.base import Filter, FilterError, RequestContext
+from symbiosis.projects.ledger import CostLedger, CostRecord
+from symbiosis.projects.models import CostLedgerEntry
+from symbiosis.providers.tokens import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+# Prices in the catalog are per million tokens.
+TOKENS_PER_PRICE_UNIT = Decimal(1_000_000)
+
+
+def calculate_cost(
+    model: ModelEntry, prompt_tokens: int, completion_tokens: int
+) -> Decimal:
+    """Calculate the cost of a request.
+
+    Parameters
+    ----------
+    model : ModelEntry
+        The requested model.
+    prompt_tokens : int
+        The number of prompt tokens.
+    completion_tokens : int
+        The number of completion tokens.
+
+    Returns
+    -------
+    Decimal
+        The cost of the request.
+    """
+    return (
+        prompt_tokens * model.prompt_token_price
+        + completion_tokens * model.completion_token_price
+    ) / TOKENS_PER_PRICE_UNIT
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class SpendTracker:
+    """Keeps the spend of projects in the current month in memory."""
+
+    _spent: dict[uuid.UUID, Decimal]
+    _reserved: dict[uuid.UUID, Decimal]
+    _task: asyncio.Task | None
+
+    def __init__(
+        self,
+        load_spend: Callable[[datetime], Awaitable[dict[uuid.UUID, Decimal]]],
+        ledger: CostLedger,
+        resync_interval: float = 30.0,
+    ) -> None:
+        """Initialize the tracker without any spend.
+
+        Parameters
+        ----------
+        load_spend : Callable[[datetime], Awaitable[dict[uuid.UUID, Decimal]]]
+            Loads the spend per project since the given moment.
+        ledger : CostLedger
+            The ledger with the records that haven't been written yet.
+        resync_interval : float, optional
+            Seconds between reloads of the spend, by default 30.
+        """
+        self._load_spend = load_spend
+        self._ledger = ledger
+        self._resync_interval = resync_interval
+        self._month = _month_start(datetime.now(UTC))
+        self._spent = {}
+        self._reserved = {}
+        self._task = None
+
+    def _roll_over(self) -> None:
+        month = _month_start(datetime.now(UTC))
+
+        if month != self._month:
+            self._month = month
+            self._spent = {}
+
+    def spent(self, project_id: uuid.UUID) -> Decimal:
+        """Get the spend of a project in the current month.
+
+        Parameters
+        ----------
+        project_id : uuid.UUID
+            The project.
+
+        Returns
+        -------
+        Decimal
+            The spend of the project.
+        """
+        self._roll_over()
+        return self._spent.get(project_id, Decimal(0))
+
+    def reserve(self, project_id: uuid.UUID, budget: Decimal, amount: Decimal) -> bool:
+        """Reserve an amount against the budget of a project.
+
+        Parameters
+        ----------
+        project_id : uuid.UUID
+            The project.
+        budget : Decimal
+            The monthly budget of the project.
+        amount : Decimal
+            The amount to reserve.
+
+        Returns
+        -------
+        bool
+            True if the amount was reserved, False if it exceeds the budget.
+        """
+        reserved = self._reserved.get(project_id, Decimal(0))
+
+        if self.spent(project_id) + reserved + amount > budget:
+            return False
+
+        self._reserved[project_id] = reserved + amount
+        return True
+
+    def release(self, project_id: uuid.UUID, amount: Decimal) -> None:
+        """Release an amount reserved against the budget of a project.
+
+        Parameters
+        ----------
+        project_id : uuid.UUID
+            The project.
+        amount : Decimal
+            The reserved amount.
+        """
+        reserved = self._reserved.get(project_id, Decimal(0)) - amount
+
+        if reserved > 0:
+            self._reserved[project_id] = reserved
+        else:
+            self._reserved.pop(project_id, None)
+
+    def add_spend(self, project_id: uuid.UUID, amount: Decimal) -> None:
+        """Add to the spend of a project.
+
+        Parameters
+        ----------
+        project_id : uuid.UUID
+            The project.
+        amount : Decimal
+            The amount spent.
+        """
+        self._spent[project_id] = self.spent(project_id) + amount
+
+    async def resync(self) -> None:
+        """Reload the spend of all projects from the cost ledger.
+
+        Records aren't written to the ledger during the reload, so every
+        record is either loaded or still pending, and counted exactly once.
+        """
+        month = _month_start(datetime.now(UTC))
+
+        async with self._ledger.holding_writes():
+            spent = await self._load_spend(month)
+            pending_costs = self._ledger.pending_costs()
+
+        for project_id, cost in pending_costs.items():
+            spent[project_id] = spent.get(project_id, Decimal(0)) + cost
+
+        self._month = month
+        self._spent = spent
+
+    async def _resync_periodically(self) -> None:
+        while True:
+            try:
+                await self.resync()
+            except (OSError, SQLAlchemyError):
+                logger.exception("Failed to load the spend of projects")
+
+            await asyncio.sleep(self._resync_interval)
+
+    def start(self) -> None:
+        """Start reloading the spend in the background."""
+        self._task = asyncio.create_task(self._resync_periodically())
+
+    async def close(self) -> None:
+        """Stop reloading the spend."""
+        if self._task is not None:
+            self._task.cancel()
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+            self._task = None
+
+
+async def load_spend_from_database(since: datetime) -> dict[uuid.UUID, Decimal]:
+    """Load the spend per project from the cost ledger.
+
+    Parameters
+    ----------
+    since : datetime
+        The start of the period.
+
+    Returns
+    -------
+    dict[uuid.UUID, Decimal]
+        The spend per project since the start of the period.
+    """
+    statement = (
+        select(CostLedgerEntry.project_id, func.sum(CostLedgerEntry.cost))
+        .where(CostLedgerEntry.created_at >= since)
+        .group_by(CostLedgerEntry.project_id)
+    )
+
+    async with get_async_engine().connect() as connection:
+        result = await connection.execute(statement)
+        return dict(result.tuples().all())
+
+
+def _max_completion_tokens(body: Mapping[str, Any]) -> int:
+    for name in ("max_completion_tokens", "max_tokens"):
+        value = body.get(name)
+
+        if isinstance(value, int):
+            return value
+
+    return 0
+
+
+class BudgetFilter(Filter):
+    """Rejects requests of projects that exhausted their monthly budget."""
+
+    name = "budget"
+
+    def __init__(self, tracker: SpendTracker, ledger: CostLedger) -> None:
+        """Initialize the filter.
+
+        Parameters
+        ----------
+        tracker : SpendTracker
+            The tracker with the spend of the projects.
+        ledger : CostLedger
+            The ledger recording the cost of requests.
+        """
+        self._tracker = tracker
+        self._ledger = ledger
+
+    async def start(self) -> None:
+        """Start tracking spend and writing the cost ledger."""
+        self._ledger.start()
+        self._tracker.start()
+
+    async def close(self) -> None:
+        """Stop tracking spend and write the remaining ledger records."""
+        await self._tracker.close()
+        await self._ledger.close()
+
+    async def before_request(self, context: RequestContext) -> None:
+        """Reserve the estimated cost of the request against the budget.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request.
+
+        Raises
+        ------
+        FilterError
+            If the budget of the project is exhausted.
+        """
+        budget = context.project_settings.monthly_budget
+
+        if budget is None:
+            return
+
+        estimate = calculate_cost(
+            context.model, context.prompt_tokens, _max_completion_tokens(context.body)
+        )
+
+        if not self._tracker.reserve(context.project.project_id, budget, estimate):
+            raise FilterError(
+                status_code=402, detail="The budget of the project is exhausted"
+            )
+
+        context.state["budget_reservation"] = estimate
+
+    async def after_response(
+        self, context: RequestContext, usage: TokenUsage | None
+    ) -> None:
+        """Replace the reservation with the actual cost of the request.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request.
+        usage : TokenUsage | None
+            The tokens used by the request.
+        """
+        project_id = context.project.project_id
+        reservation = context.state.pop("budget_reservation", None)
+
+        if reservation is not None:
+            self._tracker.release(project_id, reservation)
+
+        if usage is None:
+            return
+
+        # Responses that didn't need a request to the provider are recorded
+        # with their tokens, but cost nothing.
+        cost = (
+            Decimal(0)
+            if context.cache_hit or context.coalesced
+            else calculate_cost(
+                context.model, usage.prompt_tokens, usage.completion_tokens
+            )
+        )
+        self._tracker.add_spend(project_id, cost)
+        self._ledger.record(
+            CostRecord(
+                project_id=project_id,
+                key_id=context.project.key_id,
+                model=context.model.alias,
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                cost=cost,
+            )
+        )
@@ -0,0 +1,390 @@
+"""Guardrails checking the content of requests and completions.
+
+Projects enable built-in guardrails by name, like "pii" for personal data
+and "prompt_injection" for attempts to override the system prompt, and can
+block terms of their own. All patterns of a project are merged into a single
+regular expression, with a named group per guardrail, so a text is scanned
+once no matter how many guardrails apply. The merged expressions are
+compiled once per configuration and cached.
+
+Scanning runs on the event loop for typical prompts. Texts larger than
+GUARDRAIL_OFFLOAD_SIZE characters are scanned in a process pool, so large
+documents don't block other requests. Every worker of the gateway has a pool
+of its own, so the pools are small by default.
+
+Requests are checked before they're forwarded to a provider. Completions
+are checked as well: streamed completions incrementally, as their chunks
+pass through the gateway, so the stream, and with it the generation by the
+provider, stops as soon as a guardrail rejects the completion.
+"""
+
+import asyncio
+import functools
+import logging
+import re
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+import orjson
+from prometheus_client import Counter
+
+from symbiosis.catalog import ProjectEntry
+from symbiosis.filters.base import Filter, FilterError, RequestContext
+from symbiosis.providers.tokens import content_text
+
+logger = logging.getLogger(__name__)
+
+guardrail_violations = Counter(
+    "symbiosis_guardrail_violations_total",
+    "Number of requests and completions rejected by a guardrail.",
+    ["guardrail", "direction"],
+)
+
+# Patterns of the built-in guardrails, by name.
+GUARDRAIL_PATTERNS: Mapping[str, str] = {
+    "pii": "|".join(
+        (
+            # Email addresses
+            r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-zA-Z]{2,}",
+            # Credit card numbers
+            r"\b(?:\d{4}[ -]?){3}\d{4}\b",
+            # US social security numbers
+            r"\b\d{3}-\d{2}-\d{4}\b",
+            # International bank account numbers
+            r"\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){3,7}(?: ?[A-Z0-9]{1,3})?\b",
+        )
+    ),
+    "prompt_injection": "(?i:"
+    + "|".join(
+        (
+            r"ignore\s+(?:all\s+)?(?:the\s+)?(?:previous|prior|above)\s+"
+            r"(?:instructions|prompts?)",
+            r"disregard\s+(?:all\s+)?(?:the\s+|your\s+)?(?:previous\s+|prior\s+)?"
+            r"(?:instructions|system\s+prompt)",
+            r"(?:reveal|print|repeat)\s+(?:your|the)\s+system\s+prompt",
+            r"you\s+are\s+now\s+(?:in\s+)?(?:developer|DAN)\s+mode",
+        )
+    )
+    + ")",
+}
+
+# Guardrails that only check requests, because completions may discuss them.
+INPUT_GUARDRAILS = frozenset({"prompt_injection"})
+
+# Name of the guardrail matching the blocked terms of a project.
+BLOCKED_TERM = "blocked_term"
+
+# Characters of streamed content kept to find matches spanning chunks.
+STREAM_OVERLAP = 256
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_matcher(
+    guardrails: frozenset[str], blocked_terms: tuple[str, ...], *, output: bool
+) -> re.Pattern[str] | None:
+    """Merge guardrails into a single regular expression.
+
+    Parameters
+    ----------
+    guardrails : frozenset[str]
+        The names of the built-in guardrails. Unknown names are ignored.
+    blocked_terms : tuple[str, ...]
+        Terms that may not occur, as whole words and regardless of case.
+    output : bool
+        Whether the expression checks completions rather than requests.
+
+    Returns
+    -------
+    re.Pattern[str] | None
+        The expression, with a named group per guardrail, or None if no
+        guardrail applies.
+    """
+    groups = []
+
+    for name in sorted(guardrails):
+        if name not in GUARDRAIL_PATTERNS:
+            logger.warning("Ignoring unknown guardrail %s", name)
+        elif not (output and name in INPUT_GUARDRAILS):
+            groups.append(f"(?P<{name}>{GUARDRAIL_PATTERNS[name]})")
+
+    terms = sorted({term for term in blocked_terms if term}, key=len, reverse=True)
+
+    if terms:
+        # Longest terms first, so a term doesn't shadow a longer one.
+        alternatives = "|".join(re.escape(term) for term in terms)
+        groups.append(rf"(?P<{BLOCKED_TERM}>(?i:\b(?:{alternatives})\b))")
+
+    return re.compile("|".join(groups)) if groups else None
+
+
+def scan(pattern: re.Pattern[str], text: str) -> str | None:
+    """Find the first guardrail a text violates.
+
+    Parameters
+    ----------
+    pattern : re.Pattern[str]
+        The merged guardrails, as compiled by compile_matcher.
+    text : str
+        The text to check.
+
+    Returns
+    -------
+    str | None
+        The name of the violated guardrail, or None if the text passes.
+    """
+    match = pattern.search(text)
+    return match.lastgroup if match is not None else None
+
+
+class GuardrailScanner:
+    """Scans texts for guardrail violations, large texts in a process pool."""
+
+    def __init__(self, offload_size: int = 32768, processes: int = 1) -> None:
+        """Initialize the scanner without starting the process pool.
+
+        Parameters
+        ----------
+        offload_size : int, optional
+            The number of characters from which texts are scanned in the
+            process pool, by default 32768.
+        processes : int, optional
+            The number of processes of the pool, by default 1. The pool is
+            started once the first large text is scanned.
+        """
+        self._offload_size = offload_size
+        self._processes = processes
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def scan(self, pattern: re.Pattern[str], text: str) -> str | None:
+        """Find the first guardrail a text violates.
+
+        Parameters
+        ----------
+        pattern : re.Pattern[str]
+            The merged guardrails.
+        text : str
+            The text to check.
+
+        Returns
+        -------
+        str | None
+            The name of the violated guardrail, or None if the text passes.
+        """
+        if len(text) < self._offload_size:
+            return scan(pattern, text)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self._processes)
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, scan, pattern, text
+        )
+
+    def close(self) -> None:
+        """Stop the process pool, if it was started."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+class StreamGuard:
+    """Checks a streamed completion against guardrails as its content arrives.
+
+    The end of the content seen so far is kept, so matches spanning chunks
+    are found as well.
+
+    Attributes
+    ----------
+    violation : str | None
+        The name of the guardrail the completion violates, once it does.
+    """
+
+    def __init__(self, pattern: re.Pattern[str], overlap: int = STREAM_OVERLAP) -> None:
+        """Initialize the guard before any content arrived.
+
+        Parameters
+        ----------
+        pattern : re.Pattern[str]
+            The merged output guardrails of the project.
+        overlap : int, optional
+            The number of characters kept to find matches spanning chunks.
+        """
+        self._pattern = pattern
+        self._overlap = overlap
+        self._tail = ""
+        self.violation: str | None = None
+
+    def feed(self, text: str) -> None:
+        """Check the next piece of content of the completion.
+
+        Parameters
+        ----------
+        text : str
+            The content of a delta of the stream.
+        """
+        if self.violation is not None:
+            return
+
+        window = self._tail + text
+        self.violation = scan(self._pattern, window)
+
+        if self.violation is not None:
+            guardrail_violations.labels(self.violation, "output").inc()
+
+        self._tail = window[-self._overlap :]
+
+
+class OutputGuard:
+    """Checks the completion of a request against the guardrails of a project."""
+
+    def __init__(self, pattern: re.Pattern[str], scanner: GuardrailScanner) -> None:
+        """Initialize the guard.
+
+        Parameters
+        ----------
+        pattern : re.Pattern[str]
+            The merged output guardrails of the project.
+        scanner : GuardrailScanner
+            Scans completions that aren't streamed.
+        """
+        self._pattern = pattern
+        self._scanner = scanner
+
+    def stream(self) -> StreamGuard:
+        """Create a guard checking a streamed completion incrementally.
+
+        Returns
+        -------
+        StreamGuard
+            The guard, to be fed the content of the stream.
+        """
+        return StreamGuard(self._pattern)
+
+    async def check_completion(self, content: bytes) -> bytes | None:
+        """Check a chat completion.
+
+        Parameters
+        ----------
+        content : bytes
+            The JSON response body of the provider.
+
+        Returns
+        -------
+        bytes | None
+            The completion with the content of its choices withheld, and
+            content_filter as their finish reason, or None if the completion
+            passes the guardrails.
+        """
+        try:
+            completion = orjson.loads(content)
+        except ValueError:
+            return None
+
+        if not isinstance(completion, dict) or not isinstance(
+            completion.get("choices"), list
+        ):
+            return None
+
+        text = "\n".join(
+            content_text(choice["message"].get("content"))
+            for choice in completion["choices"]
+            if isinstance(choice, dict) and isinstance(choice.get("message"), dict)
+        )
+        violation = await self._scanner.scan(self._pattern, text)
+
+        if violation is None:
+            return None
+
+        guardrail_violations.labels(violation, "output").inc()
+        completion["choices"] = [
+            {
+                "index": index,
+                "message": {"role": "assistant", "content": None},
+                "finish_reason": "content_filter",
+            }
+            for index in range(len(completion["choices"]))
+        ]
+
+        return orjson.dumps(completion)
+
+
+class GuardrailFilter(Filter):
+    """Rejects requests that violate the guardrails of their project.
+
+    Completions are checked by the output guard the filter sets on the
+    context of the request.
+    """
+
+    name = "guardrails"
+    cost = 10
+    concurrent = True
+
+    def __init__(self, scanner: GuardrailScanner) -> None:
+        """Initialize the filter.
+
+        Parameters
+        ----------
+        scanner : GuardrailScanner
+            Scans requests and completions.
+        """
+        self.scanner = scanner
+
+    def applies_to(self, project: ProjectEntry) -> bool:
+        """Check whether the project has any guardrails.
+
+        Parameters
+        ----------
+        project : ProjectEntry
+            The configuration of the project.
+
+        Returns
+        -------
+        bool
+            True if the project enables guardrails or blocks terms.
+        """
+        return bool(project.guardrails or project.blocked_terms)
+
+    async def close(self) -> None:
+        """Stop the process pool of the scanner."""
+        self.scanner.close()
+
+    async def before_request(self, context: RequestContext) -> None:
+        """Check the messages of a request against the guardrails.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request.
+
+        Raises
+        ------
+        FilterError
+            If a message violates a guardrail of the project.
+        """
+        project = context.project_settings
+        pattern = compile_matcher(
+            project.guardrails, project.blocked_terms, output=False
+        )
+        messages = context.body.get("messages")
+
+        if pattern is not None and isinstance(messages, list):
+            text = "\n".join(
+                content_text(message.get("content"))
+                for message in messages
+                if isinstance(message, dict)
+            )
+            violation = await self.scanner.scan(pattern, text)
+
+            if violation is not None:
+                guardrail_violations.labels(violation, "input").inc()
+                raise FilterError(
+                    status_code=400,
+                    detail=f"The request was rejected by the {violation} guardrail",
+                )
+
+        output_pattern = compile_matcher(
+            project.guardrails, project.blocked_terms, output=True
+        )
+
+        if output_pattern is not None:
+            context.output_guard = OutputGuard(output_pattern, self.scanner)
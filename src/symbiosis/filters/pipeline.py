@@ -0,0 +1,236 @@
+"""Compiles the filters that apply to a project into a chain.
+
+Which filters apply to a request, and in which order, only depends on the
+configuration of the project. The pipeline works this out once per project
+and keeps the resulting chain until the catalog publishes a new snapshot,
+so handling a request only runs the precomputed chain.
+
+The filters of a chain are ordered by their cost, so cheap filters reject
+requests before expensive filters do any work. Consecutive filters that
+don't depend on each other run concurrently, as a single stage. When a
+filter of a stage rejects the request, or the request fails otherwise while
+it's checked, the filters that passed it are told the request failed, so
+they can release what they reserved.
+
+The time every filter takes is recorded in a histogram, so the overhead of
+the gateway can be attributed to the filters.
+"""
+
+import asyncio
+import time
+import uuid
+from collections.abc import Sequence
+
+from prometheus_client import Histogram
+
+from symbiosis.catalog import CatalogSnapshot, ProjectEntry
+from symbiosis.filters.base import Filter, RequestContext
+from symbiosis.providers.tokens import TokenUsage
+
+filter_latency = Histogram(
+    "symbiosis_filter_seconds",
+    "Time taken by a filter to handle a request or its outcome.",
+    ["filter", "phase"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+
+class FilterChain:
+    """The filters that apply to a project, in the order they run."""
+
+    def __init__(self, stages: Sequence[Sequence[Filter]]) -> None:
+        """Initialize the chain.
+
+        Parameters
+        ----------
+        stages : Sequence[Sequence[Filter]]
+            The stages of the chain, in order. The filters of a stage run
+            concurrently.
+        """
+        self.stages = tuple(tuple(stage) for stage in stages)
+        self.filters = tuple(
+            request_filter for stage in self.stages for request_filter in stage
+        )
+        self._before = {
+            request_filter: filter_latency.labels(request_filter.name, "before")
+            for request_filter in self.filters
+        }
+        self._after = {
+            request_filter: filter_latency.labels(request_filter.name, "after")
+            for request_filter in self.filters
+        }
+
+    async def _run_before(
+        self, request_filter: Filter, context: RequestContext, passed: list[Filter]
+    ) -> None:
+        started_at = time.perf_counter()
+
+        try:
+            await request_filter.before_request(context)
+        finally:
+            self._before[request_filter].observe(time.perf_counter() - started_at)
+
+        passed.append(request_filter)
+
+    async def _run_stage(
+        self, stage: tuple[Filter, ...], context: RequestContext, passed: list[Filter]
+    ) -> None:
+        if len(stage) == 1:
+            await self._run_before(stage[0], context, passed)
+            return
+
+        # Filters that pass are added as they finish, so they're released
+        # even when the stage is cancelled.
+        results = await asyncio.gather(
+            *(
+                self._run_before(request_filter, context, passed)
+                for request_filter in stage
+            ),
+            return_exceptions=True,
+        )
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def before_request(self, context: RequestContext) -> None:
+        """Check a request with the filters of the chain.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request.
+
+        Raises
+        ------
+        FilterError
+            If a filter rejects the request. The filters that passed the
+            request are told it failed, as they are when a filter fails
+            otherwise or the request is cancelled.
+        """
+        passed: list[Filter] = []
+
+        try:
+            for stage in self.stages:
+                await self._run_stage(stage, context, passed)
+        except BaseException:
+            await self._complete(passed, context, None)
+            raise
+
+    async def after_response(
+        self, context: RequestContext, usage: TokenUsage | None
+    ) -> None:
+        """Tell the filters of the chain about the outcome of a request.
+
+        Only the first outcome of a request is passed on, so a request that
+        fails after it completed isn't released twice.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request, which passed all filters of the chain.
+        usage : TokenUsage | None
+            The tokens used by the request, or None if they're unknown.
+        """
+        if context.completed:
+            return
+
+        context.completed = True
+        await self._complete(self.filters, context, usage)
+
+    async def _complete(
+        self,
+        filters: Sequence[Filter],
+        context: RequestContext,
+        usage: TokenUsage | None,
+    ) -> None:
+        for request_filter in reversed(filters):
+            started_at = time.perf_counter()
+
+            try:
+                await request_filter.after_response(context, usage)
+            finally:
+                self._after[request_filter].observe(time.perf_counter() - started_at)
+
+
+def compile_chain(filters: Sequence[Filter], project: ProjectEntry) -> FilterChain:
+    """Compile the filters that apply to a project into a chain.
+
+    Parameters
+    ----------
+    filters : Sequence[Filter]
+        All filters of the gateway.
+    project : ProjectEntry
+        The configuration of the project.
+
+    Returns
+    -------
+    FilterChain
+        The filters that apply to the project, cheapest first, with
+        consecutive concurrent filters in a single stage.
+    """
+    applicable = sorted(
+        (
+            request_filter
+            for request_filter in filters
+            if request_filter.applies_to(project)
+        ),
+        key=lambda request_filter: request_filter.cost,
+    )
+    stages: list[list[Filter]] = []
+
+    for request_filter in applicable:
+        if stages and request_filter.concurrent and stages[-1][-1].concurrent:
+            stages[-1].append(request_filter)
+        else:
+            stages.append([request_filter])
+
+    return FilterChain(stages)
+
+
+class FilterPipeline:
+    """Keeps the compiled filter chain of every project."""
+
+    _chains: dict[uuid.UUID, FilterChain]
+
+    def __init__(self, filters: Sequence[Filter]) -> None:
+        """Initialize the pipeline without compiled chains.
+
+        Parameters
+        ----------
+        filters : Sequence[Filter]
+            All filters of the gateway.
+        """
+        self.filters = tuple(filters)
+        self._snapshot: CatalogSnapshot | None = None
+        self._chains = {}
+
+    def chain(self, snapshot: CatalogSnapshot, project_id: uuid.UUID) -> FilterChain:
+        """Get the filter chain of a project.
+
+        The chain is compiled on first use, and compiled again once the
+        catalog publishes a new snapshot.
+
+        Parameters
+        ----------
+        snapshot : CatalogSnapshot
+            The snapshot of the catalog the request is handled with.
+        project_id : uuid.UUID
+            The project making the request.
+
+        Returns
+        -------
+        FilterChain
+            The filters that apply to the project.
+        """
+        if snapshot is not self._snapshot:
+            self._snapshot = snapshot
+            self._chains = {}
+
+        chain = self._chains.get(project_id)
+
+        if chain is None:
+            chain = compile_chain(self.filters, snapshot.projects[project_id])
+            self._chains[project_id] = chain
+
+        return chain
@@ -0,0 +1,516 @@
+"""Rate limiting of requests and tokens per minute.
+
+Limits apply to projects and to individual API keys, and are shared by all
+replicas of the gateway. Each limit is a token bucket in a shared store that
+refills at the limit per minute. Asking the shared store for every request
+would add a network roundtrip to each request, so every process leases a
+slice of the bucket and spends it in memory. Only when its lease runs out
+does a process return to the shared store.
+
+Leases expire after a few seconds, so a process that stops receiving
+requests doesn't keep capacity from the other replicas for long: the unused
+tokens of an expired lease are returned to the bucket. The leases held by all
+processes are bounded by the bucket, so the limit is never exceeded.
+Completion tokens are only known after the request, so they're charged
+afterwards and may take a bucket into debt.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from symbiosis.filters.base import Filter, FilterError, RequestContext
+from symbiosis.providers.tokens import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitStore(ABC):
+    """Shared store holding the token buckets of all gateway replicas."""
+
+    @abstractmethod
+    async def take(
+        self,
+        key: str,
+        capacity: float,
+        refill_rate: float,
+        requested: float,
+        *,
+        allow_debt: bool = False,
+        returned: float = 0.0,
+    ) -> float:
+        """Atomically take tokens from a bucket.
+
+        Parameters
+        ----------
+        key : str
+            The key of the bucket.
+        capacity : float
+            The maximum number of tokens in the bucket.
+        refill_rate : float
+            The number of tokens added to the bucket per second.
+        requested : float
+            The number of tokens to take.
+        allow_debt : bool, optional
+            Take all requested tokens, even if the bucket runs negative.
+        returned : float, optional
+            The number of unused tokens taken earlier to return to the bucket
+            before taking the requested tokens, by default 0.
+
+        Returns
+        -------
+        float
+            The number of tokens taken, at most the requested number.
+        """
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Keeps the token buckets in process memory.
+
+    Only suitable for a single process, for example in development and tests.
+    """
+
+    _buckets: dict[str, tuple[float, float]]
+
+    def __init__(self) -> None:
+        """Initialize the store without buckets."""
+        self._buckets = {}
+
+    async def take(
+        self,
+        key: str,
+        capacity: float,
+        refill_rate: float,
+        requested: float,
+        *,
+        allow_debt: bool = False,
+        returned: float = 0.0,
+    ) -> float:
+        """Atomically take tokens from a bucket.
+
+        Parameters
+        ----------
+        key : str
+            The key of the bucket.
+        capacity : float
+            The maximum number of tokens in the bucket.
+        refill_rate : float
+            The number of tokens added to the bucket per second.
+        requested : float
+            The number of tokens to take.
+        allow_debt : bool, optional
+            Take all requested tokens, even if the bucket runs negative.
+        returned : float, optional
+            The number of unused tokens taken earlier to return to the bucket
+            before taking the requested tokens, by default 0.
+
+        Returns
+        -------
+        float
+            The number of tokens taken, at most the requested number.
+        """
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        available = min(capacity, tokens + (now - updated_at) * refill_rate + returned)
+        granted = requested if allow_debt else max(0.0, min(requested, available))
+        self._buckets[key] = (available - granted, now)
+
+        return granted
+
+
+class PostgresRateLimitStore(RateLimitStore):
+    """Keeps the token buckets in PostgreSQL.
+
+    Buckets live in an unlogged table and are updated by a database function,
+    so taking tokens is a single atomic roundtrip. The clock of the database
+    is used to refill buckets, so replicas don't need synchronized clocks.
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        """Initialize the store.
+
+        Parameters
+        ----------
+        engine : AsyncEngine
+            The database engine.
+        """
+        self._engine = engine
+
+    async def take(
+        self,
+        key: str,
+        capacity: float,
+        refill_rate: float,
+        requested: float,
+        *,
+        allow_debt: bool = False,
+        returned: float = 0.0,
+    ) -> float:
+        """Atomically take tokens from a bucket.
+
+        Parameters
+        ----------
+        key : str
+            The key of the bucket.
+        capacity : float
+            The maximum number of tokens in the bucket.
+        refill_rate : float
+            The number of tokens added to the bucket per second.
+        requested : float
+            The number of tokens to take.
+        allow_debt : bool, optional
+            Take all requested tokens, even if the bucket runs negative.
+        returned : float, optional
+            The number of unused tokens taken earlier to return to the bucket
+            before taking the requested tokens, by default 0.
+
+        Returns
+        -------
+        float
+            The number of tokens taken, at most the requested number.
+        """
+        async with self._engine.begin() as connection:
+            result = await connection.execute(
+                text(
+                    "SELECT take_rate_limit_tokens("
+                    ":key, :capacity, :refill_rate, :requested, :allow_debt, "
+                    ":returned)"
+                ),
+                {
+                    "key": key,
+                    "capacity": capacity,
+                    "refill_rate": refill_rate,
+                    "requested": requested,
+                    "allow_debt": allow_debt,
+                    "returned": returned,
+                },
+            )
+            return float(result.scalar_one())
+
+
+@dataclass
+class _Lease:
+    limit: int
+    tokens: float = 0.0
+    expires_at: float = 0.0
+    # Unused tokens of expired leases, returned with the next roundtrip.
+    returned: float = 0.0
+    expiry: asyncio.TimerHandle | None = None
+
+
+class RateLimiter:
+    """Enforces per-minute limits using leases from a shared store."""
+
+    _leases: dict[str, _Lease]
+    _locks: dict[str, asyncio.Lock]
+    _returns: set[asyncio.Task]
+
+    def __init__(
+        self,
+        store: RateLimitStore,
+        lease_fraction: float = 0.05,
+        lease_ttl: float = 5.0,
+    ) -> None:
+        """Initialize the rate limiter.
+
+        Parameters
+        ----------
+        store : RateLimitStore
+            The shared store with the token buckets.
+        lease_fraction : float, optional
+            The share of the limit leased at once, by default 0.05. Larger
+            leases mean fewer roundtrips to the store, but a less even spread
+            of capacity between replicas.
+        lease_ttl : float, optional
+            Seconds after which unused leased tokens are returned to the
+            store, by default 5.
+        """
+        self._store = store
+        self._lease_fraction = lease_fraction
+        self._lease_ttl = lease_ttl
+        self._leases = {}
+        self._locks = {}
+        self._returns = set()
+
+    def _lease(self, key: str, limit: int) -> _Lease:
+        lease = self._leases.setdefault(key, _Lease(limit))
+        lease.limit = limit
+
+        if lease.expires_at <= time.monotonic() and lease.tokens > 0:
+            lease.returned += lease.tokens
+            lease.tokens = 0.0
+
+        return lease
+
+    async def _take(
+        self, key: str, lease: _Lease, requested: float, *, allow_debt: bool = False
+    ) -> float:
+        returned, lease.returned = lease.returned, 0.0
+
+        try:
+            return await self._store.take(
+                key,
+                capacity=lease.limit,
+                refill_rate=lease.limit / 60,
+                requested=requested,
+                allow_debt=allow_debt,
+                returned=returned,
+            )
+        except BaseException:
+            lease.returned += returned
+            raise
+
+    def _renew(self, key: str, lease: _Lease) -> None:
+        lease.expires_at = time.monotonic() + self._lease_ttl
+
+        if lease.expiry is not None:
+            lease.expiry.cancel()
+
+        lease.expiry = asyncio.get_running_loop().call_later(
+            self._lease_ttl, self._expire, key
+        )
+
+    def _expire(self, key: str) -> None:
+        lease = self._leases[key]
+        lease.expiry = None
+        lease.returned += lease.tokens
+        lease.tokens = 0.0
+
+        task = asyncio.create_task(self._return(key))
+        self._returns.add(task)
+        task.add_done_callback(self._returns.discard)
+
+    async def _return(self, key: str) -> None:
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            lease = self._leases[key]
+
+            if lease.returned <= 0:
+                return
+
+            try:
+                await self._take(key, lease, 0.0)
+            except (OSError, SQLAlchemyError):
+                # The tokens are returned with the next roundtrip instead.
+                logger.warning("Failed to return leased tokens of %s", key)
+
+    async def acquire(self, key: str, limit: int, amount: float) -> bool:
+        """Take tokens from a bucket if enough are available.
+
+        Parameters
+        ----------
+        key : str
+            The key of the bucket.
+        limit : int
+            The number of tokens the bucket refills per minute.
+        amount : float
+            The number of tokens to take.
+
+        Returns
+        -------
+        bool
+            True if the tokens were taken, False if the limit is exceeded.
+        """
+        lease = self._lease(key, limit)
+
+        if lease.tokens >= amount:
+            lease.tokens -= amount
+            return True
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            # Another request may have renewed the lease while we waited.
+            lease = self._lease(key, limit)
+
+            if lease.tokens < amount:
+                requested = max(amount, limit * self._lease_fraction) - lease.tokens
+                lease.tokens += await self._take(key, lease, requested)
+                self._renew(key, lease)
+
+            if lease.tokens < amount:
+                return False
+
+            lease.tokens -= amount
+            return True
+
+    def release(self, key: str, limit: int, amount: float) -> None:
+        """Give back tokens taken for a request that was rejected anyway.
+
+        The tokens are added to the local lease, which returns them to the
+        store once it expires.
+
+        Parameters
+        ----------
+        key : str
+            The key of the bucket.
+        limit : int
+            The number of tokens the bucket refills per minute.
+        amount : float
+            The number of tokens to give back.
+        """
+        self._lease(key, limit).tokens += amount
+
+    async def charge(self, key: str, limit: int, amount: float) -> None:
+        """Take tokens from a bucket, even if it runs into debt.
+
+        Parameters
+        ----------
+        key : str
+            The key of the bucket.
+        limit : int
+            The number of tokens the bucket refills per minute.
+        amount : float
+            The number of tokens to take.
+        """
+        lease = self._lease(key, limit)
+        lease.tokens -= amount
+
+        if lease.tokens < 0:
+            debt = -lease.tokens
+            lease.tokens = 0.0
+            await self._take(key, lease, debt, allow_debt=True)
+
+    async def close(self) -> None:
+        """Return the unused tokens of all leases to the store."""
+        for task in list(self._returns):
+            await task
+
+        for key, lease in self._leases.items():
+            if lease.expiry is not None:
+                lease.expiry.cancel()
+                lease.expiry = None
+
+            lease.returned += lease.tokens
+            lease.tokens = 0.0
+
+            if lease.returned <= 0:
+                continue
+
+            try:
+                await self._take(key, lease, 0.0)
+            except (OSError, SQLAlchemyError):
+                logger.warning("Failed to return leased tokens of %s", key)
+
+
+def _limits(context: RequestContext) -> list[tuple[str, int | None, int | None]]:
+    return [
+        (
+            f"project:{context.project.project_id}",
+            context.project_settings.requests_per_minute,
+            context.project_settings.tokens_per_minute,
+        ),
+        (
+            f"key:{context.project.key_id}",
+            context.project.requests_per_minute,
+            context.project.tokens_per_minute,
+        ),
+    ]
+
+
+class RateLimitFilter(Filter):
+    """Rejects requests exceeding the rate limits of the project or API key."""
+
+    name = "rate_limit"
+    # The limits may be taken from the store shared by the replicas.
+    cost = 10
+    concurrent = True
+
+    def __init__(self, limiter: RateLimiter) -> None:
+        """Initialize the filter.
+
+        Parameters
+        ----------
+        limiter : RateLimiter
+            The rate limiter enforcing the limits.
+        """
+        self._limiter = limiter
+
+    async def close(self) -> None:
+        """Return the unused leased tokens to the shared store."""
+        await self._limiter.close()
+
+    async def before_request(self, context: RequestContext) -> None:
+        """Take a request and the prompt tokens from the rate limits.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request.
+
+        Raises
+        ------
+        FilterError
+            If a rate limit is exceeded. The tokens already taken from the
+            other limits are given back.
+        """
+        taken: list[tuple[str, int, float]] = []
+
+        try:
+            for key, requests_per_minute, tokens_per_minute in _limits(context):
+                if requests_per_minute is not None:
+                    await self._acquire(
+                        taken, f"{key}:requests", requests_per_minute, 1, "requests"
+                    )
+
+                if tokens_per_minute is not None:
+                    await self._acquire(
+                        taken,
+                        f"{key}:tokens",
+                        tokens_per_minute,
+                        context.prompt_tokens,
+                        "tokens",
+                    )
+        except BaseException:
+            for bucket, limit, amount in taken:
+                self._limiter.release(bucket, limit, amount)
+
+            raise
+
+    async def _acquire(
+        self,
+        taken: list[tuple[str, int, float]],
+        bucket: str,
+        limit: int,
+        amount: float,
+        unit: str,
+    ) -> None:
+        if not await self._limiter.acquire(bucket, limit, amount):
+            _raise_rate_limit_exceeded(limit, unit)
+
+        taken.append((bucket, limit, amount))
+
+    async def after_response(
+        self, context: RequestContext, usage: TokenUsage | None
+    ) -> None:
+        """Charge the completion tokens to the token limits.
+
+        Parameters
+        ----------
+        context : RequestContext
+            The request.
+        usage : TokenUsage | None
+            The tokens used by the request.
+        """
+        if usage is None:
+            return
+
+        for key, _, tokens_per_minute in _limits(context):
+            if tokens_per_minute is not None:
+                await self._limiter.charge(
+                    f"{key}:tokens", tokens_per_minute, usage.completion_tokens
+                )
+
+
+def _raise_rate_limit_exceeded(limit: int, unit: str) -> None:
+    # The bucket refills one unit every 60 / limit seconds.
+    retry_after = max(1, math.ceil(60 / limit))
+    raise FilterError(
+        status_code=429,
+        detail=f"Rate limit of {limit} {unit} per minute exceeded",
+        headers={"Retry-After": str(retry_after)},
+    )
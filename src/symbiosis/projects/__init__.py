@@ -9,4 +9,132 @@ For each project we record:
 - Virtual API keys for accessing models through the gateway.
 - A budget for the project, to manage costs.
 - A rate limit to control request frequency.
-"""
\ No newline at end of file
+"""
+
+import os
+from typing import Annotated
+
+from fastapi import Depends, Header, HTTPException
+
+from symbiosis.database import get_async_session_factory
+from symbiosis.projects.keys import (
+    ApiKeyAuthenticator,
+    AuthenticatedProject,
+    generate_api_key,
+    hash_api_key,
+    load_active_keys,
+    revoke_api_key,
+    verify_api_key,
+)
+from symbiosis.projects.models import ApiKey, Priority, Project
+
+__all__ = [
+    "ApiKey",
+    "ApiKeyAuthenticator",
+    "AuthenticatedProject",
+    "Priority",
+    "Project",
+    "authenticated_project",
+    "create_api_key_authenticator",
+    "generate_api_key",
+    "get_api_key_authenticator",
+    "hash_api_key",
+    "revoke_api_key",
+    "verify_api_key",
+]
+
+
+async def _load_active_keys(key_prefix: str) -> list[ApiKey]:
+    async with get_async_session_factory()() as session:
+        return await load_active_keys(session, key_prefix)
+
+
+def create_api_key_authenticator() -> ApiKeyAuthenticator:
+    """Create an ApiKeyAuthenticator from the environment.
+
+    The cache of the authenticator is configured with the environment
+    variables API_KEY_CACHE_SIZE (by default 10000), API_KEY_CACHE_TTL (by
+    default 60 seconds), and API_KEY_NEGATIVE_CACHE_TTL (by default 5 seconds).
+
+    Returns
+    -------
+    ApiKeyAuthenticator
+        A configured authenticator instance.
+
+    Raises
+    ------
+    ValueError
+        If one of the settings is not a number.
+    """
+    try:
+        return ApiKeyAuthenticator(
+            load_keys=_load_active_keys,
+            cache_size=int(os.getenv("API_KEY_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("API_KEY_CACHE_TTL", "60")),
+            negative_ttl=float(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", "5")),
+        )
+    except ValueError as err:
+        msg = "API key cache settings must be numbers."
+        raise ValueError(msg) from err
+
+
+# Global authenticator instance (lazily initialized)
+_api_key_authenticator: ApiKeyAuthenticator | None = None
+
+
+async def get_api_key_authenticator() -> ApiKeyAuthenticator:
+    """Get the shared ApiKeyAuthenticator instance.
+
+    Returns
+    -------
+    ApiKeyAuthenticator
+        The shared authenticator instance.
+    """
+    global _api_key_authenticator
+    if _api_key_authenticator is None:
+        _api_key_authenticator = create_api_key_authenticator()
+    return _api_key_authenticator
+
+
+async def authenticated_project(
+    authenticator: Annotated[ApiKeyAuthenticator, Depends(get_api_key_authenticator)],
+    authorization: Annotated[str | None, Header()] = None,
+    api_key: Annotated[str | None, Header(alias="api-key")] = None,
+) -> AuthenticatedProject:
+    """Authenticate the project calling the API with its virtual API key.
+
+    The key is accepted as Bearer token, like the OpenAI API, or in the
+    api-key header, like the Azure OpenAI API.
+
+    Parameters
+    ----------
+    authenticator : ApiKeyAuthenticator
+        The authenticator instance (injected dependency).
+    authorization : str, optional
+        The authorization header from the request.
+    api_key : str, optional
+        The api-key header from the request.
+
+    Returns
+    -------
+    AuthenticatedProject
+        The authenticated project.
+
+    Raises
+    ------
+    HTTPException
+        If the key is missing, unknown, or revoked.
+    """
+    if authorization is not None and authorization.startswith("Bearer "):
+        key = authorization[len("Bearer ") :]
+    elif api_key is not None:
+        key = api_key
+    else:
+        raise HTTPException(status_code=401, detail="API key required")
+
+    project = await authenticator.authenticate(key)
+
+    if project is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    return project
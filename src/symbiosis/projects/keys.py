@@ -0,0 +1,311 @@
+"""Virtual API keys for projects.
+
+Virtual API keys are stored as salted scrypt hashes. Verifying a key against
+its hash is deliberately slow, so the gateway doesn't verify keys on every
+request. Instead, the result of verifying a key is cached in memory, keyed by
+the SHA-256 digest of the key. Authenticating a client with a known key costs
+a fast hash and a dictionary lookup.
+
+Unknown keys are cached for a short while as well, so clients retrying with a
+wrong key don't cause a database query and a slow hash for every request.
+Revoking a key through this module removes it from the cache of the process
+immediately. Other processes stop accepting the key when its cache entry
+expires.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+import uuid
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from pydantic import BaseModel
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from symbiosis.caching import TTLCache
+from symbiosis.projects.models import ApiKey
+
+# All virtual API keys start with this prefix.
+API_KEY_PREFIX = "sk-"
+
+# Number of characters of the key stored in plain text to look up the key.
+KEY_PREFIX_LENGTH = len(API_KEY_PREFIX) + 8
+
+SCRYPT_N = 2**14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_KEY_LENGTH = 32
+
+
+class AuthenticatedProject(BaseModel):
+    """Represents a project authenticated with a virtual API key.
+
+    Attributes
+    ----------
+    project_id : uuid.UUID
+        The project the key belongs to.
+    key_id : uuid.UUID
+        The key the project authenticated with.
+    requests_per_minute : int, optional
+        The maximum number of requests per minute for the key.
+    tokens_per_minute : int, optional
+        The maximum number of tokens per minute for the key.
+    """
+
+    project_id: uuid.UUID
+    key_id: uuid.UUID
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+
+
+def _scrypt(key: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        key.encode(),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        dklen=SCRYPT_KEY_LENGTH,
+    )
+
+
+def hash_api_key(key: str) -> str:
+    """Hash a virtual API key for storage.
+
+    Parameters
+    ----------
+    key : str
+        The virtual API key.
+
+    Returns
+    -------
+    str
+        The salted hash of the key, including the parameters used to hash it.
+    """
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(key, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+    return "$".join(
+        [
+            "scrypt",
+            str(SCRYPT_N),
+            str(SCRYPT_R),
+            str(SCRYPT_P),
+            base64.b64encode(salt).decode(),
+            base64.b64encode(digest).decode(),
+        ]
+    )
+
+
+def verify_api_key(key: str, key_hash: str) -> bool:
+    """Verify a virtual API key against its stored hash.
+
+    Parameters
+    ----------
+    key : str
+        The virtual API key.
+    key_hash : str
+        The stored hash of the key.
+
+    Returns
+    -------
+    bool
+        True if the key matches the hash.
+    """
+    try:
+        algorithm, n, r, p, salt, digest = key_hash.split("$")
+        expected = base64.b64decode(digest)
+        actual = _scrypt(key, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+
+    return algorithm == "scrypt" and hmac.compare_digest(actual, expected)
+
+
+def generate_api_key() -> tuple[str, str, str]:
+    """Generate a new virtual API key.
+
+    Returns
+    -------
+    tuple[str, str, str]
+        The key to hand out to the client, the prefix of the key, and the hash
+        of the key to store.
+    """
+    key = API_KEY_PREFIX + secrets.token_urlsafe(32)
+    return key, key[:KEY_PREFIX_LENGTH], hash_api_key(key)
+
+
+@dataclass(frozen=True)
+class _Resolution:
+    """The cached outcome of verifying a key, None for unknown keys."""
+
+    project: AuthenticatedProject | None
+
+
+class ApiKeyAuthenticator:
+    """Authenticates projects by their virtual API keys."""
+
+    _pending: dict[bytes, asyncio.Task[_Resolution]]
+    _digests: dict[uuid.UUID, set[bytes]]
+
+    def __init__(
+        self,
+        load_keys: Callable[[str], Awaitable[Sequence[ApiKey]]],
+        cache_size: int = 10000,
+        ttl: float = 60.0,
+        negative_ttl: float = 5.0,
+    ) -> None:
+        """Initialize the authenticator.
+
+        Parameters
+        ----------
+        load_keys : Callable[[str], Awaitable[Sequence[ApiKey]]]
+            Loads the active keys with the given prefix.
+        cache_size : int, optional
+            Maximum number of keys to keep in the cache, by default 10000.
+        ttl : float, optional
+            Seconds to cache a verified key, by default 60. This bounds the
+            time other processes accept a revoked key.
+        negative_ttl : float, optional
+            Seconds to cache an unknown key, by default 5.
+        """
+        self._load_keys = load_keys
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._cache: TTLCache[bytes, _Resolution] = TTLCache(
+            "api_key", maxsize=cache_size
+        )
+        self._pending = {}
+        self._digests = {}
+
+    async def authenticate(self, key: str) -> AuthenticatedProject | None:
+        """Authenticate a project with a virtual API key.
+
+        Concurrent requests with the same uncached key share a single lookup.
+        The lookup runs in its own task, so it completes for the other
+        waiting requests when the request that started it is cancelled.
+
+        Parameters
+        ----------
+        key : str
+            The virtual API key.
+
+        Returns
+        -------
+        AuthenticatedProject | None
+            The authenticated project, or None if the key is unknown or revoked.
+        """
+        digest = hashlib.sha256(key.encode()).digest()
+
+        resolution = self._cache.get(digest)
+
+        if resolution is not None:
+            return resolution.project
+
+        task = self._pending.get(digest)
+
+        if task is None:
+            task = asyncio.ensure_future(self._lookup(digest, key))
+            self._pending[digest] = task
+            task.add_done_callback(lambda done: self._forget(digest, done))
+
+        return (await asyncio.shield(task)).project
+
+    async def _lookup(self, digest: bytes, key: str) -> _Resolution:
+        resolution = await self._resolve(key)
+        self._store(digest, resolution)
+        return resolution
+
+    def _forget(self, digest: bytes, task: asyncio.Task[_Resolution]) -> None:
+        self._pending.pop(digest, None)
+
+        # Retrieve the exception, so it isn't reported as unhandled when all
+        # requests waiting for it went away.
+        if not task.cancelled():
+            task.exception()
+
+    async def _resolve(self, key: str) -> _Resolution:
+        if not key.startswith(API_KEY_PREFIX):
+            return _Resolution(project=None)
+
+        for api_key in await self._load_keys(key[:KEY_PREFIX_LENGTH]):
+            if await asyncio.to_thread(verify_api_key, key, api_key.key_hash):
+                return _Resolution(
+                    project=AuthenticatedProject(
+                        project_id=api_key.project_id,
+                        key_id=api_key.id,
+                        requests_per_minute=api_key.requests_per_minute,
+                        tokens_per_minute=api_key.tokens_per_minute,
+                    )
+                )
+
+        return _Resolution(project=None)
+
+    def _store(self, digest: bytes, resolution: _Resolution) -> None:
+        ttl = self._ttl if resolution.project is not None else self._negative_ttl
+        self._cache.set(digest, resolution, expires_at=time.time() + ttl)
+
+        if resolution.project is not None:
+            self._digests.setdefault(resolution.project.key_id, set()).add(digest)
+
+    def invalidate(self, key_id: uuid.UUID) -> None:
+        """Remove a key from the cache, for example after revoking it.
+
+        Parameters
+        ----------
+        key_id : uuid.UUID
+            The identifier of the key.
+        """
+        for digest in self._digests.pop(key_id, ()):
+            self._cache.invalidate(digest)
+
+
+async def load_active_keys(session: AsyncSession, key_prefix: str) -> list[ApiKey]:
+    """Load the keys with a prefix that haven't been revoked.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        The database session to load the keys with.
+    key_prefix : str
+        The prefix of the key.
+
+    Returns
+    -------
+    list[ApiKey]
+        The active keys with the prefix.
+    """
+    statement = select(ApiKey).where(
+        ApiKey.key_prefix == key_prefix,
+        ApiKey.revoked_at.is_(None),  # type: ignore[union-attr]
+    )
+    return list((await session.exec(statement)).all())
+
+
+async def revoke_api_key(
+    session: AsyncSession, authenticator: ApiKeyAuthenticator, key_id: uuid.UUID
+) -> None:
+    """Revoke a virtual API key.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        The database session to revoke the key with.
+    authenticator : ApiKeyAuthenticator
+        The authenticator that may have cached the key.
+    key_id : uuid.UUID
+        The identifier of the key.
+    """
+    api_key = await session.get(ApiKey, key_id)
+
+    if api_key is not None and api_key.revoked_at is None:
+        api_key.revoked_at = datetime.now(UTC)
+        await session.commit()
+
+    authenticator.invalidate(key_id)
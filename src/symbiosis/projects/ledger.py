@@ -0,0 +1,193 @@
+"""The cost ledger records the cost of every request to the gateway.
+
+Writing a ledger entry per request would add a database transaction to every
+request. Instead, entries are collected in memory and written in batches by
+a background task, either when a batch is full or after a short interval.
+Entries that can't be written are kept for the next attempt, up to a limit.
+"""
+
+import asyncio
+import contextlib
+import logging
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from prometheus_client import Counter
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from symbiosis.database import get_async_engine
+from symbiosis.projects.models import CostLedgerEntry
+
+logger = logging.getLogger(__name__)
+
+ledger_entries_dropped = Counter(
+    "symbiosis_cost_ledger_dropped_total",
+    "Number of cost ledger entries dropped because too many were pending.",
+)
+
+
+@dataclass(frozen=True)
+class CostRecord:
+    """The cost of a single request, waiting to be written to the ledger."""
+
+    project_id: uuid.UUID
+    key_id: uuid.UUID
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost: Decimal
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+
+
+class CostLedger:
+    """Writes cost records to the database in batches."""
+
+    _pending: list[CostRecord]
+    _in_flight: list[CostRecord]
+    _task: asyncio.Task | None
+
+    def __init__(
+        self,
+        write: Callable[[list[CostRecord]], Awaitable[None]],
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_pending: int = 100000,
+    ) -> None:
+        """Initialize the ledger.
+
+        Parameters
+        ----------
+        write : Callable[[list[CostRecord]], Awaitable[None]]
+            Writes a batch of records to the database.
+        batch_size : int, optional
+            Number of records that triggers a write, by default 500.
+        flush_interval : float, optional
+            Maximum seconds records wait before they're written, by default 1.
+        max_pending : int, optional
+            Maximum number of records kept in memory when writes fail, by
+            default 100000. The oldest records are dropped beyond this limit.
+        """
+        self._write = write
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending = []
+        self._in_flight = []
+        self._batch_full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def __len__(self) -> int:
+        """Get the number of records that haven't been written yet."""
+        return len(self._pending) + len(self._in_flight)
+
+    def record(self, record: CostRecord) -> None:
+        """Add a record to the ledger.
+
+        Parameters
+        ----------
+        record : CostRecord
+            The cost of a request.
+        """
+        self._pending.append(record)
+
+        if len(self._pending) >= self._batch_size:
+            self._batch_full.set()
+
+        if len(self._pending) > self._max_pending:
+            del self._pending[0]
+            ledger_entries_dropped.inc()
+
+    def pending_costs(self) -> dict[uuid.UUID, Decimal]:
+        """Get the cost per project of records that haven't been written yet.
+
+        Returns
+        -------
+        dict[uuid.UUID, Decimal]
+            The unwritten cost per project.
+        """
+        costs: dict[uuid.UUID, Decimal] = {}
+
+        for record in (*self._in_flight, *self._pending):
+            costs[record.project_id] = costs.get(record.project_id, 0) + record.cost
+
+        return costs
+
+    @contextlib.asynccontextmanager
+    async def holding_writes(self) -> AsyncIterator[None]:
+        """Keep records from being written while the context is active.
+
+        A write in progress completes first. Records that are pending in the
+        context are therefore neither written nor only partly written while
+        the database is read.
+        """
+        async with self._flush_lock:
+            yield
+
+    async def flush(self) -> None:
+        """Write all pending records to the database.
+
+        Records that fail to write are kept for the next attempt.
+        """
+        async with self._flush_lock:
+            self._in_flight, self._pending = self._pending, []
+
+            if not self._in_flight:
+                return
+
+            try:
+                await self._write(self._in_flight)
+            except (OSError, SQLAlchemyError):
+                logger.exception("Failed to write the cost ledger")
+                self._pending[:0] = self._in_flight
+                overflow = len(self._pending) - self._max_pending
+
+                if overflow > 0:
+                    del self._pending[:overflow]
+                    ledger_entries_dropped.inc(overflow)
+            finally:
+                self._in_flight = []
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self._batch_full.wait(), timeout=self._flush_interval
+                )
+
+            self._batch_full.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Start writing records in the background."""
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """Stop the background task and write the remaining records."""
+        if self._task is not None:
+            self._task.cancel()
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+            self._task = None
+
+        await self.flush()
+
+
+async def write_to_database(records: list[CostRecord]) -> None:
+    """Insert cost records into the cost_ledger table in one statement.
+
+    Parameters
+    ----------
+    records : list[CostRecord]
+        The records to insert.
+    """
+    async with get_async_engine().begin() as connection:
+        await connection.execute(
+            insert(CostLedgerEntry), [asdict(record) for record in records]
+        )
@@ -0,0 +1,161 @@
+"""Database models for projects."""
+
+import uuid
+from datetime import UTC, datetime
+from decimal import Decimal
+from enum import StrEnum
+
+from sqlalchemy import JSON, DateTime
+from sqlmodel import Field, Index, SQLModel
+
+
+class Priority(StrEnum):
+    """The priority class of the requests of a project.
+
+    Interactive requests wait the shortest and get the largest share of a
+    model when requests queue, batch requests wait the longest and get the
+    smallest share.
+    """
+
+    INTERACTIVE = "interactive"
+    STANDARD = "standard"
+    BATCH = "batch"
+
+
+class Project(SQLModel, table=True):
+    """A project using models through the gateway.
+
+    Attributes
+    ----------
+    id : uuid.UUID
+        The unique identifier of the project.
+    name : str
+        The unique name of the project.
+    description : str, optional
+        A description of the project.
+    requests_per_minute : int, optional
+        The maximum number of requests per minute for the project.
+    tokens_per_minute : int, optional
+        The maximum number of tokens per minute for the project.
+    monthly_budget : Decimal, optional
+        The maximum spend of the project per calendar month.
+    response_cache_ttl : int, optional
+        Seconds deterministic responses are cached for the project. Responses
+        aren't cached when unset.
+    coalesce_requests : bool
+        Whether identical requests in flight at the same time share a single
+        request to the provider.
+    priority : str
+        The priority class of the requests of the project, one of the
+        Priority values.
+    guardrails : list[str]
+        The names of the built-in guardrails checking the requests and
+        completions of the project, like "pii" or "prompt_injection".
+    blocked_terms : list[str]
+        Terms the requests and completions of the project may not contain.
+    created_at : datetime
+        The moment the project was created.
+    """
+
+    __tablename__ = "projects"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    name: str = Field(unique=True, max_length=255)
+    description: str | None = None
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    monthly_budget: Decimal | None = Field(
+        default=None, max_digits=12, decimal_places=2
+    )
+    response_cache_ttl: int | None = None
+    coalesce_requests: bool = False
+    priority: str = Field(default=Priority.STANDARD, max_length=16)
+    guardrails: list[str] = Field(
+        default_factory=list,
+        sa_type=JSON,  # type: ignore[call-overload]
+    )
+    blocked_terms: list[str] = Field(
+        default_factory=list,
+        sa_type=JSON,  # type: ignore[call-overload]
+    )
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+
+class ApiKey(SQLModel, table=True):
+    """A virtual API key that grants a project access to the gateway.
+
+    Only a salted hash of the key is stored. The prefix of the key is stored
+    in plain text, so the key can be found without hashing it against every
+    stored key.
+
+    Attributes
+    ----------
+    id : uuid.UUID
+        The unique identifier of the key.
+    project_id : uuid.UUID
+        The project the key belongs to.
+    key_prefix : str
+        The first characters of the key.
+    key_hash : str
+        The salted hash of the key.
+    requests_per_minute : int, optional
+        The maximum number of requests per minute for the key.
+    tokens_per_minute : int, optional
+        The maximum number of tokens per minute for the key.
+    created_at : datetime
+        The moment the key was created.
+    revoked_at : datetime, optional
+        The moment the key was revoked.
+    """
+
+    __tablename__ = "api_keys"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    project_id: uuid.UUID = Field(foreign_key="projects.id", ondelete="CASCADE")
+    key_prefix: str = Field(index=True, max_length=16)
+    key_hash: str = Field(max_length=255)
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    revoked_at: datetime | None = None
+
+
+class CostLedgerEntry(SQLModel, table=True):
+    """The cost of a single request to the gateway.
+
+    Attributes
+    ----------
+    id : int
+        The unique identifier of the entry.
+    project_id : uuid.UUID
+        The project that made the request.
+    key_id : uuid.UUID
+        The API key the request was made with.
+    model : str
+        The alias of the requested model.
+    prompt_tokens : int
+        The number of prompt tokens.
+    completion_tokens : int
+        The number of completion tokens.
+    cost : Decimal
+        The cost of the request.
+    created_at : datetime
+        The moment the request completed.
+    """
+
+    __tablename__ = "cost_ledger"
+    __table_args__ = (
+        Index("ix_cost_ledger_project_id_created_at", "project_id", "created_at"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    project_id: uuid.UUID = Field(foreign_key="projects.id", ondelete="CASCADE")
+    key_id: uuid.UUID
+    model: str = Field(max_length=255)
+    prompt_tokens: int
+    completion_tokens: int
+    cost: Decimal = Field(max_digits=14, decimal_places=8)
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(UTC),
+        sa_type=DateTime(timezone=True),  # type: ignore[call-overload]
+    )
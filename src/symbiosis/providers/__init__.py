@@ -4,4 +4,404 @@ Currently we support the following LLM providers:
 
 - OpenAI
 - Azure OpenAI
-"""
\ No newline at end of file
+
+Providers are configured with the following environment variables:
+
+- OPENAI_API_KEY - Enables the OpenAI provider.
+- OPENAI_BASE_URL - The base URL of the OpenAI API, optional.
+- AZURE_OPENAI_ENDPOINT - Enables the Azure OpenAI provider.
+- AZURE_OPENAI_API_KEY - The API key of the Azure OpenAI resource.
+- AZURE_OPENAI_API_VERSION - The Azure OpenAI API version, optional.
+- AZURE_OPENAI_RESOURCES - Comma separated names of additional Azure OpenAI
+  resources, for example in other regions. Each resource is configured with
+  the variables above, with the name of the resource after AZURE_OPENAI, for
+  example AZURE_OPENAI_WESTEUROPE_ENDPOINT. The provider of the resource is
+  named azure-openai-westeurope.
+
+Request bodies are parsed once and forwarded as received, unless a field has
+to be replaced, as described in :mod:`symbiosis.providers.body`. Each
+provider uses a shared HTTP client configured as described in
+:mod:`symbiosis.providers.http`. Identical requests in flight at the same time
+can share a single request to the provider, as described in
+:mod:`symbiosis.providers.coalescing`.
+
+Requests for models served by several deployments are balanced across them
+as described in :mod:`symbiosis.providers.balancing`. The load balancer is
+configured with the following environment variables:
+
+- LOAD_BALANCER_DECAY_TIME - Seconds over which latency samples lose their
+  weight, by default 10.
+- LOAD_BALANCER_FAILURE_THRESHOLD - Consecutive failed requests that eject a
+  deployment, by default 3.
+- LOAD_BALANCER_EJECTION_TIME - Seconds the first ejection lasts, by
+  default 30.
+- LOAD_BALANCER_MAX_EJECTION_TIME - Maximum seconds an ejection lasts, by
+  default 300.
+- LOAD_BALANCER_RAMP_UP_TIME - Seconds over which an ejected deployment is
+  admitted again, by default 30.
+
+Failed requests are retried, requests to providers that keep failing are cut
+off by circuit breakers, and slow requests can be hedged, as described in
+:mod:`symbiosis.providers.resilience`. This is configured with the following
+environment variables:
+
+- PROVIDER_MAX_ATTEMPTS - Attempts per request, including the first one, by
+  default 3.
+- PROVIDER_RETRY_BASE_DELAY - Seconds the first retry waits at most, by
+  default 0.5. The delay doubles with every retry.
+- PROVIDER_RETRY_MAX_DELAY - Maximum seconds a retry waits, by default 10.
+- PROVIDER_RETRY_BUDGET - Retries each request earns, by default 0.2.
+- PROVIDER_RETRY_MIN_PER_SECOND - Retries allowed every second regardless of
+  the requests, by default 1.
+- PROVIDER_CIRCUIT_FAILURE_THRESHOLD - Consecutive failures that open the
+  circuit of a provider, by default 5.
+- PROVIDER_CIRCUIT_RESET_TIMEOUT - Seconds the circuit stays open, by
+  default 30.
+- PROVIDER_HEDGE_PERCENTILE - Hedge non-streaming requests slower than this
+  percentile of the recent latency, for example 0.95. Unset by default,
+  which disables hedging.
+- PROVIDER_HEDGE_MIN_DELAY - Minimum seconds before a request is hedged, by
+  default 0.5.
+
+Requests for throttled or busy models wait in a queue, as described in
+:mod:`symbiosis.providers.admission`. The queue is configured with the
+following environment variables:
+
+- ADMISSION_MAX_CONCURRENCY - Requests waiting for a response of a model at
+  the same time. Unlimited by default.
+- ADMISSION_MAX_QUEUE_SIZE - Requests queued per model, by default 1000.
+- ADMISSION_MAX_QUEUE_TIME_INTERACTIVE, ADMISSION_MAX_QUEUE_TIME_STANDARD,
+  ADMISSION_MAX_QUEUE_TIME_BATCH - Seconds requests of the priority class
+  wait at most, by default 5, 30, and 300.
+- ADMISSION_THROTTLE_TIME - Seconds a throttled model is paused when the
+  provider doesn't say how long, by default 1.
+"""
+
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from symbiosis.providers.azure_openai import AzureOpenAIProvider
+from symbiosis.catalog import Deployment
+from symbiosis.projects.models import Priority
+from symbiosis.providers.admission import (
+    DEFAULT_MAX_QUEUE_TIMES,
+    AdmissionRejectedError,
+    AdmissionScheduler,
+)
+from symbiosis.providers.balancing import Attempt, LoadBalancer
+from symbiosis.providers.base import CompletedResponse, Provider, read_response
+from symbiosis.providers.body import RequestBody
+from symbiosis.providers.coalescing import RequestCoalescer, request_fingerprint
+from symbiosis.providers.http import create_http_client
+from symbiosis.providers.openai import OpenAIProvider
+from symbiosis.providers.resilience import (
+    CircuitOpenError,
+    Dispatcher,
+    RetryBudget,
+    RetryPolicy,
+)
+
+__all__ = [
+    "AdmissionRejectedError",
+    "AdmissionScheduler",
+    "Attempt",
+    "AzureOpenAIProvider",
+    "CircuitOpenError",
+    "CompletedResponse",
+    "Dispatcher",
+    "LoadBalancer",
+    "OpenAIProvider",
+    "Provider",
+    "RequestBody",
+    "RequestCoalescer",
+    "RetryBudget",
+    "RetryPolicy",
+    "create_admission_scheduler",
+    "create_dispatcher",
+    "create_load_balancer",
+    "create_providers",
+    "get_admission_scheduler",
+    "get_dispatcher",
+    "get_load_balancer",
+    "get_providers",
+    "get_request_coalescer",
+    "providers_lifespan",
+    "read_response",
+    "request_fingerprint",
+]
+
+
+def create_providers() -> dict[str, Provider]:
+    """Create the providers configured in the environment.
+
+    Returns
+    -------
+    dict[str, Provider]
+        The configured providers, keyed by provider name.
+
+    Raises
+    ------
+    ValueError
+        If a provider is only partially configured.
+    """
+    providers: dict[str, Provider] = {}
+
+    if api_key := os.getenv("OPENAI_API_KEY"):
+        provider = OpenAIProvider(
+            create_http_client("openai", "OPENAI"),
+            api_key=api_key,
+            base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        )
+        providers[provider.name] = provider
+
+    if provider := _create_azure_openai_provider("azure-openai", "AZURE_OPENAI"):
+        providers[provider.name] = provider
+
+    for resource in os.getenv("AZURE_OPENAI_RESOURCES", "").split(","):
+        if resource := resource.strip():
+            env_prefix = f"AZURE_OPENAI_{resource.upper()}"
+            provider = _create_azure_openai_provider(
+                f"azure-openai-{resource.lower()}", env_prefix
+            )
+
+            if provider is None:
+                msg = f"{env_prefix}_ENDPOINT environment variable is not set"
+                raise ValueError(msg)
+
+            providers[provider.name] = provider
+
+    return providers
+
+
+def _create_azure_openai_provider(
+    name: str, env_prefix: str
+) -> AzureOpenAIProvider | None:
+    endpoint = os.getenv(f"{env_prefix}_ENDPOINT")
+
+    if not endpoint:
+        return None
+
+    api_key = os.getenv(f"{env_prefix}_API_KEY")
+
+    if not api_key:
+        msg = f"{env_prefix}_API_KEY environment variable is not set"
+        raise ValueError(msg)
+
+    return AzureOpenAIProvider(
+        create_http_client(name, env_prefix),
+        endpoint=endpoint,
+        api_key=api_key,
+        api_version=os.getenv(f"{env_prefix}_API_VERSION", "2024-10-21"),
+        name=name,
+    )
+
+
+# Global provider instances (lazily initialized)
+_providers: dict[str, Provider] | None = None
+
+
+async def get_providers() -> dict[str, Provider]:
+    """Get the configured providers.
+
+    Returns
+    -------
+    dict[str, Provider]
+        The configured providers, keyed by provider name.
+    """
+    global _providers
+    if _providers is None:
+        _providers = create_providers()
+    return _providers
+
+
+def create_load_balancer() -> LoadBalancer[Deployment]:
+    """Create the load balancer configured in the environment.
+
+    Returns
+    -------
+    LoadBalancer[Deployment]
+        The load balancer for the deployments of the models.
+
+    Raises
+    ------
+    ValueError
+        If one of the settings is invalid.
+    """
+    try:
+        return LoadBalancer(
+            decay_time=float(os.getenv("LOAD_BALANCER_DECAY_TIME", "10")),
+            failure_threshold=int(os.getenv("LOAD_BALANCER_FAILURE_THRESHOLD", "3")),
+            ejection_time=float(os.getenv("LOAD_BALANCER_EJECTION_TIME", "30")),
+            max_ejection_time=float(
+                os.getenv("LOAD_BALANCER_MAX_EJECTION_TIME", "300")
+            ),
+            ramp_up_time=float(os.getenv("LOAD_BALANCER_RAMP_UP_TIME", "30")),
+        )
+    except ValueError as err:
+        msg = f"Invalid load balancer setting: {err}"
+        raise ValueError(msg) from err
+
+
+# Global load balancer (lazily initialized)
+_load_balancer: LoadBalancer[Deployment] | None = None
+
+
+def get_load_balancer() -> LoadBalancer[Deployment]:
+    """Get the shared LoadBalancer instance.
+
+    Returns
+    -------
+    LoadBalancer[Deployment]
+        The shared load balancer.
+    """
+    global _load_balancer
+    if _load_balancer is None:
+        _load_balancer = create_load_balancer()
+    return _load_balancer
+
+
+def create_dispatcher() -> Dispatcher:
+    """Create the dispatcher configured in the environment.
+
+    Returns
+    -------
+    Dispatcher
+        The dispatcher sending requests through the shared load balancer.
+
+    Raises
+    ------
+    ValueError
+        If one of the settings is invalid.
+    """
+    try:
+        hedge_percentile = os.getenv("PROVIDER_HEDGE_PERCENTILE")
+
+        return Dispatcher(
+            get_load_balancer(),
+            policy=RetryPolicy(
+                max_attempts=int(os.getenv("PROVIDER_MAX_ATTEMPTS", "3")),
+                base_delay=float(os.getenv("PROVIDER_RETRY_BASE_DELAY", "0.5")),
+                max_delay=float(os.getenv("PROVIDER_RETRY_MAX_DELAY", "10")),
+            ),
+            budget=RetryBudget(
+                ratio=float(os.getenv("PROVIDER_RETRY_BUDGET", "0.2")),
+                min_per_second=float(os.getenv("PROVIDER_RETRY_MIN_PER_SECOND", "1")),
+            ),
+            failure_threshold=int(os.getenv("PROVIDER_CIRCUIT_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("PROVIDER_CIRCUIT_RESET_TIMEOUT", "30")),
+            hedge_percentile=float(hedge_percentile) if hedge_percentile else None,
+            min_hedge_delay=float(os.getenv("PROVIDER_HEDGE_MIN_DELAY", "0.5")),
+        )
+    except ValueError as err:
+        msg = f"Invalid provider resilience setting: {err}"
+        raise ValueError(msg) from err
+
+
+# Global dispatcher (lazily initialized)
+_dispatcher: Dispatcher | None = None
+
+
+async def get_dispatcher() -> Dispatcher:
+    """Get the shared Dispatcher instance.
+
+    Returns
+    -------
+    Dispatcher
+        The shared dispatcher.
+    """
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = create_dispatcher()
+    return _dispatcher
+
+
+def create_admission_scheduler() -> AdmissionScheduler:
+    """Create the admission scheduler configured in the environment.
+
+    Returns
+    -------
+    AdmissionScheduler
+        The scheduler admitting requests to the providers.
+
+    Raises
+    ------
+    ValueError
+        If one of the settings is invalid.
+    """
+    try:
+        max_concurrency = os.getenv("ADMISSION_MAX_CONCURRENCY")
+
+        return AdmissionScheduler(
+            max_concurrency=int(max_concurrency) if max_concurrency else None,
+            max_queue_size=int(os.getenv("ADMISSION_MAX_QUEUE_SIZE", "1000")),
+            max_queue_times={
+                priority: float(
+                    os.getenv(
+                        f"ADMISSION_MAX_QUEUE_TIME_{priority.name}",
+                        str(DEFAULT_MAX_QUEUE_TIMES[priority]),
+                    )
+                )
+                for priority in Priority
+            },
+            throttle_time=float(os.getenv("ADMISSION_THROTTLE_TIME", "1")),
+        )
+    except ValueError as err:
+        msg = f"Invalid admission setting: {err}"
+        raise ValueError(msg) from err
+
+
+# Global admission scheduler (lazily initialized)
+_admission_scheduler: AdmissionScheduler | None = None
+
+
+async def get_admission_scheduler() -> AdmissionScheduler:
+    """Get the shared AdmissionScheduler instance.
+
+    Returns
+    -------
+    AdmissionScheduler
+        The shared admission scheduler.
+    """
+    global _admission_scheduler
+    if _admission_scheduler is None:
+        _admission_scheduler = create_admission_scheduler()
+    return _admission_scheduler
+
+
+# Global request coalescer (lazily initialized)
+_request_coalescer: RequestCoalescer | None = None
+
+
+async def get_request_coalescer() -> RequestCoalescer:
+    """Get the shared RequestCoalescer instance.
+
+    Returns
+    -------
+    RequestCoalescer
+        The shared request coalescer.
+    """
+    global _request_coalescer
+    if _request_coalescer is None:
+        _request_coalescer = RequestCoalescer()
+    return _request_coalescer
+
+
+@asynccontextmanager
+async def providers_lifespan() -> AsyncIterator[None]:
+    """Manage the providers for the lifetime of the application.
+
+    The providers and their connection pools are created on startup, and the
+    connections are closed on shutdown.
+    """
+    global _providers
+
+    providers = await get_providers()
+
+    try:
+        yield
+    finally:
+        for provider in providers.values():
+            await provider.aclose()
+
+        _providers = None
@@ -0,0 +1,358 @@
+"""Admission control for requests to the providers.
+
+When a provider throttles a model, with status 429, requests for the model
+wait in a queue instead of failing right away. Once the provider's
+Retry-After has passed, a single request probes the provider, and the queue
+drains when it succeeds. The number of requests waiting for a response of a
+model can also be limited, so bursts queue in the gateway instead of running
+into the quota of the provider.
+
+Queued requests are admitted in weighted fair order: every project is a flow
+with the weight of its priority class, and gets a share of the model in
+proportion to that weight. Interactive requests overtake batch requests this
+way, but batch requests aren't starved.
+
+Requests wait at most the maximum queue time of their priority class, or
+until the deadline set by the client, whichever comes first. Requests that
+can't be admitted in time are shed: right away when the expected wait
+exceeds their deadline, and otherwise when they time out in the queue. When
+the queue is full, the queued request that would be admitted last is shed.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import Awaitable, Callable, Hashable, Mapping
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from symbiosis.catalog import Deployment
+from symbiosis.projects.models import Priority
+from symbiosis.providers.base import CompletedResponse
+from symbiosis.providers.resilience import parse_retry_after
+
+R = TypeVar("R", CompletedResponse, httpx.Response)
+
+queue_depth = Gauge(
+    "symbiosis_admission_queue_depth",
+    "Number of requests for a model waiting to be admitted.",
+    ["model"],
+)
+queue_time = Histogram(
+    "symbiosis_admission_queue_seconds",
+    "Time requests waited to be admitted.",
+    ["priority"],
+)
+requests_shed = Counter(
+    "symbiosis_admission_requests_shed_total",
+    "Number of requests rejected without being admitted.",
+    ["priority", "reason"],
+)
+model_throttled = Counter(
+    "symbiosis_admission_throttled_total",
+    "Number of times a provider throttled requests for a model.",
+    ["model"],
+)
+
+# Share of a model each priority class gets when requests queue.
+DEFAULT_WEIGHTS: Mapping[Priority, float] = {
+    Priority.INTERACTIVE: 8.0,
+    Priority.STANDARD: 4.0,
+    Priority.BATCH: 1.0,
+}
+
+# Seconds requests of each priority class wait at most to be admitted.
+DEFAULT_MAX_QUEUE_TIMES: Mapping[Priority, float] = {
+    Priority.INTERACTIVE: 5.0,
+    Priority.STANDARD: 30.0,
+    Priority.BATCH: 300.0,
+}
+
+# Status code of responses to requests over the quota of the deployment.
+TOO_MANY_REQUESTS = 429
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request can't be admitted before its deadline."""
+
+    def __init__(self, retry_after: float) -> None:
+        """Initialize the error.
+
+        Parameters
+        ----------
+        retry_after : float
+            Seconds after which the request is expected to be admitted.
+        """
+        super().__init__("The request can't be admitted before its deadline")
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    finish: float
+    sequence: int
+    priority: Priority = field(compare=False)
+    future: asyncio.Future[None] = field(compare=False)
+
+
+@dataclass
+class _ModelQueue:
+    waiters: list[_Waiter] = field(default_factory=list)
+    in_flight: int = 0
+    throttled_until: float = 0.0
+    probing: bool = False
+    virtual_time: float = 0.0
+    last_finish: dict[Hashable, float] = field(default_factory=dict)
+    service_time: float = 1.0
+    timer: asyncio.TimerHandle | None = None
+
+
+class AdmissionScheduler:
+    """Queues requests for throttled or busy models in weighted fair order."""
+
+    _queues: dict[str, _ModelQueue]
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        max_queue_size: int = 1000,
+        max_queue_times: Mapping[Priority, float] = DEFAULT_MAX_QUEUE_TIMES,
+        weights: Mapping[Priority, float] = DEFAULT_WEIGHTS,
+        throttle_time: float = 1.0,
+    ) -> None:
+        """Initialize the scheduler without queued requests.
+
+        Parameters
+        ----------
+        max_concurrency : int, optional
+            The maximum number of requests waiting for a response of a model.
+            Unlimited by default, so requests only queue while the model is
+            throttled.
+        max_queue_size : int, optional
+            The maximum number of queued requests per model, by default 1000.
+        max_queue_times : Mapping[Priority, float], optional
+            Seconds requests of each priority class wait at most.
+        weights : Mapping[Priority, float], optional
+            The share of a model each priority class gets.
+        throttle_time : float, optional
+            Seconds a throttled model is paused when the provider doesn't say
+            how long, by default 1.
+        """
+        self._max_concurrency = max_concurrency
+        self._max_queue_size = max_queue_size
+        self._max_queue_times = max_queue_times
+        self._weights = weights
+        self._throttle_time = throttle_time
+        self._sequence = itertools.count()
+        self._queues = {}
+
+    def _get_queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+
+        if queue is None:
+            queue = _ModelQueue()
+            self._queues[model] = queue
+
+            queue_depth.labels(model).set_function(lambda: len(queue.waiters))
+
+        return queue
+
+    def _can_admit(self, queue: _ModelQueue, now: float) -> bool:
+        if now < queue.throttled_until:
+            return False
+
+        # After throttling, a single request probes whether the quota is back.
+        if queue.probing and queue.in_flight > 0:
+            return False
+
+        return self._max_concurrency is None or queue.in_flight < self._max_concurrency
+
+    def _expected_wait(self, queue: _ModelQueue, finish: float, now: float) -> float:
+        wait = max(0.0, queue.throttled_until - now)
+
+        if self._max_concurrency is not None:
+            ahead = sum(1 for waiter in queue.waiters if waiter.finish < finish)
+            ahead += queue.in_flight >= self._max_concurrency
+            wait += ahead * queue.service_time / self._max_concurrency
+
+        return wait
+
+    def _dispatch(self, queue: _ModelQueue) -> None:
+        now = time.monotonic()
+
+        while queue.waiters and self._can_admit(queue, now):
+            waiter = heapq.heappop(queue.waiters)
+            queue.in_flight += 1
+            queue.virtual_time = waiter.finish
+            waiter.future.set_result(None)
+
+        if not queue.waiters:
+            # Flows start over once the queue is idle.
+            queue.last_finish.clear()
+        elif queue.throttled_until > now and queue.timer is None:
+            queue.timer = asyncio.get_running_loop().call_later(
+                queue.throttled_until - now, self._wake, queue
+            )
+
+    def _wake(self, queue: _ModelQueue) -> None:
+        queue.timer = None
+        self._dispatch(queue)
+
+    def _shed(self, priority: Priority, reason: str, retry_after: float) -> None:
+        requests_shed.labels(priority, reason).inc()
+        raise AdmissionRejectedError(retry_after)
+
+    def _remove(self, queue: _ModelQueue, waiter: _Waiter) -> None:
+        queue.waiters.remove(waiter)
+        heapq.heapify(queue.waiters)
+
+    def _make_room(self, queue: _ModelQueue, waiter: _Waiter, wait: float) -> None:
+        last = max(queue.waiters)
+
+        if last < waiter:
+            self._shed(waiter.priority, "queue_full", wait)
+
+        self._remove(queue, last)
+        requests_shed.labels(last.priority, "displaced").inc()
+        last.future.set_exception(AdmissionRejectedError(wait))
+
+    async def _acquire(
+        self, queue: _ModelQueue, flow: Hashable, priority: Priority, expires_at: float
+    ) -> None:
+        now = time.monotonic()
+
+        if not queue.waiters and self._can_admit(queue, now):
+            queue.in_flight += 1
+            return
+
+        finish = max(queue.virtual_time, queue.last_finish.get(flow, 0.0))
+        finish += 1 / self._weights[priority]
+        wait = self._expected_wait(queue, finish, now)
+
+        if wait > expires_at - now:
+            self._shed(priority, "deadline", wait)
+
+        waiter = _Waiter(
+            finish,
+            next(self._sequence),
+            priority,
+            asyncio.get_running_loop().create_future(),
+        )
+
+        if len(queue.waiters) >= self._max_queue_size:
+            self._make_room(queue, waiter, wait)
+
+        queue.last_finish[flow] = finish
+        heapq.heappush(queue.waiters, waiter)
+        self._dispatch(queue)
+
+        try:
+            await asyncio.wait((waiter.future,), timeout=expires_at - now)
+        except asyncio.CancelledError:
+            self._abandon(queue, waiter)
+            raise
+
+        if not waiter.future.done():
+            self._abandon(queue, waiter)
+            self._shed(priority, "timeout", self._expected_wait(queue, finish, now))
+
+        waiter.future.result()
+        queue_time.labels(priority).observe(time.monotonic() - now)
+
+    def _abandon(self, queue: _ModelQueue, waiter: _Waiter) -> None:
+        if not waiter.future.done():
+            waiter.future.cancel()
+            self._remove(queue, waiter)
+        elif waiter.future.exception() is None:
+            # Admitted just before it was abandoned.
+            self._release(queue)
+
+    def _release(self, queue: _ModelQueue, service_time: float | None = None) -> None:
+        queue.in_flight -= 1
+
+        if service_time is not None:
+            queue.probing = False
+            queue.service_time = 0.8 * queue.service_time + 0.2 * service_time
+
+        self._dispatch(queue)
+
+    def _throttle(self, queue: _ModelQueue, model: str, seconds: float) -> None:
+        queue.throttled_until = max(queue.throttled_until, time.monotonic() + seconds)
+        queue.probing = True
+        model_throttled.labels(model).inc()
+
+    async def submit(
+        self,
+        model: str,
+        flow: Hashable,
+        priority: Priority,
+        send: Callable[[], Awaitable[tuple[R, Deployment]]],
+        deadline: float | None = None,
+    ) -> tuple[R, Deployment]:
+        """Send a request once it's admitted.
+
+        A request the provider throttles is queued again until the provider
+        accepts it, or until it can't wait any longer; then the throttled
+        response is returned.
+
+        Parameters
+        ----------
+        model : str
+            The alias of the requested model.
+        flow : Hashable
+            The flow the request belongs to, like the project.
+        priority : Priority
+            The priority class of the request.
+        send : Callable[[], Awaitable[tuple[R, Deployment]]]
+            Sends the request to the provider.
+        deadline : float, optional
+            Seconds the client waits at most.
+
+        Returns
+        -------
+        tuple[R, Deployment]
+            The response, and the deployment that sent it.
+
+        Raises
+        ------
+        AdmissionRejectedError
+            If the request can't be admitted before its deadline.
+        """
+        queue = self._get_queue(model)
+        now = time.monotonic()
+        expires_at = now + self._max_queue_times[priority]
+
+        if deadline is not None:
+            expires_at = min(expires_at, now + deadline)
+
+        while True:
+            await self._acquire(queue, flow, priority, expires_at)
+            admitted_at = time.monotonic()
+
+            try:
+                response, deployment = await send()
+            except BaseException:
+                self._release(queue)
+                raise
+
+            if response.status_code != TOO_MANY_REQUESTS:
+                self._release(queue, time.monotonic() - admitted_at)
+                return response, deployment
+
+            retry_after = (
+                parse_retry_after(response.headers.get("retry-after"))
+                or self._throttle_time
+            )
+            # Throttle before releasing, so no queued request is admitted.
+            self._throttle(queue, model, retry_after)
+            self._release(queue)
+
+            if time.monotonic() + retry_after >= expires_at:
+                return response, deployment
+
+            if isinstance(response, httpx.Response):
+                await response.aclose()
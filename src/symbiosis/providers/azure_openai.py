@@ -0,0 +1,82 @@
+"""Provider for the Azure OpenAI API."""
+
+import httpx
+
+from symbiosis.providers.base import Provider
+from symbiosis.providers.body import RequestBody
+
+
+class AzureOpenAIProvider(Provider):
+    """Sends requests to deployments in an Azure OpenAI resource."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        endpoint: str,
+        api_key: str,
+        api_version: str = "2024-10-21",
+        name: str = "azure-openai",
+    ) -> None:
+        """Initialize the provider.
+
+        Parameters
+        ----------
+        client : httpx.AsyncClient
+            The HTTP client used to send requests to the provider.
+        endpoint : str
+            The endpoint of the Azure OpenAI resource.
+        api_key : str
+            The API key of the Azure OpenAI resource.
+        api_version : str, optional
+            The version of the Azure OpenAI API.
+        name : str, optional
+            The name of the provider, by default "azure-openai".
+        """
+        super().__init__(name, client)
+        self._endpoint = endpoint.rstrip("/")
+        self._api_key = api_key
+        self._api_version = api_version
+
+    def build_models_request(self) -> httpx.Request:
+        """Build a request listing the models of the Azure OpenAI resource.
+
+        Returns
+        -------
+        httpx.Request
+            The request to send to the Azure OpenAI API.
+        """
+        return self._client.build_request(
+            "GET",
+            f"{self._endpoint}/openai/models",
+            params={"api-version": self._api_version},
+            headers={"api-key": self._api_key},
+        )
+
+    def build_chat_completions_request(
+        self, deployment: str, body: RequestBody
+    ) -> httpx.Request:
+        """Build a chat completions request for an Azure OpenAI deployment.
+
+        Parameters
+        ----------
+        deployment : str
+            The name of the deployment in the Azure OpenAI resource.
+        body : RequestBody
+            The OpenAI compatible request body.
+
+        Returns
+        -------
+        httpx.Request
+            The request to send to the Azure OpenAI API.
+        """
+        return self._client.build_request(
+            "POST",
+            f"{self._endpoint}/openai/deployments/{deployment}/chat/completions",
+            params={"api-version": self._api_version},
+            content=body.content,
+            headers={
+                "api-key": self._api_key,
+                "Content-Type": "application/json",
+                "Accept-Encoding": "identity",
+            },
+        )
@@ -0,0 +1,285 @@
+"""Latency-aware load balancing across the deployments of a model.
+
+A model can be served by several deployments, for example in different
+Azure OpenAI regions. Each request goes to one of them, chosen with the
+power of two choices: two deployments are picked at random, and the one
+with the lowest expected latency wins. Comparing two random deployments
+instead of always picking the best one keeps the load spread, so replicas
+of the gateway don't all flock to the same deployment.
+
+The expected latency of a deployment is its peak EWMA latency multiplied by
+the number of requests in flight plus one. The peak EWMA follows increases
+in latency immediately and decays slowly, so a deployment that slows down
+is avoided right away. A response with status 429 counts as a very slow
+response, so deployments that run out of quota get less traffic.
+
+A deployment that fails several requests in a row, with status 429, a
+server error, or no response at all, is ejected for a while. Repeated
+ejections last longer. After an ejection, a deployment is admitted
+gradually: its expected latency is inflated at first and returns to normal
+over the ramp-up period. When all deployments are ejected, requests are
+balanced across all of them anyway.
+"""
+
+import math
+import random
+import time
+from collections.abc import Hashable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+from prometheus_client import Counter, Gauge
+
+K = TypeVar("K", bound=Hashable)
+
+deployment_latency = Gauge(
+    "symbiosis_deployment_latency_seconds",
+    "Peak EWMA latency of the requests to a deployment.",
+    ["deployment"],
+)
+deployment_in_flight = Gauge(
+    "symbiosis_deployment_requests_in_flight",
+    "Number of requests to a deployment waiting for a response.",
+    ["deployment"],
+)
+deployment_ejected = Gauge(
+    "symbiosis_deployment_ejected",
+    "Whether a deployment is ejected from load balancing.",
+    ["deployment"],
+)
+deployment_ejections = Counter(
+    "symbiosis_deployment_ejections_total",
+    "Number of times a deployment was ejected from load balancing.",
+    ["deployment"],
+)
+
+# Status code of responses to requests over the quota of the deployment.
+TOO_MANY_REQUESTS = 429
+
+# Status codes from this one up are server errors.
+SERVER_ERROR = 500
+
+
+@dataclass
+class Attempt:
+    """The outcome of a request to a deployment.
+
+    Attributes
+    ----------
+    status_code : int, optional
+        The status code of the response. Unset when no response arrived.
+    """
+
+    status_code: int | None = None
+
+
+@dataclass
+class _DeploymentStats:
+    name: str
+    latency: float
+    updated_at: float
+    in_flight: int = 0
+    failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+
+
+class LoadBalancer(Generic[K]):
+    """Chooses the deployment for every request from live statistics."""
+
+    _stats: dict[K, _DeploymentStats]
+
+    def __init__(
+        self,
+        decay_time: float = 10.0,
+        initial_latency: float = 1.0,
+        throttle_penalty: float = 30.0,
+        failure_threshold: int = 3,
+        ejection_time: float = 30.0,
+        max_ejection_time: float = 300.0,
+        ramp_up_time: float = 30.0,
+        rng: random.Random | None = None,
+    ) -> None:
+        """Initialize the load balancer without statistics.
+
+        Parameters
+        ----------
+        decay_time : float, optional
+            Seconds after which a latency sample has lost about two thirds of
+            its weight in the EWMA, by default 10.
+        initial_latency : float, optional
+            The latency in seconds assumed for a deployment without any
+            responses yet, by default 1.
+        throttle_penalty : float, optional
+            The latency in seconds recorded for a response with status 429,
+            by default 30.
+        failure_threshold : int, optional
+            The number of consecutive failed requests that ejects a
+            deployment, by default 3.
+        ejection_time : float, optional
+            Seconds the first ejection of a deployment lasts, by default 30.
+            Every consecutive ejection lasts twice as long as the previous.
+        max_ejection_time : float, optional
+            The maximum seconds an ejection lasts, by default 300.
+        ramp_up_time : float, optional
+            Seconds over which an ejected deployment is admitted again, by
+            default 30.
+        rng : random.Random, optional
+            The random number generator picking deployments.
+        """
+        self._decay_time = decay_time
+        self._initial_latency = initial_latency
+        self._throttle_penalty = throttle_penalty
+        self._failure_threshold = failure_threshold
+        self._ejection_time = ejection_time
+        self._max_ejection_time = max_ejection_time
+        self._ramp_up_time = ramp_up_time
+        self._rng = rng or random.Random()  # noqa: S311
+        self._stats = {}
+
+    def _get_stats(self, key: K) -> _DeploymentStats:
+        stats = self._stats.get(key)
+
+        if stats is None:
+            name = str(key)
+            stats = _DeploymentStats(
+                name=name, latency=self._initial_latency, updated_at=time.monotonic()
+            )
+            self._stats[key] = stats
+
+            deployment_latency.labels(name).set_function(lambda: stats.latency)
+            deployment_in_flight.labels(name).set_function(lambda: stats.in_flight)
+            deployment_ejected.labels(name).set_function(
+                lambda: float(stats.ejected_until > time.monotonic())
+            )
+
+        return stats
+
+    def _cost(self, stats: _DeploymentStats, now: float) -> float:
+        cost = stats.latency * (stats.in_flight + 1)
+
+        if stats.ejections and self._ramp_up_time > 0:
+            # Admit a deployment gradually after its ejection ends.
+            admitted_for = now - stats.ejected_until
+            cost /= max(0.1, min(1.0, admitted_for / self._ramp_up_time))
+
+        return cost
+
+    def choose(self, deployments: Sequence[K]) -> K:
+        """Choose the deployment for a request.
+
+        Parameters
+        ----------
+        deployments : Sequence[K]
+            The deployments serving the requested model.
+
+        Returns
+        -------
+        K
+            The chosen deployment.
+
+        Raises
+        ------
+        ValueError
+            If there are no deployments to choose from.
+        """
+        if not deployments:
+            msg = "There are no deployments to choose from."
+            raise ValueError(msg)
+
+        if len(deployments) == 1:
+            return deployments[0]
+
+        now = time.monotonic()
+        candidates = [
+            deployment
+            for deployment in deployments
+            if self._get_stats(deployment).ejected_until <= now
+        ] or list(deployments)
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        first, second = self._rng.sample(candidates, 2)
+
+        if self._cost(self._stats[second], now) < self._cost(self._stats[first], now):
+            return second
+
+        return first
+
+    @contextmanager
+    def track(self, deployment: K) -> Iterator[Attempt]:
+        """Track a request to a deployment.
+
+        Set the status code of the yielded attempt when the response
+        arrives. An exception in the block counts as a request without
+        response, except when the request is cancelled.
+
+        Parameters
+        ----------
+        deployment : K
+            The deployment the request is sent to.
+
+        Yields
+        ------
+        Attempt
+            The outcome of the request.
+        """
+        stats = self._get_stats(deployment)
+        attempt = Attempt()
+        started_at = time.monotonic()
+        stats.in_flight += 1
+
+        try:
+            yield attempt
+        except Exception:
+            self._record(stats, time.monotonic() - started_at, None)
+            raise
+        else:
+            self._record(stats, time.monotonic() - started_at, attempt.status_code)
+        finally:
+            stats.in_flight -= 1
+
+    def _record(
+        self, stats: _DeploymentStats, latency: float, status_code: int | None
+    ) -> None:
+        now = time.monotonic()
+
+        if status_code == TOO_MANY_REQUESTS:
+            latency = max(latency, self._throttle_penalty)
+
+        # Peak EWMA: increases are followed immediately, decreases decay.
+        if latency > stats.latency:
+            stats.latency = latency
+        else:
+            weight = math.exp(-(now - stats.updated_at) / self._decay_time)
+            stats.latency = stats.latency * weight + latency * (1 - weight)
+
+        stats.updated_at = now
+
+        failed = (
+            status_code is None
+            or status_code == TOO_MANY_REQUESTS
+            or status_code >= SERVER_ERROR
+        )
+
+        if not failed:
+            stats.failures = 0
+
+            # Ejections only get longer while the deployment keeps failing
+            # soon after it's admitted again.
+            if now - stats.ejected_until > self._ramp_up_time:
+                stats.ejections = 0
+
+            return
+
+        stats.failures += 1
+
+        if stats.failures >= self._failure_threshold and stats.ejected_until <= now:
+            stats.ejected_until = now + min(
+                self._ejection_time * 2**stats.ejections, self._max_ejection_time
+            )
+            stats.ejections += 1
+            stats.failures = 0
+            deployment_ejections.labels(stats.name).inc()
@@ -0,0 +1,176 @@
+"""Base class for LLM providers."""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+
+import httpx
+
+from symbiosis.providers.body import RequestBody
+
+
+@dataclass(frozen=True)
+class CompletedResponse:
+    """A response of a provider that was read completely."""
+
+    status_code: int
+    content: bytes
+    media_type: str | None
+    headers: httpx.Headers = field(default_factory=httpx.Headers)
+
+    @property
+    def is_success(self) -> bool:
+        """Whether the provider handled the request successfully."""
+        return httpx.codes.is_success(self.status_code)
+
+
+async def read_response(response: httpx.Response) -> CompletedResponse:
+    """Read and close an unread response of a provider.
+
+    Parameters
+    ----------
+    response : httpx.Response
+        The unread response.
+
+    Returns
+    -------
+    CompletedResponse
+        The response with its body.
+
+    Raises
+    ------
+    httpx.HTTPError
+        If the body cannot be read.
+    """
+    try:
+        content = await response.aread()
+    finally:
+        await response.aclose()
+
+    return CompletedResponse(
+        status_code=response.status_code,
+        content=content,
+        media_type=response.headers.get("content-type"),
+        headers=response.headers,
+    )
+
+
+class Provider(ABC):
+    """Sends requests to the API of an LLM provider.
+
+    Responses are returned unread, so callers can relay the body to the client
+    chunk by chunk while it streams in from the provider.
+    """
+
+    name: str
+
+    def __init__(self, name: str, client: httpx.AsyncClient) -> None:
+        """Initialize the provider.
+
+        Parameters
+        ----------
+        name : str
+            The name of the provider.
+        client : httpx.AsyncClient
+            The HTTP client used to send requests to the provider.
+        """
+        self.name = name
+        self._client = client
+
+    @abstractmethod
+    def build_chat_completions_request(
+        self, deployment: str, body: RequestBody
+    ) -> httpx.Request:
+        """Build a chat completions request for the provider.
+
+        Parameters
+        ----------
+        deployment : str
+            The model or deployment name at the provider.
+        body : RequestBody
+            The OpenAI compatible request body.
+
+        Returns
+        -------
+        httpx.Request
+            The request to send to the provider.
+        """
+
+    @abstractmethod
+    def build_models_request(self) -> httpx.Request:
+        """Build a request listing the models available at the provider.
+
+        The request is cheap, and uses the credentials of the provider, so it
+        tells whether the provider can be reached.
+
+        Returns
+        -------
+        httpx.Request
+            The request to send to the provider.
+        """
+
+    async def check_reachable(self) -> None:
+        """Check that the provider can be reached and accepts its credentials.
+
+        Raises
+        ------
+        httpx.HTTPError
+            If the provider cannot be reached, rejects the credentials, or
+            fails with a server error.
+        """
+        response = await self._client.send(self.build_models_request())
+
+        if response.is_server_error or response.status_code in (401, 403):
+            response.raise_for_status()
+
+    async def chat_completions(
+        self, deployment: str, body: RequestBody
+    ) -> httpx.Response:
+        """Send a chat completions request to the provider.
+
+        Parameters
+        ----------
+        deployment : str
+            The model or deployment name at the provider.
+        body : RequestBody
+            The OpenAI compatible request body.
+
+        Returns
+        -------
+        httpx.Response
+            The unread response of the provider. The caller must close it.
+
+        Raises
+        ------
+        httpx.HTTPError
+            If the provider cannot be reached.
+        """
+        request = self.build_chat_completions_request(deployment, body)
+        return await self._client.send(request, stream=True)
+
+    async def complete_chat(
+        self, deployment: str, body: RequestBody
+    ) -> CompletedResponse:
+        """Send a chat completions request and read the whole response.
+
+        Parameters
+        ----------
+        deployment : str
+            The model or deployment name at the provider.
+        body : RequestBody
+            The OpenAI compatible request body.
+
+        Returns
+        -------
+        CompletedResponse
+            The response of the provider.
+
+        Raises
+        ------
+        httpx.HTTPError
+            If the provider cannot be reached.
+        """
+        return await read_response(await self.chat_completions(deployment, body))
+
+    async def aclose(self) -> None:
+        """Close the HTTP client of the provider."""
+        await self._client.aclose()
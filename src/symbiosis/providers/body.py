@@ -0,0 +1,119 @@
+"""Request bodies forwarded to the providers as they were received.
+
+Prompts can be several megabytes large. The gateway only needs a few fields
+of a request body, like the model and whether to stream, but it has to
+forward the whole body. A body is therefore parsed once, with orjson, and
+the bytes the client sent are kept. They are forwarded untouched, unless a
+field has to be replaced, for example the model with the name of its
+deployment; only then is the body encoded again.
+"""
+
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+import orjson
+
+
+class RequestBody(Mapping[str, Any]):
+    """A JSON request body, with the bytes it was parsed from.
+
+    The fields are read like a mapping. The body is read-only: fields are
+    replaced with :meth:`replace`, which keeps the bytes consistent.
+
+    Attributes
+    ----------
+    content : bytes
+        The encoded body.
+    """
+
+    __slots__ = ("_fields", "content")
+
+    def __init__(self, content: bytes, fields: dict[str, Any]) -> None:
+        """Initialize the body.
+
+        Parameters
+        ----------
+        content : bytes
+            The encoded body.
+        fields : dict[str, Any]
+            The fields of the body, as decoded from the content.
+        """
+        self.content = content
+        self._fields = fields
+
+    @classmethod
+    def parse(cls, content: bytes) -> "RequestBody":
+        """Parse a request body.
+
+        Parameters
+        ----------
+        content : bytes
+            The encoded body.
+
+        Returns
+        -------
+        RequestBody
+            The body, which keeps the given bytes.
+
+        Raises
+        ------
+        ValueError
+            If the content isn't a JSON object.
+        """
+        fields = orjson.loads(content)
+
+        if not isinstance(fields, dict):
+            msg = "The request body must be a JSON object."
+            raise ValueError(msg)
+
+        return cls(content, fields)
+
+    @classmethod
+    def encode(cls, fields: Mapping[str, Any]) -> "RequestBody":
+        """Encode the fields of a request body.
+
+        Parameters
+        ----------
+        fields : Mapping[str, Any]
+            The fields of the body.
+
+        Returns
+        -------
+        RequestBody
+            The encoded body.
+        """
+        return cls(orjson.dumps(fields), dict(fields))
+
+    def replace(self, **fields: Any) -> "RequestBody":  # noqa: ANN401
+        """Get the body with some fields replaced.
+
+        Parameters
+        ----------
+        **fields : Any
+            The new values of the fields.
+
+        Returns
+        -------
+        RequestBody
+            This body if the fields already have the given values, or a body
+            with the fields replaced, encoded again.
+        """
+        if all(
+            name in self._fields and self._fields[name] == value
+            for name, value in fields.items()
+        ):
+            return self
+
+        return self.encode({**self._fields, **fields})
+
+    def __getitem__(self, name: str) -> Any:  # noqa: ANN401
+        """Get the value of a field."""
+        return self._fields[name]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the names of the fields."""
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        """Get the number of fields."""
+        return len(self._fields)
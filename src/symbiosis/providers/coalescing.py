@@ -0,0 +1,159 @@
+"""Coalescing of identical requests that are in flight at the same time.
+
+When a batch job fans out, identical requests often reach the gateway at the
+same moment. Projects that opt in have such requests answered by a single
+request to the provider: the first request is sent, and identical requests
+arriving before its response is complete wait for that response instead of
+sending their own.
+
+Requests are identical when their canonical bodies match, as computed by
+:func:`request_fingerprint`. Only requests of the same project are coalesced,
+and streamed requests never are.
+
+Coalescing hands every waiting request the same completion, even when the
+request samples with a temperature above 0. That's why it's opt-in.
+"""
+
+import asyncio
+import hashlib
+import uuid
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any, Generic, TypeVar
+
+import orjson
+from prometheus_client import Counter, Gauge
+
+T = TypeVar("T")
+
+requests_coalesced = Counter(
+    "symbiosis_provider_requests_coalesced_total",
+    "Number of requests answered by an identical request to the provider.",
+    ["provider"],
+)
+coalescing_in_flight = Gauge(
+    "symbiosis_provider_coalescing_in_flight",
+    "Number of requests to the providers that identical requests can join.",
+)
+
+# Fields that don't change the completion, so they're left out of the
+# fingerprint.
+IGNORED_FIELDS = frozenset({"model", "user"})
+
+
+def _canonical(value: object) -> object:
+    # JSON doesn't distinguish 0 from 0.0, so neither does the fingerprint.
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+
+    if isinstance(value, dict):
+        return {name: _canonical(item) for name, item in value.items()}
+
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+
+    return value
+
+
+def request_fingerprint(
+    project_id: uuid.UUID, provider: str, deployment: str, body: Mapping[str, Any]
+) -> str:
+    """Compute a fingerprint that is equal for identical requests.
+
+    The order of the fields in the body, insignificant whitespace, and
+    writing 0 as 0.0 don't change the fingerprint.
+
+    Parameters
+    ----------
+    project_id : uuid.UUID
+        The project making the request.
+    provider : str
+        The provider serving the requested model.
+    deployment : str
+        The model or deployment name at the provider.
+    body : Mapping[str, Any]
+        The request body.
+
+    Returns
+    -------
+    str
+        The SHA-256 hash of the canonical request.
+    """
+    request = {
+        name: _canonical(value)
+        for name, value in body.items()
+        if name not in IGNORED_FIELDS
+    }
+    canonical = orjson.dumps(
+        [str(project_id), provider, deployment, request],
+        option=orjson.OPT_SORT_KEYS,
+    )
+
+    return hashlib.sha256(canonical).hexdigest()
+
+
+class RequestCoalescer(Generic[T]):
+    """Lets identical requests share a single request to the provider."""
+
+    _in_flight: dict[str, asyncio.Task[T]]
+
+    def __init__(self) -> None:
+        """Initialize the coalescer without requests in flight."""
+        self._in_flight = {}
+
+        coalescing_in_flight.set_function(lambda: len(self._in_flight))
+
+    def __len__(self) -> int:
+        """Get the number of requests in flight."""
+        return len(self._in_flight)
+
+    def _forget(self, key: str, task: asyncio.Task[T]) -> None:
+        self._in_flight.pop(key, None)
+
+        # Retrieve the exception, so it isn't reported as unhandled when all
+        # requests waiting for it went away.
+        if not task.cancelled():
+            task.exception()
+
+    async def complete(
+        self,
+        key: str,
+        provider: str,
+        send: Callable[[], Awaitable[T]],
+    ) -> tuple[T, bool]:
+        """Get the response to a request, joining an identical one in flight.
+
+        The request to the provider runs in its own task, so it completes for
+        the other waiting requests when the request that sent it is cancelled,
+        for example because its client disconnected.
+
+        Parameters
+        ----------
+        key : str
+            The fingerprint of the request.
+        provider : str
+            The name of the provider, used as label for the metrics.
+        send : Callable[[], Awaitable[T]]
+            Sends the request to the provider if none is in flight.
+
+        Returns
+        -------
+        tuple[T, bool]
+            The response, and whether it was received for an identical
+            request.
+
+        Raises
+        ------
+        httpx.HTTPError
+            If the provider cannot be reached.
+        """
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+
+        if task is None:
+            task = asyncio.ensure_future(send())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            requests_coalesced.labels(provider).inc()
+
+        return await asyncio.shield(task), coalesced
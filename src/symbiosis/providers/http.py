@@ -0,0 +1,179 @@
+"""Shared HTTP clients for the providers.
+
+Every provider gets one HTTP client for the lifetime of the application, so
+requests reuse open HTTP/2 connections instead of paying for a TCP and TLS
+handshake each time. The clients are configured with the following
+environment variables:
+
+- PROVIDER_HTTP2 - Use HTTP/2 when the provider supports it, by default true.
+- PROVIDER_MAX_CONNECTIONS - Maximum number of connections, by default 100.
+- PROVIDER_MAX_KEEPALIVE_CONNECTIONS - Maximum number of idle connections kept
+  open, by default 20.
+- PROVIDER_KEEPALIVE_EXPIRY - Seconds to keep idle connections open, by
+  default 30.
+- PROVIDER_CONNECT_TIMEOUT - Seconds to wait for a connection, by default 5.
+- PROVIDER_READ_TIMEOUT - Seconds to wait for response data, by default 600.
+- PROVIDER_WRITE_TIMEOUT - Seconds to wait for sending request data, by
+  default 30.
+- PROVIDER_POOL_TIMEOUT - Seconds to wait for a free connection, by default 10.
+
+Each setting can be overridden per provider by replacing the PROVIDER prefix
+with the prefix of the provider, for example OPENAI_MAX_CONNECTIONS.
+"""
+
+import os
+from collections.abc import AsyncIterator
+
+import httpx
+from prometheus_client import Gauge
+
+pool_active_requests = Gauge(
+    "symbiosis_provider_pool_active_requests",
+    "Number of requests to the provider holding a pooled connection.",
+    ["provider"],
+)
+pool_max_connections = Gauge(
+    "symbiosis_provider_pool_max_connections",
+    "Maximum number of connections in the connection pool of the provider.",
+    ["provider"],
+)
+
+
+def _get_setting(env_prefix: str, name: str, default: float) -> float:
+    for variable in (f"{env_prefix}_{name}", f"PROVIDER_{name}"):
+        value = os.getenv(variable)
+
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError as err:
+                msg = f"{variable} environment variable must be a number."
+                raise ValueError(msg) from err
+
+    return default
+
+
+def _get_bool_setting(env_prefix: str, name: str, *, default: bool) -> bool:
+    for variable in (f"{env_prefix}_{name}", f"PROVIDER_{name}"):
+        value = os.getenv(variable)
+
+        if value is not None:
+            return value.strip().lower() in ("1", "true", "yes", "on")
+
+    return default
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response stream that reports when the response is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, gauge: Gauge) -> None:
+        self._stream = stream
+        self._gauge = gauge
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._gauge.dec()
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """HTTP transport that tracks the utilization of its connection pool.
+
+    A request counts as active from the moment it's sent until its response
+    is closed, which includes the time spent streaming the response body.
+    """
+
+    def __init__(
+        self, provider_name: str, limits: httpx.Limits, *, http2: bool
+    ) -> None:
+        """Initialize the transport.
+
+        Parameters
+        ----------
+        provider_name : str
+            The name of the provider, used as label for the pool metrics.
+        limits : httpx.Limits
+            The limits of the connection pool.
+        http2 : bool
+            Whether to use HTTP/2 when the provider supports it.
+        """
+        super().__init__(limits=limits, http2=http2)
+        self._active_requests = pool_active_requests.labels(provider_name)
+        pool_max_connections.labels(provider_name).set(limits.max_connections or 0)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request and track it until its response is closed.
+
+        Parameters
+        ----------
+        request : httpx.Request
+            The request to send.
+
+        Returns
+        -------
+        httpx.Response
+            The response of the provider.
+        """
+        self._active_requests.inc()
+
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self._active_requests.dec()
+            raise
+
+        response.stream = _TrackedStream(response.stream, self._active_requests)
+        return response
+
+
+def create_http_client(provider_name: str, env_prefix: str) -> httpx.AsyncClient:
+    """Create the shared HTTP client for a provider.
+
+    Parameters
+    ----------
+    provider_name : str
+        The name of the provider, used as label for the pool metrics.
+    env_prefix : str
+        The prefix of environment variables overriding the settings for this
+        provider, for example "OPENAI".
+
+    Returns
+    -------
+    httpx.AsyncClient
+        The HTTP client for the provider.
+
+    Raises
+    ------
+    ValueError
+        If one of the settings is invalid.
+    """
+    limits = httpx.Limits(
+        max_connections=int(_get_setting(env_prefix, "MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(
+            _get_setting(env_prefix, "MAX_KEEPALIVE_CONNECTIONS", 20)
+        ),
+        keepalive_expiry=_get_setting(env_prefix, "KEEPALIVE_EXPIRY", 30),
+    )
+
+    timeout = httpx.Timeout(
+        connect=_get_setting(env_prefix, "CONNECT_TIMEOUT", 5),
+        read=_get_setting(env_prefix, "READ_TIMEOUT", 600),
+        write=_get_setting(env_prefix, "WRITE_TIMEOUT", 30),
+        pool=_get_setting(env_prefix, "POOL_TIMEOUT", 10),
+    )
+
+    transport = InstrumentedTransport(
+        provider_name,
+        limits=limits,
+        http2=_get_bool_setting(env_prefix, "HTTP2", default=True),
+    )
+
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
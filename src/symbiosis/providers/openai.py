@@ -0,0 +1,76 @@
+"""Provider for the OpenAI API."""
+
+import httpx
+
+from symbiosis.providers.base import Provider
+from symbiosis.providers.body import RequestBody
+
+
+class OpenAIProvider(Provider):
+    """Sends requests to the OpenAI API."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        api_key: str,
+        base_url: str = "https://api.openai.com/v1",
+        name: str = "openai",
+    ) -> None:
+        """Initialize the provider.
+
+        Parameters
+        ----------
+        client : httpx.AsyncClient
+            The HTTP client used to send requests to the provider.
+        api_key : str
+            The API key for the OpenAI API.
+        base_url : str, optional
+            The base URL of the OpenAI API.
+        name : str, optional
+            The name of the provider, by default "openai".
+        """
+        super().__init__(name, client)
+        self._api_key = api_key
+        self._base_url = base_url.rstrip("/")
+
+    def build_models_request(self) -> httpx.Request:
+        """Build a request listing the models of the OpenAI API.
+
+        Returns
+        -------
+        httpx.Request
+            The request to send to the OpenAI API.
+        """
+        return self._client.build_request(
+            "GET",
+            f"{self._base_url}/models",
+            headers={"Authorization": f"Bearer {self._api_key}"},
+        )
+
+    def build_chat_completions_request(
+        self, deployment: str, body: RequestBody
+    ) -> httpx.Request:
+        """Build a chat completions request for the OpenAI API.
+
+        Parameters
+        ----------
+        deployment : str
+            The name of the OpenAI model.
+        body : RequestBody
+            The OpenAI compatible request body.
+
+        Returns
+        -------
+        httpx.Request
+            The request to send to the OpenAI API.
+        """
+        return self._client.build_request(
+            "POST",
+            f"{self._base_url}/chat/completions",
+            content=body.replace(model=deployment).content,
+            headers={
+                "Authorization": f"Bearer {self._api_key}",
+                "Content-Type": "application/json",
+                "Accept-Encoding": "identity",
+            },
+        )
@@ -0,0 +1,738 @@
+"""Retries, hedging, and circuit breakers for requests to the providers.
+
+Requests that fail with an error the provider may recover from, a response
+with status 5xx or no response at all, are retried after a delay that grows
+exponentially with every attempt. The delay is drawn at random up to
+the exponential bound, so clients that failed together don't retry
+together. When the provider says when to retry, with a Retry-After header,
+the delay is at least that long; when it asks for a longer wait than the
+maximum delay, the request isn't retried. Every retry may go to another
+deployment of the model, as chosen by the load balancer. Throttled
+requests, with status 429, aren't retried here: the admission scheduler
+queues them with all other requests for the model until the provider accepts
+requests again.
+
+Retries are limited by a retry budget shared by all requests: each request
+earns a fraction of a retry, and each retry spends a whole one. When a
+provider is down, requests stop being retried once the budget is spent,
+instead of multiplying the load on the provider.
+
+Every provider has a circuit breaker. After several consecutive failures,
+the circuit opens and deployments of the provider aren't used until the
+circuit is reset. Then a single request probes the provider, and closes the
+circuit again when it succeeds. Requests for models without a deployment at
+a provider with a closed circuit are rejected right away.
+
+Non-streaming requests can be hedged: when the response takes longer than
+the 95th percentile of the recent latency of the provider, an identical
+request is sent, possibly to another deployment, and the first response
+wins. Hedged requests are paid from the retry budget too.
+
+Streamed requests are only retried until the provider starts its response.
+"""
+
+import asyncio
+import email.utils
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from enum import IntEnum
+from typing import TypeVar
+
+import httpx
+from prometheus_client import Counter, Gauge
+
+from symbiosis.catalog import Deployment
+from symbiosis.providers.balancing import LoadBalancer
+from symbiosis.providers.base import CompletedResponse, Provider
+from symbiosis.providers.body import RequestBody
+
+R = TypeVar("R", CompletedResponse, httpx.Response)
+
+provider_retries = Counter(
+    "symbiosis_provider_retries_total",
+    "Number of requests to a provider that were retried.",
+    ["provider", "reason"],
+)
+retry_budget_exhausted = Counter(
+    "symbiosis_provider_retry_budget_exhausted_total",
+    "Number of retries and hedged requests skipped for lack of retry budget.",
+)
+circuit_state = Gauge(
+    "symbiosis_provider_circuit_state",
+    "State of the circuit breaker of a provider: 0 closed, 1 half open, 2 open.",
+    ["provider"],
+)
+circuit_rejections = Counter(
+    "symbiosis_provider_circuit_rejections_total",
+    "Number of requests rejected because the circuits of all providers of "
+    "the model are open.",
+)
+hedged_requests = Counter(
+    "symbiosis_provider_hedged_requests_total",
+    "Number of hedged requests sent to a provider.",
+    ["provider"],
+)
+hedge_wins = Counter(
+    "symbiosis_provider_hedge_wins_total",
+    "Number of hedged requests that answered before the original request.",
+    ["provider"],
+)
+
+# Status codes of responses that are worth retrying. Throttled responses are
+# queued again by the admission scheduler instead.
+RETRYABLE_STATUS_CODES = frozenset({408, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuits of all providers of a model are open."""
+
+    def __init__(self, retry_after: float) -> None:
+        """Initialize the error.
+
+        Parameters
+        ----------
+        retry_after : float
+            Seconds until the first circuit is reset.
+        """
+        super().__init__("The circuits of all providers of the model are open")
+        self.retry_after = retry_after
+
+
+class CircuitState(IntEnum):
+    """The state of a circuit breaker."""
+
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitBreaker:
+    """Stops sending requests to a provider that keeps failing."""
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> None:
+        """Initialize a closed circuit breaker.
+
+        Parameters
+        ----------
+        name : str
+            The name of the provider, used as label for the metrics.
+        failure_threshold : int, optional
+            The number of consecutive failures that opens the circuit, by
+            default 5.
+        reset_timeout : float, optional
+            Seconds the circuit stays open before a request probes the
+            provider, by default 30.
+        """
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = CircuitState.CLOSED
+        self._probing = False
+
+        circuit_state.labels(name).set_function(lambda: self.state)
+
+    @property
+    def state(self) -> CircuitState:
+        """Get the state of the circuit."""
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self._reset_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Get the seconds until the circuit is reset."""
+        return max(0.0, self._opened_at + self._reset_timeout - time.monotonic())
+
+    def is_available(self) -> bool:
+        """Check whether a request may be sent to the provider.
+
+        Returns
+        -------
+        bool
+            True when the circuit is closed, or half open without a request
+            probing the provider.
+        """
+        state = self.state
+        return state == CircuitState.CLOSED or (
+            state == CircuitState.HALF_OPEN and not self._probing
+        )
+
+    def before_request(self) -> bool:
+        """Record that a request is sent to the provider.
+
+        Returns
+        -------
+        bool
+            True if the request probes the provider for a half open circuit.
+        """
+        if self.state == CircuitState.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+
+        return False
+
+    def record_success(self) -> None:
+        """Record a request the provider handled, closing the circuit."""
+        self._failures = 0
+        self._probing = False
+        self._state = CircuitState.CLOSED
+
+    def release(self, *, probe: bool) -> None:
+        """Record a request that ended without an outcome, like a cancellation.
+
+        Parameters
+        ----------
+        probe : bool
+            Whether the request was the probe, as returned by
+            :meth:`before_request`. Other requests, sent before the circuit
+            opened, leave the probe in flight alone.
+        """
+        if probe:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Record a failed request, opening the circuit when needed."""
+        self._failures += 1
+        self._probing = False
+
+        if (
+            self.state == CircuitState.HALF_OPEN
+            or self._failures >= self._failure_threshold
+        ):
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            self._failures = 0
+
+
+class RetryBudget:
+    """Limits retries to a fraction of the requests."""
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1.0,
+        max_balance: float = 100.0,
+    ) -> None:
+        """Initialize the budget with one second worth of retries.
+
+        Parameters
+        ----------
+        ratio : float, optional
+            The retries each request earns, by default 0.2.
+        min_per_second : float, optional
+            The retries earned every second regardless of the requests, so
+            a few requests can always be retried, by default 1.
+        max_balance : float, optional
+            The maximum number of retries saved up, by default 100.
+        """
+        self._ratio = ratio
+        self._min_per_second = min_per_second
+        self._max_balance = max_balance
+        self._balance = min_per_second
+        self._updated_at = time.monotonic()
+
+    def _refill(self, amount: float) -> None:
+        now = time.monotonic()
+        earned = (now - self._updated_at) * self._min_per_second + amount
+        self._balance = min(self._max_balance, self._balance + earned)
+        self._updated_at = now
+
+    def deposit(self) -> None:
+        """Earn retries for a request."""
+        self._refill(self._ratio)
+
+    def withdraw(self) -> bool:
+        """Spend a retry.
+
+        Returns
+        -------
+        bool
+            True if the budget allows the retry.
+        """
+        self._refill(0.0)
+
+        if self._balance < 1:
+            retry_budget_exhausted.inc()
+            return False
+
+        self._balance -= 1
+        return True
+
+
+class LatencyWindow:
+    """The most recent latencies of the requests to a provider."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20) -> None:
+        """Initialize an empty window.
+
+        Parameters
+        ----------
+        size : int, optional
+            The number of latencies kept, by default 200.
+        min_samples : int, optional
+            The number of latencies needed for a percentile, by default 20.
+        """
+        self._samples: deque[float] = deque(maxlen=size)
+        self._min_samples = min_samples
+
+    def record(self, latency: float) -> None:
+        """Record the latency of a request.
+
+        Parameters
+        ----------
+        latency : float
+            The latency in seconds.
+        """
+        self._samples.append(latency)
+
+    def percentile(self, fraction: float) -> float | None:
+        """Get a percentile of the recent latencies.
+
+        Parameters
+        ----------
+        fraction : float
+            The percentile as a fraction, for example 0.95.
+
+        Returns
+        -------
+        float | None
+            The latency in seconds, or None without enough samples.
+        """
+        if len(self._samples) < self._min_samples:
+            return None
+
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse the value of a Retry-After header.
+
+    Parameters
+    ----------
+    value : str, optional
+        Seconds to wait, or the date to retry at.
+
+    Returns
+    -------
+    float | None
+        Seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """When and after how long requests to the providers are retried."""
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+
+    def delay(
+        self, attempt: int, retry_after: float | None, rng: random.Random
+    ) -> float | None:
+        """Get the delay before retrying a request.
+
+        Parameters
+        ----------
+        attempt : int
+            The number of attempts made so far, at least 1.
+        retry_after : float, optional
+            Seconds the provider asked to wait.
+        rng : random.Random
+            The random number generator for the jitter.
+
+        Returns
+        -------
+        float | None
+            Seconds to wait, or None if the request shouldn't be retried.
+        """
+        if attempt >= self.max_attempts:
+            return None
+
+        if retry_after is not None and retry_after > self.max_delay:
+            return None
+
+        delay = rng.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+        return max(delay, retry_after or 0.0)
+
+
+def _is_retryable(response: CompletedResponse | httpx.Response) -> bool:
+    return response.status_code in RETRYABLE_STATUS_CODES
+
+
+class Dispatcher:
+    """Sends requests to the deployments of a model, recovering from errors."""
+
+    _breakers: dict[str, CircuitBreaker]
+    _latencies: dict[str, LatencyWindow]
+
+    def __init__(
+        self,
+        balancer: LoadBalancer[Deployment],
+        policy: RetryPolicy | None = None,
+        budget: RetryBudget | None = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        hedge_percentile: float | None = None,
+        min_hedge_delay: float = 0.5,
+        rng: random.Random | None = None,
+    ) -> None:
+        """Initialize the dispatcher.
+
+        Parameters
+        ----------
+        balancer : LoadBalancer[Deployment]
+            Chooses the deployment for every attempt.
+        policy : RetryPolicy, optional
+            When and after how long requests are retried.
+        budget : RetryBudget, optional
+            Limits the retries and hedged requests.
+        failure_threshold : int, optional
+            The number of consecutive failures that opens the circuit of a
+            provider, by default 5.
+        reset_timeout : float, optional
+            Seconds the circuit of a provider stays open, by default 30.
+        hedge_percentile : float, optional
+            Hedge non-streaming requests that take longer than this
+            percentile of the recent latency of the provider, for example
+            0.95. Requests aren't hedged by default.
+        min_hedge_delay : float, optional
+            The minimum seconds before a request is hedged, by default 0.5.
+        rng : random.Random, optional
+            The random number generator for the jitter of the delays.
+        """
+        self._balancer = balancer
+        self._policy = policy or RetryPolicy()
+        self._budget = budget or RetryBudget()
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._hedge_percentile = hedge_percentile
+        self._min_hedge_delay = min_hedge_delay
+        self._rng = rng or random.Random()  # noqa: S311
+        self._breakers = {}
+        self._latencies = {}
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        """Get the circuit breaker of a provider.
+
+        Parameters
+        ----------
+        provider : str
+            The name of the provider.
+
+        Returns
+        -------
+        CircuitBreaker
+            The circuit breaker.
+        """
+        breaker = self._breakers.get(provider)
+
+        if breaker is None:
+            breaker = CircuitBreaker(
+                provider, self._failure_threshold, self._reset_timeout
+            )
+            self._breakers[provider] = breaker
+
+        return breaker
+
+    def _choose(
+        self, deployments: Sequence[Deployment], tried: set[Deployment]
+    ) -> Deployment:
+        available = [
+            deployment
+            for deployment in deployments
+            if self.breaker(deployment.provider).is_available()
+        ]
+
+        if not available:
+            circuit_rejections.inc()
+            raise CircuitOpenError(
+                min(self.breaker(d.provider).retry_after for d in deployments)
+            )
+
+        # Retries go to another deployment when there is one.
+        untried = [deployment for deployment in available if deployment not in tried]
+        return self._balancer.choose(untried or available)
+
+    async def _attempt(
+        self,
+        send: Callable[[Provider, Deployment], Awaitable[R]],
+        provider: Provider,
+        deployment: Deployment,
+    ) -> R:
+        breaker = self.breaker(deployment.provider)
+        probe = breaker.before_request()
+
+        with self._balancer.track(deployment) as attempt:
+            try:
+                response = await send(provider, deployment)
+            except httpx.TransportError:
+                breaker.record_failure()
+                raise
+            except asyncio.CancelledError:
+                # A cancelled request says nothing about the provider, but
+                # mustn't leave a half open circuit waiting for its probe.
+                breaker.release(probe=probe)
+                raise
+            except Exception:
+                # Any other error, like a response that can't be decoded,
+                # counts against the provider, and ends a probe as well.
+                breaker.record_failure()
+                raise
+
+            attempt.status_code = response.status_code
+
+        if response.status_code >= httpx.codes.INTERNAL_SERVER_ERROR:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        return response
+
+    def _retry_delay(
+        self,
+        attempts: int,
+        retry_after: float | None,
+        deployments: Sequence[Deployment],
+    ) -> float | None:
+        delay = self._policy.delay(attempts, retry_after, self._rng)
+
+        if delay is None or not any(
+            self.breaker(deployment.provider).is_available()
+            for deployment in deployments
+        ):
+            return None
+
+        return delay if self._budget.withdraw() else None
+
+    async def _send_with_retries(
+        self,
+        providers: dict[str, Provider],
+        deployments: Sequence[Deployment],
+        send: Callable[[Provider, Deployment], Awaitable[R]],
+        close: Callable[[R], Awaitable[None]],
+    ) -> tuple[R, Deployment]:
+        tried: set[Deployment] = set()
+        attempts = 0
+
+        while True:
+            deployment = self._choose(deployments, tried)
+            tried.add(deployment)
+            attempts += 1
+
+            try:
+                response = await self._attempt(
+                    send, providers[deployment.provider], deployment
+                )
+            except httpx.TransportError:
+                delay = self._retry_delay(attempts, None, deployments)
+
+                if delay is None:
+                    raise
+
+                reason = "transport_error"
+            else:
+                if not _is_retryable(response):
+                    return response, deployment
+
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                delay = self._retry_delay(attempts, retry_after, deployments)
+
+                if delay is None:
+                    return response, deployment
+
+                await close(response)
+                reason = str(response.status_code)
+
+            provider_retries.labels(deployment.provider, reason).inc()
+            await asyncio.sleep(delay)
+
+    async def open_stream(
+        self,
+        providers: dict[str, Provider],
+        deployments: Sequence[Deployment],
+        body: RequestBody,
+    ) -> tuple[httpx.Response, Deployment]:
+        """Send a streamed chat completions request.
+
+        The request is retried until a deployment starts its response.
+
+        Parameters
+        ----------
+        providers : dict[str, Provider]
+            The configured providers, keyed by provider name.
+        deployments : Sequence[Deployment]
+            The deployments serving the requested model.
+        body : RequestBody
+            The OpenAI compatible request body.
+
+        Returns
+        -------
+        tuple[httpx.Response, Deployment]
+            The unread response, which the caller must close, and the
+            deployment that sent it.
+
+        Raises
+        ------
+        httpx.HTTPError
+            If no provider can be reached.
+        CircuitOpenError
+            If the circuits of all providers of the model are open.
+        """
+        self._budget.deposit()
+
+        async def send(provider: Provider, deployment: Deployment) -> httpx.Response:
+            return await provider.chat_completions(deployment.deployment, body)
+
+        async def close(response: httpx.Response) -> None:
+            await response.aclose()
+
+        return await self._send_with_retries(providers, deployments, send, close)
+
+    async def complete(
+        self,
+        providers: dict[str, Provider],
+        deployments: Sequence[Deployment],
+        body: RequestBody,
+    ) -> tuple[CompletedResponse, Deployment]:
+        """Send a chat completions request and read the whole response.
+
+        Parameters
+        ----------
+        providers : dict[str, Provider]
+            The configured providers, keyed by provider name.
+        deployments : Sequence[Deployment]
+            The deployments serving the requested model.
+        body : RequestBody
+            The OpenAI compatible request body.
+
+        Returns
+        -------
+        tuple[CompletedResponse, Deployment]
+            The response, and the deployment that sent it.
+
+        Raises
+        ------
+        httpx.HTTPError
+            If no provider can be reached.
+        CircuitOpenError
+            If the circuits of all providers of the model are open.
+        """
+        self._budget.deposit()
+
+        async def send(provider: Provider, deployment: Deployment) -> CompletedResponse:
+            started_at = time.monotonic()
+            response = await provider.complete_chat(deployment.deployment, body)
+
+            if response.is_success:
+                self._latencies.setdefault(deployment.provider, LatencyWindow()).record(
+                    time.monotonic() - started_at
+                )
+
+            return response
+
+        async def close(response: CompletedResponse) -> None:
+            pass
+
+        delay = (
+            self._hedge_delay(deployments, self._hedge_percentile)
+            if self._hedge_percentile is not None
+            else None
+        )
+
+        if delay is None:
+            return await self._send_with_retries(providers, deployments, send, close)
+
+        request = asyncio.ensure_future(
+            self._send_with_retries(providers, deployments, send, close)
+        )
+
+        try:
+            return await self._hedge(
+                request, delay, providers, deployments, send, close
+            )
+        finally:
+            request.cancel()
+
+    def _hedge_delay(
+        self, deployments: Sequence[Deployment], percentile: float
+    ) -> float | None:
+        latencies = self._latencies.get(deployments[0].provider)
+        latency = latencies.percentile(percentile) if latencies is not None else None
+
+        return max(latency, self._min_hedge_delay) if latency is not None else None
+
+    async def _hedge(
+        self,
+        request: asyncio.Future[tuple[CompletedResponse, Deployment]],
+        delay: float,
+        providers: dict[str, Provider],
+        deployments: Sequence[Deployment],
+        send: Callable[[Provider, Deployment], Awaitable[CompletedResponse]],
+        close: Callable[[CompletedResponse], Awaitable[None]],
+    ) -> tuple[CompletedResponse, Deployment]:
+        done, _ = await asyncio.wait({request}, timeout=delay)
+
+        if done or not self._budget.withdraw():
+            return await request
+
+        hedge = asyncio.ensure_future(
+            self._send_with_retries(providers, deployments, send, close)
+        )
+        hedged_requests.labels(deployments[0].provider).inc()
+
+        try:
+            pending = {request, hedge}
+            failed: list[asyncio.Future[tuple[CompletedResponse, Deployment]]] = []
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    if task.exception() is not None or _is_retryable(task.result()[0]):
+                        failed.append(task)
+                        continue
+
+                    response, deployment = task.result()
+
+                    if task is hedge:
+                        hedge_wins.labels(deployment.provider).inc()
+
+                    return response, deployment
+
+            # Both failed: prefer a response of the provider over an error.
+            failed.sort(key=lambda task: task.exception() is not None)
+            return failed[0].result()
+        finally:
+            hedge.cancel()
+            await asyncio.gather(hedge, return_exceptions=True)
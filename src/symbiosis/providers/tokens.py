@@ -0,0 +1,384 @@
+"""Token usage of requests to the providers.
+
+Budgets and rate limits depend on the number of tokens of every request, but
+providers don't always report them, for example when a streamed response
+omits its usage. The gateway counts tokens itself with the BPE tokenizer of
+the model family, using tiktoken.
+
+Tokenizers are loaded lazily and in the background, because tiktoken may
+download the vocabulary the first time a family is used. Until a tokenizer
+is available, tokens are estimated from the number of characters. Set
+TIKTOKEN_CACHE_DIR to a directory with the vocabulary files to load them
+without network access.
+
+Streamed responses are counted incrementally as the Server-Sent Events pass
+through the gateway. The chunks are inspected, not copied.
+"""
+
+import functools
+import logging
+import threading
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+import orjson
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Rough number of characters per token for English text with BPE tokenizers.
+CHARACTERS_PER_TOKEN = 4
+
+# The encoding for models tiktoken doesn't know, like custom deployments.
+DEFAULT_ENCODING = "o200k_base"
+
+# Tokens added by the chat format for every message, and to prime the reply.
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+TokenCounter = Callable[[str], int]
+
+
+@dataclass(frozen=True)
+class TokenUsage:
+    """The number of tokens used by a completion."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        """Get the total number of tokens."""
+        return self.prompt_tokens + self.completion_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text from its length.
+
+    Parameters
+    ----------
+    text : str
+        The text.
+
+    Returns
+    -------
+    int
+        The estimated number of tokens.
+    """
+    return -(-len(text) // CHARACTERS_PER_TOKEN)
+
+
+@functools.cache
+def encoding_name(model: str) -> str:
+    """Get the name of the tokenizer encoding used by a model.
+
+    Parameters
+    ----------
+    model : str
+        The name of the model.
+
+    Returns
+    -------
+    str
+        The name of the encoding.
+    """
+    try:
+        return tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        return DEFAULT_ENCODING
+
+
+class TokenizerRegistry:
+    """Loads and caches one tokenizer per encoding."""
+
+    _counters: dict[str, TokenCounter]
+    _loading: set[str]
+
+    def __init__(
+        self, load: Callable[[str], tiktoken.Encoding] = tiktoken.get_encoding
+    ) -> None:
+        """Initialize the registry without any tokenizers.
+
+        Parameters
+        ----------
+        load : Callable[[str], tiktoken.Encoding], optional
+            Loads the encoding with the given name.
+        """
+        self._load = load
+        self._counters = {}
+        self._loading = set()
+        self._lock = threading.Lock()
+
+    def _load_in_background(self, name: str) -> None:
+        try:
+            encoding = self._load(name)
+        except Exception:  # noqa: BLE001
+            # Keep estimating tokens rather than failing requests.
+            logger.warning("Failed to load tokenizer %s, estimating tokens", name)
+            counter = estimate_tokens
+        else:
+
+            def counter(text: str) -> int:
+                return len(encoding.encode_ordinary(text))
+
+        with self._lock:
+            self._counters[name] = counter
+
+    def counter(self, model: str) -> TokenCounter:
+        """Get the token counter for a model.
+
+        Parameters
+        ----------
+        model : str
+            The name of the model.
+
+        Returns
+        -------
+        TokenCounter
+            Counts the tokens of a text. Estimates them until the tokenizer of
+            the model is loaded.
+        """
+        name = encoding_name(model)
+        counter = self._counters.get(name)
+
+        if counter is not None:
+            return counter
+
+        with self._lock:
+            if name not in self._loading:
+                self._loading.add(name)
+                threading.Thread(
+                    target=self._load_in_background, args=(name,), daemon=True
+                ).start()
+
+        return estimate_tokens
+
+
+# Global tokenizer registry
+_tokenizers = TokenizerRegistry()
+
+
+def get_token_counter(model: str) -> TokenCounter:
+    """Get the token counter for a model from the shared registry.
+
+    Parameters
+    ----------
+    model : str
+        The name of the model.
+
+    Returns
+    -------
+    TokenCounter
+        Counts the tokens of a text.
+    """
+    return _tokenizers.counter(model)
+
+
+def content_text(content: object) -> str:
+    """Get the text of the content of a chat message.
+
+    Parameters
+    ----------
+    content : object
+        The content of the message: a string, or a list of content parts.
+
+    Returns
+    -------
+    str
+        The text of the message, without parts like images.
+    """
+    if isinstance(content, str):
+        return content
+
+    if isinstance(content, list):
+        return "".join(
+            part["text"]
+            for part in content
+            if isinstance(part, dict) and isinstance(part.get("text"), str)
+        )
+
+    return ""
+
+
+def count_prompt_tokens(body: Mapping[str, Any], count: TokenCounter) -> int:
+    """Count the prompt tokens of a chat completions request.
+
+    Parameters
+    ----------
+    body : Mapping[str, Any]
+        The chat completions request body.
+    count : TokenCounter
+        The token counter of the requested model.
+
+    Returns
+    -------
+    int
+        The number of prompt tokens.
+    """
+    messages = body.get("messages")
+
+    if not isinstance(messages, list):
+        return TOKENS_PER_REPLY
+
+    tokens = TOKENS_PER_REPLY
+
+    for message in messages:
+        if isinstance(message, dict):
+            tokens += TOKENS_PER_MESSAGE + count(content_text(message.get("content")))
+
+    return tokens
+
+
+def _reported_usage(usage: object) -> TokenUsage | None:
+    if not isinstance(usage, dict):
+        return None
+
+    return TokenUsage(
+        prompt_tokens=int(usage.get("prompt_tokens") or 0),
+        completion_tokens=int(usage.get("completion_tokens") or 0),
+    )
+
+
+def parse_usage(
+    content: bytes, prompt_tokens: int, count: TokenCounter
+) -> TokenUsage | None:
+    """Get the token usage of a chat completions response body.
+
+    The usage reported by the provider is used when available. Otherwise the
+    completion tokens are counted.
+
+    Parameters
+    ----------
+    content : bytes
+        The JSON response body of the provider.
+    prompt_tokens : int
+        The number of prompt tokens counted by the gateway.
+    count : TokenCounter
+        The token counter of the requested model.
+
+    Returns
+    -------
+    TokenUsage | None
+        The token usage, or None if the response isn't a chat completion.
+    """
+    try:
+        completion = orjson.loads(content)
+    except ValueError:
+        return None
+
+    if not isinstance(completion, dict):
+        return None
+
+    usage = _reported_usage(completion.get("usage"))
+
+    if usage is not None:
+        return usage
+
+    completion_tokens = sum(
+        count(content_text((choice.get("message") or {}).get("content")))
+        for choice in completion.get("choices") or ()
+        if isinstance(choice, dict)
+    )
+
+    return TokenUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+class StreamingUsageCounter:
+    """Counts the tokens of a streamed chat completion as it passes through."""
+
+    def __init__(
+        self,
+        prompt_tokens: int,
+        count: TokenCounter,
+        on_content: Callable[[str], None] | None = None,
+    ) -> None:
+        """Initialize the counter.
+
+        Parameters
+        ----------
+        prompt_tokens : int
+            The number of prompt tokens counted by the gateway.
+        count : TokenCounter
+            The token counter of the requested model.
+        on_content : Callable[[str], None], optional
+            Called with the content of every delta, in order, for example to
+            check the completion against the guardrails of the project.
+        """
+        self._prompt_tokens = prompt_tokens
+        self._count = count
+        self._on_content = on_content
+        self._completion_tokens = 0
+        self._reported: TokenUsage | None = None
+        self._partial_line = b""
+
+    @property
+    def usage(self) -> TokenUsage:
+        """Get the token usage of the chunks seen so far."""
+        if self._reported is not None:
+            return self._reported
+
+        return TokenUsage(
+            prompt_tokens=self._prompt_tokens,
+            completion_tokens=self._completion_tokens,
+        )
+
+    def feed(self, chunk: bytes) -> None:
+        """Count the tokens in a chunk of the Server-Sent Events stream.
+
+        Parameters
+        ----------
+        chunk : bytes
+            The chunk, which doesn't need to end at an event boundary.
+        """
+        start = 0
+        end = chunk.find(b"\n")
+
+        if end == -1:
+            self._partial_line += chunk
+            return
+
+        if self._partial_line:
+            self._handle_line(self._partial_line + chunk[:end])
+            self._partial_line = b""
+            start = end + 1
+            end = chunk.find(b"\n", start)
+
+        while end != -1:
+            self._handle_line(chunk[start:end])
+            start = end + 1
+            end = chunk.find(b"\n", start)
+
+        self._partial_line = chunk[start:]
+
+    def _handle_line(self, line: bytes) -> None:
+        if not line.startswith(b"data:"):
+            return
+
+        data = line[5:].strip()
+
+        if not data or data == b"[DONE]":
+            return
+
+        try:
+            event = orjson.loads(data)
+        except ValueError:
+            return
+
+        if not isinstance(event, dict):
+            return
+
+        usage = _reported_usage(event.get("usage"))
+
+        if usage is not None:
+            self._reported = usage
+
+        for choice in event.get("choices") or ():
+            if isinstance(choice, dict) and isinstance(choice.get("delta"), dict):
+                content = choice["delta"].get("content")
+
+                if isinstance(content, str) and content:
+                    self._completion_tokens += self._count(content)
+
+                    if self._on_content is not None:
+                        self._on_content(content)
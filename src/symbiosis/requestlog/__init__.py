@@ -0,0 +1,147 @@
+"""The request log records every request to the universal API.
+
+Logging a request must not slow it down, so records are written to the
+database in the background, as described in :mod:`symbiosis.requestlog.logger`.
+The request log is configured with the following environment variables:
+
+- REQUEST_LOG_QUEUE_SIZE - Maximum number of records waiting to be written, by
+  default 10000.
+- REQUEST_LOG_BATCH_SIZE - Maximum number of records written at once, by
+  default 500.
+- REQUEST_LOG_FLUSH_INTERVAL - Maximum seconds records wait before they're
+  written, by default 1.
+- REQUEST_LOG_OVERFLOW_POLICY - What happens to records when the queue is
+  full: drop, sample, or spill (the default).
+- REQUEST_LOG_SAMPLE_RATE - Keep one in this many records when the queue is
+  mostly full with the sample policy, by default 10.
+- REQUEST_LOG_SPILL_DIR - The directory of the write-ahead log receiving
+  records with the spill policy, by default symbiosis-request-log in the
+  temporary directory. Workers can share it.
+- REQUEST_LOG_SPILL_MAX_SIZE - Maximum size in bytes of the write-ahead log
+  of every worker, by default 1 GiB.
+- REQUEST_LOG_SPILL_SEGMENT_SIZE - Size in bytes of the segment files of the
+  write-ahead log, by default 16 MiB.
+
+Records are only written when DATABASE_URL is configured.
+"""
+
+import os
+import tempfile
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from symbiosis.requestlog.logger import (
+    OverflowPolicy,
+    RequestLogger,
+    RequestLogRecord,
+    copy_to_database,
+)
+from symbiosis.requestlog.models import RequestLogEntry
+from symbiosis.wal import WriteAheadLog
+
+__all__ = [
+    "OverflowPolicy",
+    "RequestLogEntry",
+    "RequestLogRecord",
+    "RequestLogger",
+    "create_request_logger",
+    "get_request_logger",
+    "request_log_lifespan",
+]
+
+
+async def _discard(records: Sequence[RequestLogRecord]) -> None:
+    """Discard records when there's no database to write them to."""
+
+
+def create_request_logger() -> RequestLogger:
+    """Create a RequestLogger from the environment.
+
+    Returns
+    -------
+    RequestLogger
+        A configured request logger.
+
+    Raises
+    ------
+    ValueError
+        If one of the settings is invalid.
+    """
+    try:
+        overflow_policy = OverflowPolicy(
+            os.getenv("REQUEST_LOG_OVERFLOW_POLICY", OverflowPolicy.SPILL)
+        )
+        max_queue_size = int(os.getenv("REQUEST_LOG_QUEUE_SIZE", "10000"))
+        batch_size = int(os.getenv("REQUEST_LOG_BATCH_SIZE", "500"))
+        flush_interval = float(os.getenv("REQUEST_LOG_FLUSH_INTERVAL", "1"))
+        sample_rate = int(os.getenv("REQUEST_LOG_SAMPLE_RATE", "10"))
+        spill_max_size = int(
+            os.getenv("REQUEST_LOG_SPILL_MAX_SIZE", str(1024 * 1024 * 1024))
+        )
+        spill_segment_size = int(
+            os.getenv("REQUEST_LOG_SPILL_SEGMENT_SIZE", str(16 * 1024 * 1024))
+        )
+    except ValueError as err:
+        msg = f"Invalid request log setting: {err}"
+        raise ValueError(msg) from err
+
+    spill_dir = os.getenv("REQUEST_LOG_SPILL_DIR")
+    wal = None
+
+    if overflow_policy == OverflowPolicy.SPILL:
+        wal = WriteAheadLog(
+            "request_log",
+            Path(spill_dir)
+            if spill_dir
+            else Path(tempfile.gettempdir()) / "symbiosis-request-log",
+            segment_size=spill_segment_size,
+            max_size=spill_max_size,
+        )
+
+    return RequestLogger(
+        write=copy_to_database if os.getenv("DATABASE_URL") else _discard,
+        max_queue_size=max_queue_size,
+        batch_size=batch_size,
+        flush_interval=flush_interval,
+        overflow_policy=overflow_policy,
+        sample_rate=sample_rate,
+        wal=wal,
+    )
+
+
+# Global request logger instance (lazily initialized)
+_request_logger: RequestLogger | None = None
+
+
+async def get_request_logger() -> RequestLogger:
+    """Get the shared RequestLogger instance.
+
+    Returns
+    -------
+    RequestLogger
+        The shared request logger.
+    """
+    global _request_logger
+    if _request_logger is None:
+        _request_logger = create_request_logger()
+    return _request_logger
+
+
+@asynccontextmanager
+async def request_log_lifespan() -> AsyncIterator[None]:
+    """Write the request log in the background for the lifetime of the app.
+
+    Records spilled to the write-ahead log, also by a previous run, are
+    replayed in the background. The remaining records are written on shutdown.
+    """
+    global _request_logger
+
+    request_logger = await get_request_logger()
+    request_logger.start()
+
+    try:
+        yield
+    finally:
+        await request_logger.close()
+        _request_logger = None
@@ -0,0 +1,421 @@
+"""Non-blocking writer for the request log.
+
+Handling a request only appends a record to a bounded in-memory queue. A
+background task drains the queue and writes the records to the database in
+batches. When the queue is full, because the database can't keep up or is
+unavailable, the overflow policy decides what happens to new records:
+
+- drop - New records are discarded.
+- sample - Once the queue is mostly full, only one in every few records is
+  kept. Records are discarded when the queue is full.
+- spill - Records that don't fit are written to a write-ahead log on local
+  disk, as are batches that fail to write. A background task replays the log
+  once the database accepts records again.
+"""
+
+import asyncio
+import base64
+import contextlib
+import json
+import logging
+import random
+import uuid
+from collections import deque
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field, fields
+from datetime import UTC, datetime
+from enum import StrEnum
+from operator import attrgetter
+
+import asyncpg
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy.exc import SQLAlchemyError
+
+from symbiosis.database import get_async_engine
+from symbiosis.wal import WriteAheadLog
+
+logger = logging.getLogger(__name__)
+
+queue_depth = Gauge(
+    "symbiosis_request_log_queue_depth",
+    "Number of request log records waiting to be written.",
+)
+records_written = Counter(
+    "symbiosis_request_log_records_written_total",
+    "Number of request log records written to the database.",
+)
+records_discarded = Counter(
+    "symbiosis_request_log_records_discarded_total",
+    "Number of request log records that weren't written to the database.",
+    ["reason"],
+)
+flush_latency = Histogram(
+    "symbiosis_request_log_flush_seconds",
+    "Time taken to write a batch of request log records to the database.",
+)
+
+
+class OverflowPolicy(StrEnum):
+    """What happens to request log records when the queue is full."""
+
+    DROP = "drop"
+    SAMPLE = "sample"
+    SPILL = "spill"
+
+
+@dataclass(frozen=True, slots=True)
+class RequestLogRecord:
+    """A request to the universal API and the response of the provider.
+
+    The fields match the columns of the request_logs table, in order.
+    """
+
+    project_id: uuid.UUID
+    key_id: uuid.UUID
+    model: str
+    provider: str
+    status_code: int
+    streamed: bool
+    latency_ms: float
+    prompt_tokens: int | None
+    completion_tokens: int | None
+    request_body: bytes
+    response_body: bytes | None
+    id: uuid.UUID = field(default_factory=uuid.uuid4)
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    cache_hit: bool = False
+
+    def to_json(self) -> str:
+        """Serialize the record to a single line of JSON.
+
+        Returns
+        -------
+        str
+            The JSON representation of the record.
+        """
+        return json.dumps(
+            {
+                "project_id": str(self.project_id),
+                "key_id": str(self.key_id),
+                "model": self.model,
+                "provider": self.provider,
+                "status_code": self.status_code,
+                "streamed": self.streamed,
+                "latency_ms": self.latency_ms,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "request_body": base64.b64encode(self.request_body).decode(),
+                "response_body": (
+                    base64.b64encode(self.response_body).decode()
+                    if self.response_body is not None
+                    else None
+                ),
+                "id": str(self.id),
+                "created_at": self.created_at.isoformat(),
+                "cache_hit": self.cache_hit,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, line: str) -> "RequestLogRecord":
+        """Deserialize a record from its JSON representation.
+
+        Parameters
+        ----------
+        line : str
+            The JSON representation of the record.
+
+        Returns
+        -------
+        RequestLogRecord
+            The record.
+        """
+        data = json.loads(line)
+        response_body = data["response_body"]
+
+        return cls(
+            project_id=uuid.UUID(data["project_id"]),
+            key_id=uuid.UUID(data["key_id"]),
+            model=data["model"],
+            provider=data["provider"],
+            status_code=data["status_code"],
+            streamed=data["streamed"],
+            latency_ms=data["latency_ms"],
+            prompt_tokens=data["prompt_tokens"],
+            completion_tokens=data["completion_tokens"],
+            request_body=base64.b64decode(data["request_body"]),
+            response_body=(
+                base64.b64decode(response_body) if response_body is not None else None
+            ),
+            id=uuid.UUID(data["id"]),
+            created_at=datetime.fromisoformat(data["created_at"]),
+            # Records spilled before responses were cached lack the field.
+            cache_hit=data.get("cache_hit", False),
+        )
+
+
+# The columns of the request_logs table, in the order of the record fields.
+COLUMNS = tuple(column.name for column in fields(RequestLogRecord))
+
+_as_row = attrgetter(*COLUMNS)
+
+# Errors of writing to the database. The COPY runs on the asyncpg connection
+# itself, so its errors aren't wrapped by SQLAlchemy.
+WRITE_ERRORS = (
+    OSError,
+    SQLAlchemyError,
+    asyncpg.PostgresError,
+    asyncpg.InterfaceError,
+)
+
+
+class RequestLogger:
+    """Collects request log records and writes them in the background."""
+
+    _queue: deque[RequestLogRecord]
+    _spilled: deque[RequestLogRecord]
+    _tasks: list[asyncio.Task]
+
+    def __init__(
+        self,
+        write: Callable[[Sequence[RequestLogRecord]], Awaitable[None]],
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP,
+        sample_rate: int = 10,
+        wal: WriteAheadLog | None = None,
+        replay_interval: float = 5.0,
+    ) -> None:
+        """Initialize the request logger.
+
+        Parameters
+        ----------
+        write : Callable[[Sequence[RequestLogRecord]], Awaitable[None]]
+            Writes a batch of records to the database.
+        max_queue_size : int, optional
+            Maximum number of records waiting to be written, by default 10000.
+        batch_size : int, optional
+            Maximum number of records written at once, by default 500.
+        flush_interval : float, optional
+            Maximum seconds records wait before they're written, by default 1.
+        overflow_policy : OverflowPolicy, optional
+            What happens to records when the queue is full, by default drop.
+        sample_rate : int, optional
+            Keep one in this many records when the queue is mostly full with
+            the sample policy, by default 10.
+        wal : WriteAheadLog, optional
+            The write-ahead log receiving records with the spill policy.
+        replay_interval : float, optional
+            Seconds between attempts to replay the write-ahead log, by
+            default 5.
+
+        Raises
+        ------
+        ValueError
+            If the spill policy is used without a write-ahead log.
+        """
+        if overflow_policy == OverflowPolicy.SPILL and wal is None:
+            msg = "The spill overflow policy requires a write-ahead log."
+            raise ValueError(msg)
+
+        self._write = write
+        self._max_queue_size = max_queue_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._overflow_policy = overflow_policy
+        self._sample_rate = sample_rate
+        self._sample_threshold = int(max_queue_size * 0.8)
+        self._wal = wal
+        self._replay_interval = replay_interval
+        self._queue = deque()
+        self._spilled = deque(maxlen=max_queue_size)
+        self._batch_ready = asyncio.Event()
+        self._tasks = []
+
+        queue_depth.set_function(lambda: len(self._queue))
+
+    def __len__(self) -> int:
+        """Get the number of records waiting to be written."""
+        return len(self._queue)
+
+    def log(self, record: RequestLogRecord) -> None:
+        """Add a record to the request log without waiting for it to be written.
+
+        Parameters
+        ----------
+        record : RequestLogRecord
+            The record to log.
+        """
+        depth = len(self._queue)
+
+        if depth >= self._max_queue_size:
+            self._overflow(record)
+            return
+
+        if (
+            self._overflow_policy == OverflowPolicy.SAMPLE
+            and depth >= self._sample_threshold
+            and random.randrange(self._sample_rate) != 0  # noqa: S311
+        ):
+            records_discarded.labels("sampled").inc()
+            return
+
+        self._queue.append(record)
+
+        if depth + 1 >= self._batch_size:
+            self._batch_ready.set()
+
+    def _overflow(self, record: RequestLogRecord) -> None:
+        if self._overflow_policy != OverflowPolicy.SPILL:
+            records_discarded.labels("queue_full").inc()
+            return
+
+        if len(self._spilled) == self._spilled.maxlen:
+            records_discarded.labels("spill_full").inc()
+
+        self._spilled.append(record)
+        self._batch_ready.set()
+
+    async def _spill(self, records: Sequence[RequestLogRecord]) -> None:
+        payloads = [record.to_json().encode() for record in records]
+
+        try:
+            await asyncio.to_thread(self._wal.append, payloads)  # type: ignore[union-attr]
+        except OSError:
+            logger.exception("Failed to spill request log records to disk")
+            records_discarded.labels("spill_failed").inc(len(records))
+
+    async def _write_payloads(self, payloads: list[bytes]) -> None:
+        await self._write([RequestLogRecord.from_json(payload) for payload in payloads])
+
+    async def replay(self) -> None:
+        """Write the records in the write-ahead log to the database.
+
+        This includes the records left by previous runs and exited workers,
+        which the log only finds while replaying.
+        """
+        if self._wal is not None:
+            await self._wal.replay(self._write_payloads, self._batch_size)
+
+    async def _replay_periodically(self) -> None:
+        while True:
+            try:
+                await self.replay()
+            except WRITE_ERRORS:
+                logger.warning("Failed to replay the request log write-ahead log")
+
+            await asyncio.sleep(self._replay_interval)
+
+    async def flush(self) -> None:
+        """Write the queued records to the database in batches.
+
+        With the spill policy, records that fail to write are spilled to disk.
+        Otherwise they're put back in the queue for the next attempt.
+        """
+        if self._spilled:
+            spilled = list(self._spilled)
+            self._spilled.clear()
+            await self._spill(spilled)
+
+        while self._queue:
+            batch = [
+                self._queue.popleft()
+                for _ in range(min(self._batch_size, len(self._queue)))
+            ]
+
+            try:
+                with flush_latency.time():
+                    await self._write(batch)
+            except WRITE_ERRORS:
+                logger.exception("Failed to write the request log")
+                await self._handle_failed_batch(batch)
+                return
+
+            records_written.inc(len(batch))
+
+    async def _handle_failed_batch(self, batch: list[RequestLogRecord]) -> None:
+        if self._overflow_policy == OverflowPolicy.SPILL:
+            await self._spill(batch)
+            return
+
+        room = self._max_queue_size - len(self._queue)
+        self._queue.extendleft(reversed(batch[:room]))
+
+        if len(batch) > room:
+            records_discarded.labels("queue_full").inc(len(batch) - room)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self._batch_ready.wait(), timeout=self._flush_interval
+                )
+
+            self._batch_ready.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Start writing records and replaying the write-ahead log."""
+        self._tasks = [asyncio.create_task(self._flush_periodically())]
+
+        if self._wal is not None:
+            self._tasks.append(asyncio.create_task(self._replay_periodically()))
+
+    async def close(self) -> None:
+        """Stop the background tasks and write the remaining records.
+
+        Records left in the write-ahead log are replayed after a restart.
+        """
+        for task in self._tasks:
+            task.cancel()
+
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        self._tasks = []
+        await self.flush()
+
+        if self._wal is not None:
+            self._wal.close()
+
+
+# Records are copied into a staging table first, so records that were already
+# written are skipped instead of failing the whole batch.
+_CREATE_STAGING_TABLE = (
+    "CREATE TEMPORARY TABLE request_logs_staging "
+    "(LIKE request_logs INCLUDING DEFAULTS) ON COMMIT DROP"
+)
+_INSERT_FROM_STAGING_TABLE = (
+    f"INSERT INTO request_logs ({', '.join(COLUMNS)}) "  # noqa: S608
+    f"SELECT {', '.join(COLUMNS)} FROM request_logs_staging "
+    "ON CONFLICT (id) DO NOTHING"
+)
+
+
+async def copy_to_database(records: Sequence[RequestLogRecord]) -> None:
+    """Write records to the request_logs table with the COPY protocol.
+
+    Writing is idempotent: records whose id is already in the table are
+    skipped. A batch replayed from the write-ahead log after a crash between
+    writing it and checkpointing it therefore doesn't fail on the records
+    written before the crash.
+
+    Parameters
+    ----------
+    records : Sequence[RequestLogRecord]
+        The records to write.
+    """
+    async with get_async_engine().connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+
+        async with driver_connection.transaction():
+            await driver_connection.execute(_CREATE_STAGING_TABLE)
+            await driver_connection.copy_records_to_table(
+                "request_logs_staging",
+                records=[_as_row(record) for record in records],
+                columns=COLUMNS,
+            )
+            await driver_connection.execute(_INSERT_FROM_STAGING_TABLE)
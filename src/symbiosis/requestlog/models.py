@@ -0,0 +1,69 @@
+"""Database models for the request log."""
+
+import uuid
+from datetime import UTC, datetime
+
+from sqlalchemy import DateTime, LargeBinary
+from sqlmodel import Field, Index, SQLModel
+
+
+class RequestLogEntry(SQLModel, table=True):
+    """A request to the universal API and the response of the provider.
+
+    Attributes
+    ----------
+    id : uuid.UUID
+        The unique identifier of the request.
+    created_at : datetime
+        The moment the request was received.
+    project_id : uuid.UUID
+        The project that made the request.
+    key_id : uuid.UUID
+        The API key the request was made with.
+    model : str
+        The alias of the requested model.
+    provider : str
+        The provider the request was forwarded to.
+    status_code : int
+        The status code of the response.
+    streamed : bool
+        Whether the response was streamed.
+    latency_ms : float
+        The time from receiving the request until the response was complete.
+    prompt_tokens : int, optional
+        The number of prompt tokens, if known.
+    completion_tokens : int, optional
+        The number of completion tokens, if known.
+    request_body : bytes
+        The body of the request.
+    response_body : bytes, optional
+        The body of the response. Streamed responses aren't stored.
+    cache_hit : bool
+        Whether the response was served from the response cache.
+    """
+
+    __tablename__ = "request_logs"
+    __table_args__ = (
+        Index("ix_request_logs_project_id_created_at", "project_id", "created_at"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(UTC),
+        sa_type=DateTime(timezone=True),  # type: ignore[call-overload]
+    )
+    project_id: uuid.UUID
+    key_id: uuid.UUID
+    model: str = Field(max_length=255)
+    provider: str = Field(max_length=100)
+    status_code: int
+    streamed: bool
+    latency_ms: float
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    request_body: bytes = Field(sa_type=LargeBinary)  # type: ignore[call-overload]
+    response_body: bytes | None = Field(
+        default=None,
+        sa_type=LargeBinary,  # type: ignore[call-overload]
+    )
+    cache_hit: bool = False
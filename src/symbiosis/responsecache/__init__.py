@@ -0,0 +1,126 @@
+"""The response cache answers repeated deterministic requests.
+
+Projects opt in by setting the time-to-live of their cached responses. How
+responses are cached is described in :mod:`symbiosis.responsecache.cache`.
+The cache is configured with the following environment variables:
+
+- RESPONSE_CACHE_STORE - The shared store behind the in-memory cache:
+  "postgres" (the default when DATABASE_URL is set) or "memory" to only cache
+  responses in process memory.
+- RESPONSE_CACHE_SIZE - Maximum number of responses in process memory, by
+  default 1000.
+- RESPONSE_CACHE_MAX_ENTRY_SIZE - Maximum size in bytes of a cached response,
+  by default 1 MiB.
+- RESPONSE_CACHE_SHARED_SIZE - Maximum number of responses in the shared
+  store, by default 100000.
+- RESPONSE_CACHE_PURGE_INTERVAL - Seconds between purges of expired responses
+  from the shared store, by default 60.
+"""
+
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from symbiosis.database import get_async_engine
+from symbiosis.responsecache.cache import (
+    CachedResponse,
+    PostgresResponseCacheStore,
+    ResponseCache,
+    ResponseCacheStore,
+    ResponseRecorder,
+    cache_key,
+    replay_stream,
+)
+
+__all__ = [
+    "CachedResponse",
+    "PostgresResponseCacheStore",
+    "ResponseCache",
+    "ResponseCacheStore",
+    "ResponseRecorder",
+    "cache_key",
+    "create_response_cache",
+    "get_response_cache",
+    "replay_stream",
+    "response_cache_lifespan",
+]
+
+
+def create_response_cache() -> ResponseCache:
+    """Create a ResponseCache from the environment.
+
+    Returns
+    -------
+    ResponseCache
+        A configured response cache.
+
+    Raises
+    ------
+    ValueError
+        If one of the settings is invalid.
+    """
+    try:
+        max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+        max_entry_size = int(
+            os.getenv("RESPONSE_CACHE_MAX_ENTRY_SIZE", str(1024 * 1024))
+        )
+        shared_size = int(os.getenv("RESPONSE_CACHE_SHARED_SIZE", "100000"))
+        purge_interval = float(os.getenv("RESPONSE_CACHE_PURGE_INTERVAL", "60"))
+    except ValueError as err:
+        msg = f"Invalid response cache setting: {err}"
+        raise ValueError(msg) from err
+
+    default_store = "postgres" if os.getenv("DATABASE_URL") else "memory"
+    store_name = os.getenv("RESPONSE_CACHE_STORE", default_store)
+
+    if store_name == "postgres":
+        store: ResponseCacheStore | None = PostgresResponseCacheStore(
+            get_async_engine(), max_entries=shared_size
+        )
+    elif store_name == "memory":
+        store = None
+    else:
+        msg = (
+            f"RESPONSE_CACHE_STORE must be 'postgres' or 'memory', got '{store_name}'."
+        )
+        raise ValueError(msg)
+
+    return ResponseCache(
+        store=store,
+        max_entries=max_entries,
+        max_entry_size=max_entry_size,
+        purge_interval=purge_interval,
+    )
+
+
+# Global response cache instance (lazily initialized)
+_response_cache: ResponseCache | None = None
+
+
+async def get_response_cache() -> ResponseCache:
+    """Get the shared ResponseCache instance.
+
+    Returns
+    -------
+    ResponseCache
+        The shared response cache.
+    """
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = create_response_cache()
+    return _response_cache
+
+
+@asynccontextmanager
+async def response_cache_lifespan() -> AsyncIterator[None]:
+    """Purge the shared response cache in the background for the app lifetime."""
+    global _response_cache
+
+    response_cache = await get_response_cache()
+    response_cache.start()
+
+    try:
+        yield
+    finally:
+        await response_cache.close()
+        _response_cache = None
@@ -0,0 +1,426 @@
+"""Exact-match cache of chat completion responses.
+
+Deterministic requests, with a temperature of 0 and a single choice, are
+cached by the fingerprint of the canonical request body, the project, and the
+deployment serving the model, as computed by
+:func:`symbiosis.providers.coalescing.request_fingerprint`. Only identical
+requests hit the cache.
+
+The cache has two tiers. Every process keeps the most recently used
+responses in memory, in front of a shared store used by all replicas of the
+gateway. Responses expire after the time-to-live configured for the project.
+Expired responses are purged from the shared store in the background, which
+also evicts the entries that expire first once the store is full.
+
+Streamed responses are cached as the Server-Sent Events received from the
+provider, and replayed as events to clients.
+"""
+
+import asyncio
+import contextlib
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from prometheus_client import Counter
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from symbiosis.caching import TTLCache
+from symbiosis.catalog import ModelEntry
+from symbiosis.providers.coalescing import request_fingerprint
+from symbiosis.providers.tokens import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+response_cache_lookups = Counter(
+    "symbiosis_response_cache_lookups_total",
+    "Number of response cache lookups by the tier that answered them.",
+    ["result"],
+)
+
+# Events in a stream of Server-Sent Events are separated by a blank line.
+EVENT_SEPARATOR = b"\n\n"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A response of a provider, as stored in the cache."""
+
+    content: bytes
+    media_type: str | None
+    streamed: bool
+    prompt_tokens: int
+    completion_tokens: int
+    expires_at: float
+
+    @property
+    def usage(self) -> TokenUsage:
+        """Get the tokens the original request used."""
+        return TokenUsage(
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+        )
+
+
+def cache_key(
+    project_id: uuid.UUID, model: ModelEntry, body: Mapping[str, Any]
+) -> str | None:
+    """Compute the cache key of a chat completions request.
+
+    Parameters
+    ----------
+    project_id : uuid.UUID
+        The project making the request. Projects don't share responses.
+    model : ModelEntry
+        The requested model.
+    body : Mapping[str, Any]
+        The request body.
+
+    Returns
+    -------
+    str | None
+        The key, or None if the completion isn't deterministic and can't be
+        cached.
+    """
+    if body.get("temperature") != 0 or body.get("n", 1) != 1:
+        return None
+
+    return request_fingerprint(project_id, model.provider, model.deployment, body)
+
+
+async def replay_stream(content: bytes) -> AsyncIterator[bytes]:
+    """Replay a cached stream of Server-Sent Events one event at a time.
+
+    Parameters
+    ----------
+    content : bytes
+        The cached stream.
+
+    Yields
+    ------
+    bytes
+        The events of the stream.
+    """
+    start = 0
+    end = content.find(EVENT_SEPARATOR)
+
+    while end != -1:
+        yield content[start : end + len(EVENT_SEPARATOR)]
+        start = end + len(EVENT_SEPARATOR)
+        end = content.find(EVENT_SEPARATOR, start)
+
+    if start < len(content):
+        yield content[start:]
+
+
+class ResponseRecorder:
+    """Collects the chunks of a streamed response to cache it."""
+
+    _chunks: list[bytes] | None
+
+    def __init__(self, max_size: int) -> None:
+        """Initialize the recorder.
+
+        Parameters
+        ----------
+        max_size : int
+            The maximum size in bytes of a cached response. Larger responses
+            aren't recorded.
+        """
+        self._max_size = max_size
+        self._size = 0
+        self._chunks = []
+        self._finished = False
+
+    def feed(self, chunk: bytes) -> None:
+        """Record a chunk of the response.
+
+        Parameters
+        ----------
+        chunk : bytes
+            The chunk.
+        """
+        if self._chunks is None:
+            return
+
+        self._size += len(chunk)
+
+        if self._size > self._max_size:
+            self._chunks = None
+        else:
+            self._chunks.append(chunk)
+
+    def finish(self) -> None:
+        """Mark the response as completely received."""
+        self._finished = True
+
+    @property
+    def content(self) -> bytes | None:
+        """Get the recorded response, if it's complete and small enough."""
+        if not self._finished or self._chunks is None:
+            return None
+
+        return b"".join(self._chunks)
+
+
+class ResponseCacheStore(ABC):
+    """Shared store holding the cached responses of all gateway replicas."""
+
+    @abstractmethod
+    async def get(self, key: str) -> CachedResponse | None:
+        """Get a response from the store.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the request.
+
+        Returns
+        -------
+        CachedResponse | None
+            The response, or None if it isn't stored or expired.
+        """
+
+    @abstractmethod
+    async def set(self, key: str, response: CachedResponse) -> None:
+        """Store a response.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the request.
+        response : CachedResponse
+            The response.
+        """
+
+    async def purge(self) -> None:  # noqa: B027
+        """Remove expired responses, and the oldest when the store is full."""
+
+
+class PostgresResponseCacheStore(ResponseCacheStore):
+    """Keeps cached responses in PostgreSQL.
+
+    Responses live in an unlogged table, because losing them in a crash only
+    costs a few requests to the providers.
+    """
+
+    def __init__(self, engine: AsyncEngine, max_entries: int = 100000) -> None:
+        """Initialize the store.
+
+        Parameters
+        ----------
+        engine : AsyncEngine
+            The database engine.
+        max_entries : int, optional
+            The maximum number of responses kept after purging, by default
+            100000.
+        """
+        self._engine = engine
+        self._max_entries = max_entries
+
+    async def get(self, key: str) -> CachedResponse | None:
+        """Get a response from the store.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the request.
+
+        Returns
+        -------
+        CachedResponse | None
+            The response, or None if it isn't stored or expired.
+        """
+        async with self._engine.connect() as connection:
+            result = await connection.execute(
+                text(
+                    "SELECT content, media_type, streamed, prompt_tokens, "
+                    "completion_tokens, extract(epoch FROM expires_at) "
+                    "FROM response_cache WHERE key = :key AND expires_at > now()"
+                ),
+                {"key": key},
+            )
+            row = result.one_or_none()
+
+        if row is None:
+            return None
+
+        return CachedResponse(
+            content=row[0],
+            media_type=row[1],
+            streamed=row[2],
+            prompt_tokens=row[3],
+            completion_tokens=row[4],
+            expires_at=float(row[5]),
+        )
+
+    async def set(self, key: str, response: CachedResponse) -> None:
+        """Store a response.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the request.
+        response : CachedResponse
+            The response.
+        """
+        async with self._engine.begin() as connection:
+            await connection.execute(
+                text(
+                    "INSERT INTO response_cache (key, content, media_type, "
+                    "streamed, prompt_tokens, completion_tokens, expires_at) "
+                    "VALUES (:key, :content, :media_type, :streamed, "
+                    ":prompt_tokens, :completion_tokens, to_timestamp(:expires_at)) "
+                    "ON CONFLICT (key) DO UPDATE SET content = excluded.content, "
+                    "media_type = excluded.media_type, "
+                    "streamed = excluded.streamed, "
+                    "prompt_tokens = excluded.prompt_tokens, "
+                    "completion_tokens = excluded.completion_tokens, "
+                    "expires_at = excluded.expires_at"
+                ),
+                {
+                    "key": key,
+                    "content": response.content,
+                    "media_type": response.media_type,
+                    "streamed": response.streamed,
+                    "prompt_tokens": response.prompt_tokens,
+                    "completion_tokens": response.completion_tokens,
+                    "expires_at": response.expires_at,
+                },
+            )
+
+    async def purge(self) -> None:
+        """Remove expired responses, and the oldest when the store is full."""
+        async with self._engine.begin() as connection:
+            await connection.execute(
+                text("DELETE FROM response_cache WHERE expires_at <= now()")
+            )
+            await connection.execute(
+                text(
+                    "DELETE FROM response_cache WHERE key IN ("
+                    "SELECT key FROM response_cache "
+                    "ORDER BY expires_at DESC OFFSET :max_entries)"
+                ),
+                {"max_entries": self._max_entries},
+            )
+
+
+class ResponseCache:
+    """Two-tier cache of responses: in process memory and a shared store."""
+
+    _task: asyncio.Task | None
+
+    def __init__(
+        self,
+        store: ResponseCacheStore | None = None,
+        max_entries: int = 1000,
+        max_entry_size: int = 1024 * 1024,
+        purge_interval: float = 60.0,
+    ) -> None:
+        """Initialize an empty cache.
+
+        Parameters
+        ----------
+        store : ResponseCacheStore, optional
+            The store shared by all replicas. Without a store, responses are
+            only cached in process memory.
+        max_entries : int, optional
+            The maximum number of responses in process memory, by default
+            1000. The least recently used responses are evicted first.
+        max_entry_size : int, optional
+            The maximum size in bytes of a cached response, by default 1 MiB.
+        purge_interval : float, optional
+            Seconds between purges of the shared store, by default 60.
+        """
+        self._store = store
+        self._local: TTLCache[str, CachedResponse] = TTLCache(
+            "responses", maxsize=max_entries
+        )
+        self.max_entry_size = max_entry_size
+        self._purge_interval = purge_interval
+        self._task = None
+
+    async def get(self, key: str) -> CachedResponse | None:
+        """Get the cached response to a request.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the request.
+
+        Returns
+        -------
+        CachedResponse | None
+            The response, or None if it isn't cached. Failures of the shared
+            store are treated as a miss.
+        """
+        response = self._local.get(key)
+
+        if response is not None:
+            response_cache_lookups.labels("local").inc()
+            return response
+
+        if self._store is not None:
+            try:
+                response = await self._store.get(key)
+            except (OSError, SQLAlchemyError):
+                logger.warning("Failed to read the shared response cache")
+
+        if response is None:
+            response_cache_lookups.labels("miss").inc()
+            return None
+
+        response_cache_lookups.labels("shared").inc()
+        self._local.set(key, response, expires_at=response.expires_at)
+
+        return response
+
+    async def set(self, key: str, response: CachedResponse) -> None:
+        """Cache the response to a request.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the request.
+        response : CachedResponse
+            The response. Responses over the maximum size aren't cached.
+        """
+        if len(response.content) > self.max_entry_size:
+            return
+
+        self._local.set(key, response, expires_at=response.expires_at)
+
+        if self._store is not None:
+            try:
+                await self._store.set(key, response)
+            except (OSError, SQLAlchemyError):
+                logger.warning("Failed to write the shared response cache")
+
+    async def _purge_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._purge_interval)
+
+            try:
+                await self._store.purge()  # type: ignore[union-attr]
+            except (OSError, SQLAlchemyError):
+                logger.warning("Failed to purge the shared response cache")
+
+    def start(self) -> None:
+        """Start purging the shared store in the background."""
+        if self._store is not None:
+            self._task = asyncio.create_task(self._purge_periodically())
+
+    async def close(self) -> None:
+        """Stop purging the shared store."""
+        if self._task is not None:
+            self._task.cancel()
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+            self._task = None
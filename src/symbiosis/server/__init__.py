@@ -6,28 +6,65 @@ We grouped the API interface into several groups:
 - /admin/* - The administrative interface for managing the gateway.
 - /health/readiness - Health probe for checking if the server is ready.
 - /health/liveness - Health probe for checking if the server is alive.
+
+The probes report the results of health checks that run in the background,
+as described in :mod:`symbiosis.server.health`.
+
+JSON responses are encoded with orjson, as described in
+:mod:`symbiosis.server.responses`.
 """
 
 from typing import AsyncIterator
 from fastapi import FastAPI
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager
 from prometheus_fastapi_instrumentator import Instrumentator
 from fastapi_healthchecks.api.router import HealthcheckRouter, Probe
+from starlette.exceptions import HTTPException
+
+from symbiosis.auth import token_validator_lifespan
+from symbiosis.catalog import catalog_lifespan
+from symbiosis.database import database_lifespan
+from symbiosis.filters import filters_lifespan
+from symbiosis.providers import providers_lifespan
+from symbiosis.requestlog import request_log_lifespan
+from symbiosis.responsecache import response_cache_lifespan
+from symbiosis.server import v1
+from symbiosis.server.health import get_health_monitor, health_lifespan
+from symbiosis.server.responses import ORJSONResponse, http_exception_handler
 
 
 @asynccontextmanager
 async def app_lifecycle(app: FastAPI) -> AsyncIterator[None]:
     """Application lifespan context manager."""
     Instrumentator().expose(app, tags=["Metrics"])
-    yield
 
+    async with AsyncExitStack() as stack:
+        await stack.enter_async_context(database_lifespan())
+        await stack.enter_async_context(request_log_lifespan())
+        await stack.enter_async_context(response_cache_lifespan())
+        await stack.enter_async_context(catalog_lifespan())
+        await stack.enter_async_context(token_validator_lifespan())
+        await stack.enter_async_context(filters_lifespan())
+        await stack.enter_async_context(providers_lifespan())
+        await stack.enter_async_context(health_lifespan())
+        yield
+
+
+app = FastAPI(
+    title="Symbiosis AI Gateway",
+    version="0.1.0",
+    lifespan=app_lifecycle,
+    default_response_class=ORJSONResponse,
+)
+
+app.add_exception_handler(HTTPException, http_exception_handler)
 
-app = FastAPI(title="Symbiosis AI Gateway", version="0.1.0", lifespan=app_lifecycle)
+app.include_router(v1.router)
 
 app.include_router(
     HealthcheckRouter(
-        Probe(name="readiness", checks=[]),
-        Probe(name="liveness", checks=[]),
+        Probe(name="readiness", checks=get_health_monitor().checks),
+        Probe(name="liveness", checks=[get_health_monitor()]),
     ),
     prefix="/health",
 )
@@ -0,0 +1,317 @@
+"""Health checks behind the readiness and liveness probes.
+
+Kubernetes polls the probes every few seconds, on every replica. The checks
+therefore don't run when a probe is polled: they run in the background on
+an interval, and the probes report their latest results. Polling a probe
+costs nothing, and the checks reuse the connection pools of the gateway
+rather than opening connections of their own.
+
+The readiness probe checks the dependencies a replica needs to serve
+requests:
+
+- database - The database answers a query. Passes when DATABASE_URL isn't
+  set.
+- oidc - The signing keys of the OIDC provider were fetched within their
+  TTL. Passes when OIDC_DISCOVERY_URL isn't set.
+- providers - At least one of the configured providers can be reached, so a
+  single provider outage doesn't take every replica out of service.
+
+The liveness probe only checks that the background checks keep running,
+which they don't when the event loop is blocked. It doesn't depend on other
+services, so an outage of a dependency doesn't restart every replica.
+
+The checks are configured with the following environment variables:
+
+- HEALTH_CHECK_INTERVAL - Seconds between two rounds of checks, by default
+  10.
+- HEALTH_CHECK_TIMEOUT - Seconds a check may take before it fails, by
+  default 5.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
+
+from fastapi_healthchecks.checks import Check, CheckResult
+from prometheus_client import Gauge
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from symbiosis.auth import get_token_validator
+from symbiosis.auth.validation import TokenValidator
+from symbiosis.database import get_async_engine
+from symbiosis.providers import Provider, get_providers
+
+logger = logging.getLogger(__name__)
+
+check_passed = Gauge(
+    "symbiosis_health_check_passed",
+    "Whether the latest run of a health check passed.",
+    ["check"],
+)
+
+NOT_CONFIGURED = "Not configured"
+
+
+class CachedCheck(Check):
+    """A health check that reports the result of its latest run."""
+
+    def __init__(
+        self, name: str, run: Callable[[], Awaitable[str | None]], timeout: float
+    ) -> None:
+        """Initialize the check before its first run.
+
+        Parameters
+        ----------
+        name : str
+            The name of the check.
+        run : Callable[[], Awaitable[str | None]]
+            Runs the check. Returns details about a passed check, and raises
+            an exception when the check fails.
+        timeout : float
+            Seconds a run may take before the check fails.
+        """
+        self.name = name
+        self._run = run
+        self._timeout = timeout
+        self._result = CheckResult(name=name, passed=False, details="Not run yet")
+
+        check_passed.labels(name).set_function(lambda: self._result.passed)
+
+    async def run(self) -> None:
+        """Run the check and keep its result."""
+        try:
+            details = await asyncio.wait_for(self._run(), self._timeout)
+        except Exception as err:  # noqa: BLE001
+            logger.warning("Health check %s failed: %s", self.name, err)
+            self._result = CheckResult(
+                name=self.name, passed=False, details=str(err) or type(err).__name__
+            )
+        else:
+            self._result = CheckResult(name=self.name, passed=True, details=details)
+
+    async def __call__(self) -> CheckResult:
+        """Get the result of the latest run.
+
+        Returns
+        -------
+        CheckResult
+            The result, which fails until the check ran once.
+        """
+        return self._result
+
+
+class HealthMonitor(Check):
+    """Runs health checks in the background on an interval.
+
+    The monitor is a check itself, which passes while the rounds of checks
+    keep running on time.
+    """
+
+    name = "health_monitor"
+
+    def __init__(self, checks: Sequence[CachedCheck], interval: float = 10.0) -> None:
+        """Initialize the monitor without starting it.
+
+        Parameters
+        ----------
+        checks : Sequence[CachedCheck]
+            The checks to run.
+        interval : float, optional
+            Seconds between two rounds of checks, by default 10.
+        """
+        self.checks = tuple(checks)
+        self._interval = interval
+        self._task: asyncio.Task[None] | None = None
+        self._last_run: float | None = None
+
+    async def run_checks(self) -> None:
+        """Run all checks concurrently."""
+        await asyncio.gather(*(check.run() for check in self.checks))
+        self._last_run = time.monotonic()
+
+    async def _run_periodically(self) -> None:
+        while True:
+            await self.run_checks()
+            await asyncio.sleep(self._interval)
+
+    async def start(self) -> None:
+        """Start running the checks in the background."""
+        if self._task is None:
+            self._last_run = time.monotonic()
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def close(self) -> None:
+        """Stop running the checks."""
+        if self._task is not None:
+            self._task.cancel()
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+            self._task = None
+
+    async def __call__(self) -> CheckResult:
+        """Check that the rounds of checks keep running on time.
+
+        Returns
+        -------
+        CheckResult
+            The result, which fails when no round completed in three
+            intervals, or the monitor isn't running.
+        """
+        if self._task is None or self._last_run is None:
+            return CheckResult(name=self.name, passed=False, details="Not running")
+
+        overdue = time.monotonic() - self._last_run - 3 * self._interval
+
+        if overdue > 0:
+            return CheckResult(
+                name=self.name,
+                passed=False,
+                details=f"Checks are {overdue:.0f} seconds overdue",
+            )
+
+        return CheckResult(name=self.name, passed=True)
+
+
+async def check_database(engine: AsyncEngine) -> None:
+    """Check that the database answers a query.
+
+    Parameters
+    ----------
+    engine : AsyncEngine
+        The engine whose connection pool is used.
+    """
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+def check_token_validator(token_validator: TokenValidator) -> None:
+    """Check that the signing keys of the OIDC provider are fresh.
+
+    Parameters
+    ----------
+    token_validator : TokenValidator
+        The validator refreshing the keys in the background.
+
+    Raises
+    ------
+    ValueError
+        If the keys weren't fetched within their TTL.
+    """
+    if not token_validator.has_fresh_keys:
+        msg = "The signing keys of the OIDC provider are missing or stale"
+        raise ValueError(msg)
+
+
+async def check_providers(providers: dict[str, Provider]) -> str | None:
+    """Check that at least one provider can be reached.
+
+    Parameters
+    ----------
+    providers : dict[str, Provider]
+        The configured providers, keyed by provider name.
+
+    Returns
+    -------
+    str | None
+        The providers that can't be reached, if any.
+
+    Raises
+    ------
+    ValueError
+        If none of the providers can be reached.
+    """
+    if not providers:
+        return NOT_CONFIGURED
+
+    results = await asyncio.gather(
+        *(provider.check_reachable() for provider in providers.values()),
+        return_exceptions=True,
+    )
+    unreachable = [
+        name
+        for name, result in zip(providers, results, strict=True)
+        if isinstance(result, Exception)
+    ]
+
+    if len(unreachable) == len(providers):
+        msg = "None of the providers can be reached"
+        raise ValueError(msg)
+
+    return f"Unreachable: {', '.join(unreachable)}" if unreachable else None
+
+
+async def _check_database() -> str | None:
+    if not os.getenv("DATABASE_URL"):
+        return NOT_CONFIGURED
+
+    await check_database(get_async_engine())
+    return None
+
+
+async def _check_oidc() -> str | None:
+    if not os.getenv("OIDC_DISCOVERY_URL"):
+        return NOT_CONFIGURED
+
+    check_token_validator(await get_token_validator())
+    return None
+
+
+async def _check_providers() -> str | None:
+    return await check_providers(await get_providers())
+
+
+def create_health_monitor() -> HealthMonitor:
+    """Create the health monitor configured in the environment.
+
+    Returns
+    -------
+    HealthMonitor
+        The monitor running the checks of the readiness probe.
+    """
+    timeout = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+
+    return HealthMonitor(
+        [
+            CachedCheck("database", _check_database, timeout),
+            CachedCheck("oidc", _check_oidc, timeout),
+            CachedCheck("providers", _check_providers, timeout),
+        ],
+        interval=float(os.getenv("HEALTH_CHECK_INTERVAL", "10")),
+    )
+
+
+# Global health monitor (lazily initialized)
+_health_monitor: HealthMonitor | None = None
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Get the shared health monitor.
+
+    Returns
+    -------
+    HealthMonitor
+        The monitor whose checks back the probes.
+    """
+    global _health_monitor
+    if _health_monitor is None:
+        _health_monitor = create_health_monitor()
+    return _health_monitor
+
+
+@asynccontextmanager
+async def health_lifespan() -> AsyncIterator[None]:
+    """Run the health checks in the background for the lifetime of the app."""
+    health_monitor = get_health_monitor()
+    await health_monitor.start()
+
+    try:
+        yield
+    finally:
+        await health_monitor.close()
@@ -0,0 +1,37 @@
+"""JSON responses of the gateway, encoded with orjson.
+
+FastAPI encodes JSON responses with the standard library by default. The
+gateway uses orjson instead, as the default response class of the app and
+for the errors raised with HTTPException, like rejected requests to the
+universal API.
+"""
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.utils import is_body_allowed_for_status_code
+from starlette.exceptions import HTTPException
+
+__all__ = ["ORJSONResponse", "http_exception_handler"]
+
+
+async def http_exception_handler(_request: Request, exc: HTTPException) -> Response:
+    """Respond to an HTTPException with its detail, encoded with orjson.
+
+    Parameters
+    ----------
+    _request : Request
+        The request that raised the exception.
+    exc : HTTPException
+        The exception.
+
+    Returns
+    -------
+    Response
+        The error response, with the headers of the exception.
+    """
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return Response(status_code=exc.status_code, headers=exc.headers)
+
+    return ORJSONResponse(
+        {"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers
+    )
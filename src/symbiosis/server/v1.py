@@ -0,0 +1,612 @@
+"""The OpenAI compatible universal API interface.
+
+Requests are forwarded to one of the deployments serving the requested model
+according to the model catalog, chosen by the load balancer. Failed requests
+are retried, possibly at another deployment, and requests for models whose
+providers all keep failing are rejected right away. Requests for models the
+provider throttles queue, by the priority class of the project, until the
+provider accepts them or the request can't wait any longer. Clients
+authenticate with the virtual API key of their project, and can only use the
+models of their project. The filters check every request before it's
+forwarded, and are told about the outcome once the response is complete.
+Every request that reaches the filters is recorded in the request log.
+
+Projects can opt in to caching the responses to deterministic requests, and
+to coalescing identical requests that are in flight at the same time. Such
+requests are answered without a request of their own to the provider, but
+still pass the filters, so rate limits apply and the tokens are accounted for.
+
+Request bodies are parsed once and forwarded to the provider as the client
+sent them, as described in :mod:`symbiosis.providers.body`.
+
+Streamed responses are relayed to the client chunk by chunk as they arrive
+from the provider, so the gateway adds as little as possible to the time to
+first token. Completions are requested without compression, so the tokens of
+every stream are counted; a stream the provider compresses anyway is
+decoded before it's relayed.
+
+Completions of projects with guardrails are checked as well. When a streamed
+completion violates a guardrail, the stream to the provider is closed, which
+stops the generation, and the client receives a final chunk with
+content_filter as finish reason. Streams with guardrails are relayed line
+by line, so the line with the violation is withheld, but content relayed
+before it can't be taken back.
+"""
+
+import math
+import time
+import uuid
+from collections.abc import AsyncIterator
+from typing import Annotated
+
+import anyio
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from symbiosis.catalog import (
+    CatalogSnapshot,
+    Deployment,
+    ModelCatalog,
+    ModelEntry,
+    get_catalog,
+)
+from symbiosis.filters import (
+    FilterChain,
+    FilterError,
+    FilterPipeline,
+    RequestContext,
+    StreamGuard,
+    get_filter_pipeline,
+)
+from symbiosis.projects import AuthenticatedProject, authenticated_project
+from symbiosis.providers import (
+    AdmissionRejectedError,
+    AdmissionScheduler,
+    CircuitOpenError,
+    CompletedResponse,
+    Dispatcher,
+    Provider,
+    RequestBody,
+    RequestCoalescer,
+    get_admission_scheduler,
+    get_dispatcher,
+    get_providers,
+    get_request_coalescer,
+    read_response,
+    request_fingerprint,
+)
+from symbiosis.providers.tokens import (
+    StreamingUsageCounter,
+    TokenUsage,
+    count_prompt_tokens,
+    get_token_counter,
+    parse_usage,
+)
+from symbiosis.requestlog import RequestLogger, RequestLogRecord, get_request_logger
+from symbiosis.responsecache import (
+    CachedResponse,
+    ResponseCache,
+    ResponseRecorder,
+    cache_key,
+    get_response_cache,
+    replay_stream,
+)
+
+router = APIRouter(prefix="/v1", tags=["OpenAI"])
+
+# Headers describing the decoded body we relay from the provider to the client.
+STREAMING_RESPONSE_HEADERS = ("content-type",)
+
+# Tells clients whether a cacheable response was served from the cache.
+CACHE_STATUS_HEADER = "X-Symbiosis-Cache"
+
+# Headers for streams of Server-Sent Events, so proxies don't buffer them.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Lets clients say how many seconds they wait for a response at most.
+DEADLINE_HEADER = "X-Symbiosis-Deadline"
+
+# Ends a stream whose completion violates a guardrail. Starts with an empty
+# line, so it also ends an event that was relayed in part.
+CONTENT_FILTER_EVENTS = (
+    b'\ndata: {"object":"chat.completion.chunk","choices":'
+    b'[{"index":0,"delta":{},"finish_reason":"content_filter"}]}\n\n'
+    b"data: [DONE]\n\n"
+)
+
+
+def resolve_model(
+    model: str,
+    snapshot: CatalogSnapshot,
+    providers: dict[str, Provider],
+    project_id: uuid.UUID,
+) -> tuple[ModelEntry, tuple[Deployment, ...]]:
+    """Resolve a model alias to its configuration and available deployments.
+
+    Parameters
+    ----------
+    model : str
+        The model alias from the request.
+    snapshot : CatalogSnapshot
+        The snapshot of the model catalog.
+    providers : dict[str, Provider]
+        The configured providers, keyed by provider name.
+    project_id : uuid.UUID
+        The project requesting the model.
+
+    Returns
+    -------
+    tuple[ModelEntry, tuple[Deployment, ...]]
+        The configuration of the model, and its deployments at configured
+        providers.
+
+    Raises
+    ------
+    HTTPException
+        If the model isn't available to the project or none of its providers
+        is configured.
+    """
+    entry = snapshot.resolve(model, project_id)
+    deployments = (
+        tuple(
+            deployment
+            for deployment in entry.deployments
+            if deployment.provider in providers
+        )
+        if entry is not None
+        else ()
+    )
+
+    if entry is None or not deployments:
+        raise HTTPException(status_code=404, detail=f"Model '{model}' not found")
+
+    return entry, deployments
+
+
+async def _apply_filters(filters: FilterChain, context: RequestContext) -> None:
+    try:
+        await filters.before_request(context)
+    except FilterError as err:
+        raise HTTPException(
+            status_code=err.status_code, detail=err.detail, headers=err.headers
+        ) from err
+
+
+def _log_request(
+    request_logger: RequestLogger,
+    context: RequestContext,
+    request_body: bytes,
+    started_at: float,
+    status_code: int,
+    *,
+    streamed: bool = False,
+    usage: TokenUsage | None = None,
+    response_body: bytes | None = None,
+    cache_hit: bool = False,
+) -> None:
+    request_logger.log(
+        RequestLogRecord(
+            project_id=context.project.project_id,
+            key_id=context.project.key_id,
+            model=context.model.alias,
+            provider=(
+                context.deployment.provider
+                if context.deployment is not None
+                else context.model.provider
+            ),
+            status_code=status_code,
+            streamed=streamed,
+            latency_ms=(time.perf_counter() - started_at) * 1000,
+            prompt_tokens=usage.prompt_tokens if usage is not None else None,
+            completion_tokens=usage.completion_tokens if usage is not None else None,
+            request_body=request_body,
+            response_body=response_body,
+            cache_hit=cache_hit,
+        )
+    )
+
+
+async def _relay_stream(
+    upstream: httpx.Response,
+    counter: StreamingUsageCounter | None,
+    recorder: ResponseRecorder | None,
+    guard: StreamGuard | None = None,
+) -> AsyncIterator[bytes]:
+    partial_line = b""
+
+    async for chunk in upstream.aiter_bytes():
+        if counter is not None:
+            counter.feed(chunk)
+
+        if guard is not None:
+            if guard.violation is not None:
+                # Stops the generation, and the stream isn't cached.
+                await upstream.aclose()
+                yield CONTENT_FILTER_EVENTS
+                return
+
+            # Only complete lines are relayed, since the guard checks them.
+            chunk = partial_line + chunk
+            end = chunk.rfind(b"\n") + 1
+            chunk, partial_line = chunk[:end], chunk[end:]
+
+            if not chunk:
+                continue
+
+        if recorder is not None:
+            recorder.feed(chunk)
+
+        yield chunk
+
+    if partial_line:
+        if recorder is not None:
+            recorder.feed(partial_line)
+
+        yield partial_line
+
+    if recorder is not None:
+        recorder.finish()
+
+
+def _cache_entry(
+    content: bytes,
+    media_type: str | None,
+    usage: TokenUsage,
+    ttl: float,
+    *,
+    streamed: bool,
+) -> CachedResponse:
+    return CachedResponse(
+        content=content,
+        media_type=media_type,
+        streamed=streamed,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        expires_at=time.time() + ttl,
+    )
+
+
+async def _serve_cached(
+    cached: CachedResponse,
+    filters: FilterChain,
+    context: RequestContext,
+    request_logger: RequestLogger,
+    request_body: bytes,
+    started_at: float,
+) -> Response:
+    context.cache_hit = True
+    await filters.after_response(context, cached.usage)
+    _log_request(
+        request_logger,
+        context,
+        request_body,
+        started_at,
+        200,
+        streamed=cached.streamed,
+        usage=cached.usage,
+        response_body=None if cached.streamed else cached.content,
+        cache_hit=True,
+    )
+
+    if cached.streamed:
+        return StreamingResponse(
+            replay_stream(cached.content),
+            media_type=cached.media_type,
+            headers={**SSE_HEADERS, CACHE_STATUS_HEADER: "hit"},
+        )
+
+    return Response(
+        content=cached.content,
+        media_type=cached.media_type,
+        headers={CACHE_STATUS_HEADER: "hit"},
+    )
+
+
+def _streaming_response_headers(upstream: httpx.Response) -> dict[str, str]:
+    return {
+        name: upstream.headers[name]
+        for name in STREAMING_RESPONSE_HEADERS
+        if name in upstream.headers
+    }
+
+
+def _deadline(request: Request) -> float | None:
+    value = request.headers.get(DEADLINE_HEADER)
+
+    if value is None:
+        return None
+
+    try:
+        deadline = float(value)
+    except ValueError:
+        deadline = -1.0
+
+    # Also rejects NaN.
+    if not deadline >= 0:
+        raise HTTPException(status_code=422, detail=f"Invalid {DEADLINE_HEADER} header")
+
+    return deadline
+
+
+@router.post("/chat/completions")
+async def chat_completions(
+    request: Request,
+    project: Annotated[AuthenticatedProject, Depends(authenticated_project)],
+    catalog: Annotated[ModelCatalog, Depends(get_catalog)],
+    providers: Annotated[dict[str, Provider], Depends(get_providers)],
+    pipeline: Annotated[FilterPipeline, Depends(get_filter_pipeline)],
+    request_logger: Annotated[RequestLogger, Depends(get_request_logger)],
+    response_cache: Annotated[ResponseCache, Depends(get_response_cache)],
+    coalescer: Annotated[RequestCoalescer, Depends(get_request_coalescer)],
+    dispatcher: Annotated[Dispatcher, Depends(get_dispatcher)],
+    scheduler: Annotated[AdmissionScheduler, Depends(get_admission_scheduler)],
+) -> Response:
+    """Create a chat completion with the requested model.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request with the OpenAI compatible request body.
+    project : AuthenticatedProject
+        The project calling the API (injected dependency).
+    catalog : ModelCatalog
+        The model catalog (injected dependency).
+    providers : dict[str, Provider]
+        The configured providers (injected dependency).
+    pipeline : FilterPipeline
+        Compiles the filters that apply to the project (injected
+        dependency).
+    request_logger : RequestLogger
+        The request log (injected dependency).
+    response_cache : ResponseCache
+        The cache of deterministic responses (injected dependency).
+    coalescer : RequestCoalescer
+        Joins identical requests in flight (injected dependency).
+    dispatcher : Dispatcher
+        Sends the request to the deployments of the model (injected
+        dependency).
+    scheduler : AdmissionScheduler
+        Queues requests for throttled models (injected dependency).
+
+    Returns
+    -------
+    Response
+        The response of the provider, or the cached response to an identical
+        request. Streamed completions are relayed as Server-Sent Events.
+
+    Raises
+    ------
+    HTTPException
+        If the request is invalid or rejected by a filter, the model is
+        unknown, or the providers cannot be reached.
+    """
+    started_at = time.perf_counter()
+
+    request_body = await request.body()
+
+    try:
+        body = RequestBody.parse(request_body)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail="Invalid JSON body") from err
+
+    if not isinstance(body.get("model"), str):
+        raise HTTPException(status_code=422, detail="The model field is required")
+
+    deadline = _deadline(request)
+    snapshot = catalog.snapshot
+    model, deployments = resolve_model(
+        body["model"], snapshot, providers, project.project_id
+    )
+
+    filters = pipeline.chain(snapshot, project.project_id)
+    count_tokens = get_token_counter(model.deployment)
+    context = RequestContext(
+        project=project,
+        project_settings=snapshot.projects[project.project_id],
+        model=model,
+        body=body,
+        prompt_tokens=count_prompt_tokens(body, count_tokens),
+    )
+
+    try:
+        await _apply_filters(filters, context)
+    except HTTPException as err:
+        _log_request(request_logger, context, request_body, started_at, err.status_code)
+        raise
+
+    try:
+        # Filters may have rewritten the body.
+        body = context.body
+
+        cache_ttl = context.project_settings.response_cache_ttl
+        key = cache_key(project.project_id, model, body) if cache_ttl else None
+
+        if key is not None:
+            cached = await response_cache.get(key)
+
+            if cached is not None:
+                return await _serve_cached(
+                    cached, filters, context, request_logger, request_body, started_at
+                )
+
+        stream = bool(body.get("stream"))
+        coalesce_key = (
+            request_fingerprint(
+                project.project_id, model.provider, model.deployment, body
+            )
+            if context.project_settings.coalesce_requests and not stream
+            else None
+        )
+
+        priority = context.project_settings.priority
+
+        async def complete_chat() -> tuple[CompletedResponse, Deployment]:
+            return await scheduler.submit(
+                model.alias,
+                project.project_id,
+                priority,
+                lambda: dispatcher.complete(providers, deployments, body),
+                deadline,
+            )
+
+        try:
+            if stream:
+                upstream, context.deployment = await scheduler.submit(
+                    model.alias,
+                    project.project_id,
+                    priority,
+                    lambda: dispatcher.open_stream(providers, deployments, body),
+                    deadline,
+                )
+            elif coalesce_key is not None:
+                result, context.coalesced = await coalescer.complete(
+                    coalesce_key, model.provider, complete_chat
+                )
+                completion, context.deployment = result
+            else:
+                completion, context.deployment = await complete_chat()
+        except (AdmissionRejectedError, CircuitOpenError) as err:
+            await filters.after_response(context, None)
+            _log_request(request_logger, context, request_body, started_at, 503)
+            raise HTTPException(
+                status_code=503,
+                detail="The model is temporarily unavailable",
+                headers={"Retry-After": str(math.ceil(err.retry_after))},
+            ) from err
+        except httpx.HTTPError as err:
+            await filters.after_response(context, None)
+            _log_request(request_logger, context, request_body, started_at, 502)
+            raise HTTPException(
+                status_code=502, detail="The model provider is unavailable"
+            ) from err
+
+        if stream and upstream.is_success:
+            guard = (
+                context.output_guard.stream()
+                if context.output_guard is not None
+                else None
+            )
+            counter = StreamingUsageCounter(
+                context.prompt_tokens,
+                count_tokens,
+                guard.feed if guard is not None else None,
+            )
+            recorder = (
+                ResponseRecorder(response_cache.max_entry_size)
+                if key is not None
+                else None
+            )
+
+            async def complete_stream() -> None:
+                await upstream.aclose()
+                usage = counter.usage
+                await filters.after_response(context, usage)
+                _log_request(
+                    request_logger,
+                    context,
+                    request_body,
+                    started_at,
+                    upstream.status_code,
+                    streamed=True,
+                    usage=usage,
+                )
+
+                content = recorder.content if recorder is not None else None
+
+                if key is not None and content is not None and usage is not None:
+                    await response_cache.set(
+                        key,
+                        _cache_entry(
+                            content,
+                            upstream.headers.get("content-type"),
+                            usage,
+                            cache_ttl or 0,
+                            streamed=True,
+                        ),
+                    )
+
+            async def relay() -> AsyncIterator[bytes]:
+                try:
+                    async for chunk in _relay_stream(
+                        upstream, counter, recorder, guard
+                    ):
+                        yield chunk
+                finally:
+                    # Unlike a background task, this also runs when the stream
+                    # fails or the client disconnects.
+                    with anyio.CancelScope(shield=True):
+                        await complete_stream()
+
+            headers = {**_streaming_response_headers(upstream), **SSE_HEADERS}
+
+            if key is not None:
+                headers[CACHE_STATUS_HEADER] = "miss"
+
+            return StreamingResponse(
+                relay(), status_code=upstream.status_code, headers=headers
+            )
+
+        if stream:
+            completion = await read_response(upstream)
+
+        usage = (
+            parse_usage(completion.content, context.prompt_tokens, count_tokens)
+            if completion.is_success
+            else None
+        )
+        content = completion.content
+        filtered = (
+            await context.output_guard.check_completion(content)
+            if context.output_guard is not None and usage is not None
+            else None
+        )
+
+        if filtered is not None:
+            content = filtered
+
+        await filters.after_response(context, usage)
+        _log_request(
+            request_logger,
+            context,
+            request_body,
+            started_at,
+            completion.status_code,
+            usage=usage,
+            response_body=content,
+        )
+
+        response = Response(
+            content=content,
+            status_code=completion.status_code,
+            media_type=completion.media_type,
+        )
+
+        if key is not None:
+            response.headers[CACHE_STATUS_HEADER] = "miss"
+
+            # Coalesced requests share the response the first request caches.
+            if usage is not None and not context.coalesced and filtered is None:
+                # Cache after responding, so the shared store doesn't add latency.
+                response.background = BackgroundTask(
+                    response_cache.set,
+                    key,
+                    _cache_entry(
+                        completion.content,
+                        completion.media_type,
+                        usage,
+                        cache_ttl or 0,
+                        streamed=False,
+                    ),
+                )
+
+        return response
+    except BaseException:
+        # Release what the filters reserved for the request when handling it
+        # fails unexpectedly. Filters that were already told the outcome
+        # ignore this.
+        with anyio.CancelScope(shield=True):
+            await filters.after_response(context, None)
+
+        raise
@@ -0,0 +1,384 @@
+"""Append-only write-ahead log on local disk.
+
+The write-ahead log holds records that couldn't be written to the database,
+so they aren't lost while the database is unavailable. Records are appended
+to segment files in a directory. When a segment reaches its maximum size, a
+new segment is started. Replaying reads the segments in the order they were
+written and deletes each segment once all of its records are written to the
+database.
+
+Every record is framed by its length and a CRC32 checksum, so a record that
+was only partially written, for example because the process crashed, is
+detected and skipped. The progress of replaying a segment is kept in a
+checkpoint file next to the segment, so records aren't replayed twice when a
+replay is interrupted.
+
+Several processes, like the workers of uvicorn, can share the directory. Each
+log appends to segments in a subdirectory of its own, and keeps a lock file
+next to it locked until it's closed, with flock, or msvcrt on Windows.
+Replaying also takes over the segments of subdirectories whose lock file
+isn't locked, left by processes that exited, by moving them into its own
+subdirectory. A segment is therefore only ever appended to
+and replayed by a single process.
+
+The log of every process is limited to a maximum size. Records that don't fit
+are discarded. Appending blocks on disk I/O; call it from a worker thread in
+async code.
+"""
+
+import asyncio
+import contextlib
+import os
+import struct
+import threading
+import uuid
+import zlib
+from collections.abc import Awaitable, Callable, Sequence
+from pathlib import Path
+from typing import BinaryIO
+
+from prometheus_client import Counter, Gauge, Histogram
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+wal_size = Gauge(
+    "symbiosis_wal_size_bytes",
+    "Size of the segments in the write-ahead log.",
+    ["wal"],
+)
+wal_records_discarded = Counter(
+    "symbiosis_wal_records_discarded_total",
+    "Number of records discarded by the write-ahead log.",
+    ["wal", "reason"],
+)
+wal_records_replayed = Counter(
+    "symbiosis_wal_records_replayed_total",
+    "Number of records replayed from the write-ahead log.",
+    ["wal"],
+)
+wal_replay_latency = Histogram(
+    "symbiosis_wal_replay_batch_seconds",
+    "Time taken to write a batch of replayed records.",
+    ["wal"],
+)
+
+# Length and CRC32 checksum of the payload that precede every record.
+_HEADER = struct.Struct("<II")
+
+SEGMENT_SUFFIX = ".wal"
+CHECKPOINT_SUFFIX = ".checkpoint"
+LOCK_SUFFIX = ".lock"
+
+
+def _lock(lock_file: BinaryIO, *, wait: bool) -> bool:
+    # The lock is held until the file is closed, also when the process exits.
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        else:
+            msvcrt.locking(
+                lock_file.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1
+            )
+    except OSError:
+        if wait:
+            raise
+
+        return False
+
+    return True
+
+
+def _read_payload(segment_file: BinaryIO, header: bytes) -> bytes | None:
+    length, checksum = _HEADER.unpack(header)
+    payload = segment_file.read(length)
+
+    if len(payload) < length or zlib.crc32(payload) != checksum:
+        return None
+
+    return payload
+
+
+class WriteAheadLog:
+    """Append-only log of records stored in rotating segment files."""
+
+    def __init__(
+        self,
+        name: str,
+        directory: Path,
+        segment_size: int = 16 * 1024 * 1024,
+        max_size: int = 1024 * 1024 * 1024,
+        *,
+        fsync: bool = False,
+    ) -> None:
+        """Initialize the log in a new subdirectory of the given directory.
+
+        Segments left by previous runs are picked up when replaying.
+
+        Parameters
+        ----------
+        name : str
+            The name of the log, used as label for the metrics.
+        directory : Path
+            The directory holding the subdirectories of the logs sharing it.
+            It's created when needed.
+        segment_size : int, optional
+            The size in bytes after which a new segment is started, by
+            default 16 MiB.
+        max_size : int, optional
+            The maximum size in bytes of the segments of this log, by default
+            1 GiB.
+        fsync : bool, optional
+            Flush appended records to the disk instead of only handing them
+            to the operating system. Protects against power loss at the cost
+            of slower appends. False by default.
+        """
+        self.name = name
+        self._directory = directory
+        self._segment_size = segment_size
+        self._max_size = max_size
+        self._fsync = fsync
+        self._lock = threading.Lock()
+
+        self._size = 0
+        self._next_sequence = 0
+        self._active: Path | None = None
+        self._owned, self._owner_lock = self._create_owned_directory()
+
+        wal_size.labels(name).set_function(lambda: self._size)
+        self._discarded_full = wal_records_discarded.labels(name, "full")
+        self._discarded_corrupt = wal_records_discarded.labels(name, "corrupt")
+        self._replayed = wal_records_replayed.labels(name)
+
+    def __len__(self) -> int:
+        """Get the size in bytes of all segments."""
+        return self._size
+
+    def _create_owned_directory(self) -> tuple[Path, BinaryIO]:
+        # The lock is taken before the subdirectory is created, so other
+        # processes never see the subdirectory unlocked while this log is open.
+        owned = self._directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._directory.mkdir(parents=True, exist_ok=True)
+        owner_lock = owned.with_suffix(LOCK_SUFFIX).open("wb")
+        _lock(owner_lock, wait=True)
+        owned.mkdir()
+
+        return owned, owner_lock
+
+    def _segments(self) -> list[Path]:
+        return sorted(self._owned.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def _new_segment(self) -> Path:
+        segment = self._owned / f"{self._next_sequence:020d}{SEGMENT_SUFFIX}"
+        self._next_sequence += 1
+        return segment
+
+    def _adopt_orphans(self) -> None:
+        for lock_path in self._directory.glob(f"*{LOCK_SUFFIX}"):
+            directory = lock_path.with_suffix("")
+
+            if directory == self._owned:
+                continue
+
+            try:
+                owner_lock = lock_path.open("rb")
+            except FileNotFoundError:
+                continue
+
+            with owner_lock:
+                # Skips logs that are still open, and logs that are still
+                # creating their subdirectory.
+                if not _lock(owner_lock, wait=False) or not directory.is_dir():
+                    continue
+
+                self._adopt(directory)
+
+            with contextlib.suppress(OSError):
+                lock_path.unlink()
+
+    def _adopt(self, directory: Path) -> None:
+        for segment in sorted(directory.glob(f"*{SEGMENT_SUFFIX}")):
+            with self._lock:
+                adopted = self._new_segment()
+                # Renaming claims the segment atomically. A crash before its
+                # checkpoint follows only causes records to be replayed again.
+                segment.rename(adopted)
+                self._size += adopted.stat().st_size
+
+            with contextlib.suppress(FileNotFoundError):
+                segment.with_suffix(CHECKPOINT_SUFFIX).rename(
+                    adopted.with_suffix(CHECKPOINT_SUFFIX)
+                )
+
+        for path in directory.iterdir():
+            path.unlink(missing_ok=True)
+
+        with contextlib.suppress(OSError):
+            directory.rmdir()
+
+    def append(self, payloads: Sequence[bytes]) -> int:
+        """Append records to the log in a single write.
+
+        Parameters
+        ----------
+        payloads : Sequence[bytes]
+            The records to append.
+
+        Returns
+        -------
+        int
+            The number of records appended. Records that don't fit within the
+            maximum size of the log are discarded.
+        """
+        data = bytearray()
+        appended = 0
+
+        with self._lock:
+            for payload in payloads:
+                frame_size = _HEADER.size + len(payload)
+
+                if self._size + len(data) + frame_size > self._max_size:
+                    break
+
+                data += _HEADER.pack(len(payload), zlib.crc32(payload))
+                data += payload
+                appended += 1
+
+            if data:
+                self._write(bytes(data))
+
+        if appended < len(payloads):
+            self._discarded_full.inc(len(payloads) - appended)
+
+        return appended
+
+    def _write(self, data: bytes) -> None:
+        if self._active is None or self._active.stat().st_size >= self._segment_size:
+            self._active = self._new_segment()
+
+        with self._active.open("ab") as segment:
+            segment.write(data)
+            segment.flush()
+
+            if self._fsync:
+                os.fsync(segment.fileno())
+
+        self._size += len(data)
+
+    def _seal_segments(self) -> list[Path]:
+        self._adopt_orphans()
+
+        # New records go to a new segment, so the sealed ones can be replayed
+        # and deleted while records are appended.
+        with self._lock:
+            self._active = None
+            return self._segments()
+
+    def _read_batch(
+        self, segment: Path, offset: int, batch_size: int
+    ) -> tuple[list[bytes], int]:
+        payloads: list[bytes] = []
+
+        with segment.open("rb") as segment_file:
+            segment_file.seek(offset)
+
+            while len(payloads) < batch_size:
+                header = segment_file.read(_HEADER.size)
+
+                if not header:
+                    break
+
+                payload = (
+                    _read_payload(segment_file, header)
+                    if len(header) == _HEADER.size
+                    else None
+                )
+
+                if payload is None:
+                    # The rest of the segment can't be framed reliably.
+                    self._discarded_corrupt.inc()
+                    return payloads, segment.stat().st_size
+
+                payloads.append(payload)
+
+            return payloads, segment_file.tell()
+
+    def _remove(self, segment: Path) -> None:
+        with self._lock:
+            self._size -= segment.stat().st_size
+            segment.unlink()
+            segment.with_suffix(CHECKPOINT_SUFFIX).unlink(missing_ok=True)
+
+    async def replay(
+        self,
+        write: Callable[[list[bytes]], Awaitable[None]],
+        batch_size: int = 500,
+    ) -> int:
+        """Write the records in the log in the order they were appended.
+
+        The segments of logs that weren't closed, or whose process exited,
+        are taken over and written as well. Segments are deleted once all of
+        their records are written. Replaying
+        stops at the first batch that fails to write; the exception of the
+        write is raised and the batch is replayed next time.
+
+        Parameters
+        ----------
+        write : Callable[[list[bytes]], Awaitable[None]]
+            Writes a batch of records.
+        batch_size : int, optional
+            The maximum number of records per batch, by default 500.
+
+        Returns
+        -------
+        int
+            The number of records written.
+        """
+        replayed = 0
+
+        for segment in await asyncio.to_thread(self._seal_segments):
+            checkpoint = segment.with_suffix(CHECKPOINT_SUFFIX)
+            offset = int(checkpoint.read_text()) if checkpoint.exists() else 0
+
+            while True:
+                batch, offset = await asyncio.to_thread(
+                    self._read_batch, segment, offset, batch_size
+                )
+
+                if not batch:
+                    break
+
+                with wal_replay_latency.labels(self.name).time():
+                    await write(batch)
+
+                replayed += len(batch)
+                self._replayed.inc(len(batch))
+                await asyncio.to_thread(checkpoint.write_text, str(offset))
+
+            await asyncio.to_thread(self._remove, segment)
+
+        return replayed
+
+    def close(self) -> None:
+        """Release the subdirectory of the log.
+
+        Segments that weren't replayed are left for the next log using the
+        directory. The subdirectory is deleted when it's empty.
+        """
+        with self._lock:
+            try:
+                self._owned.rmdir()
+            except OSError:
+                # The subdirectory still has segments.
+                removed = False
+            else:
+                removed = True
+
+            self._owner_lock.close()
+
+            if removed:
+                with contextlib.suppress(OSError):
+                    self._owned.with_suffix(LOCK_SUFFIX).unlink()
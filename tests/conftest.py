@@ -1,9 +1,18 @@
 """Pytest configuration and fixtures for Symbiosis Gateway tests."""
 
-from dataclasses import dataclass
-
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
 import pytest
 import requests
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
 from keycloak import KeycloakAdmin
 from testcontainers.keycloak import KeycloakContainer
 
@@ -191,3 +200,105 @@ def token_validator(keycloak: KeycloakFixture) -> TokenValidator:
         TokenValidator: A validator configured for the test Keycloak instance
     """
     return TokenValidator(discovery_url=keycloak.discovery_url)
+
+
+@dataclass
+class OIDCStub:
+    """In-process OIDC provider serving a discovery document and a JWKS."""
+
+    base_url: str
+    hits: Counter = field(default_factory=Counter)
+    keys: dict = field(default_factory=dict)
+    current_kid: str | None = None
+
+    @property
+    def discovery_url(self) -> str:
+        """Get the OIDC discovery URL of the stub."""
+        return f"{self.base_url}/.well-known/openid-configuration"
+
+    def rotate_key(self) -> str:
+        """Add a new signing key and use it for new tokens."""
+        kid = uuid.uuid4().hex
+        self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.current_kid = kid
+        return kid
+
+    def issue_token(self, **claims) -> str:
+        """Issue a token signed with the current signing key."""
+        now = int(time.time())
+        payload = {
+            "iss": self.base_url,
+            "sub": "test-user",
+            "iat": now,
+            "exp": now + 300,
+            **claims,
+        }
+
+        return jwt.encode(
+            payload,
+            self.keys[self.current_kid],
+            algorithm="RS256",
+            headers={"kid": self.current_kid},
+        )
+
+    def documents(self) -> dict:
+        """Get the documents served by the stub, keyed by path."""
+        jwks = []
+
+        for kid, private_key in self.keys.items():
+            jwk = RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+            jwks.append({**jwk, "kid": kid, "use": "sig", "alg": "RS256"})
+
+        return {
+            "/.well-known/openid-configuration": {
+                "issuer": self.base_url,
+                "jwks_uri": f"{self.base_url}/jwks",
+                "id_token_signing_alg_values_supported": ["RS256"],
+            },
+            "/jwks": {"keys": jwks},
+        }
+
+
+@pytest.fixture
+def oidc_stub() -> OIDCStub:
+    """
+    Start an in-process OIDC provider for tests that don't need Keycloak.
+
+    The stub records the number of requests per path in `hits` so tests can
+    verify how often the discovery document and key set are fetched.
+
+    Returns:
+        OIDCStub: The running OIDC provider stub
+    """
+    stub = None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stub.hits[self.path] += 1
+            document = stub.documents().get(self.path)
+
+            if document is None:
+                self.send_error(404)
+                return
+
+            body = json.dumps(document).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    stub = OIDCStub(base_url=f"http://127.0.0.1:{server.server_port}")
+    stub.rotate_key()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield stub
+
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,223 @@
+"""Tests for admission control of requests to the providers."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from symbiosis.catalog import Deployment
+from symbiosis.projects import Priority
+from symbiosis.providers import (
+    AdmissionRejectedError,
+    AdmissionScheduler,
+    CompletedResponse,
+)
+
+DEPLOYMENT = Deployment("openai", "gpt-4o")
+
+
+def respond(status_code=200, retry_after=None):
+    """
+    Create the result of a request to the provider.
+
+    Args:
+        status_code: The status code of the response
+        retry_after: The Retry-After header of the response
+
+    Returns:
+        tuple: The response, and the deployment that sent it
+    """
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = CompletedResponse(
+        status_code=status_code,
+        content=b"{}",
+        media_type="application/json",
+        headers=httpx.Headers(headers),
+    )
+    return response, DEPLOYMENT
+
+
+class Provider:
+    """Answers requests with scripted responses, then with status 200."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def send(self):
+        self.calls += 1
+        return self.responses.pop(0) if self.responses else respond()
+
+
+async def occupy(scheduler, model="gpt-4o"):
+    """
+    Hold the only slot of a model until the returned event is set.
+
+    Args:
+        scheduler: The admission scheduler
+        model: The model to occupy
+
+    Returns:
+        tuple: The event releasing the slot, and the task holding it
+    """
+    release = asyncio.Event()
+
+    async def send():
+        await release.wait()
+        return respond()
+
+    task = asyncio.create_task(
+        scheduler.submit(model, "occupant", Priority.STANDARD, send)
+    )
+    await asyncio.sleep(0)
+    return release, task
+
+
+def test_scheduler_admits_in_weighted_fair_order():
+    """
+    Test that queued interactive requests overtake queued batch requests.
+    """
+
+    async def run():
+        scheduler = AdmissionScheduler(max_concurrency=1)
+        release, occupant = await occupy(scheduler)
+        admitted = []
+
+        def sender(name):
+            async def send():
+                admitted.append(name)
+                return respond()
+
+            return send
+
+        tasks = [
+            asyncio.create_task(
+                scheduler.submit("gpt-4o", project, priority, sender(project))
+            )
+            for project, priority in [
+                ("batch", Priority.BATCH),
+                ("batch", Priority.BATCH),
+                ("interactive", Priority.INTERACTIVE),
+                ("interactive", Priority.INTERACTIVE),
+            ]
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(occupant, *tasks)
+        return admitted
+
+    assert asyncio.run(run()) == ["interactive", "interactive", "batch", "batch"]
+
+
+def test_scheduler_queues_throttled_requests():
+    """
+    Test that a throttled request waits for the Retry-After and is sent again.
+    """
+    provider = Provider(respond(429, retry_after="0.05"))
+    scheduler = AdmissionScheduler()
+
+    response, _ = asyncio.run(
+        scheduler.submit("gpt-4o", "project", Priority.STANDARD, provider.send)
+    )
+
+    assert response.status_code == 200
+    assert provider.calls == 2
+
+
+def test_scheduler_returns_throttled_response_past_deadline():
+    """
+    Test that the throttled response is returned when waiting takes too long.
+    """
+    provider = Provider(respond(429, retry_after="60"))
+    scheduler = AdmissionScheduler()
+
+    response, _ = asyncio.run(
+        scheduler.submit("gpt-4o", "project", Priority.INTERACTIVE, provider.send)
+    )
+
+    assert response.status_code == 429
+    assert provider.calls == 1
+
+
+def test_scheduler_sheds_requests_that_cannot_make_their_deadline():
+    """
+    Test that requests are rejected right away while the model is throttled.
+    """
+
+    async def run():
+        scheduler = AdmissionScheduler()
+        await scheduler.submit(
+            "gpt-4o",
+            "project",
+            Priority.INTERACTIVE,
+            Provider(respond(429, retry_after="60")).send,
+        )
+
+        with pytest.raises(AdmissionRejectedError) as err:
+            await scheduler.submit(
+                "gpt-4o", "project", Priority.BATCH, Provider().send, deadline=1
+            )
+
+        return err.value.retry_after
+
+    assert asyncio.run(run()) > 59
+
+
+def test_scheduler_sheds_requests_that_time_out():
+    """
+    Test that queued requests are rejected after their maximum queue time.
+    """
+
+    async def run():
+        scheduler = AdmissionScheduler(
+            max_concurrency=1,
+            max_queue_times=dict.fromkeys(Priority, 0.05),
+        )
+        release, occupant = await occupy(scheduler)
+
+        with pytest.raises(AdmissionRejectedError):
+            await scheduler.submit(
+                "gpt-4o", "project", Priority.STANDARD, Provider().send
+            )
+
+        release.set()
+        await occupant
+
+        # The slot of the request that timed out isn't leaked.
+        return await scheduler.submit(
+            "gpt-4o", "project", Priority.STANDARD, Provider().send
+        )
+
+    response, _ = asyncio.run(run())
+    assert response.status_code == 200
+
+
+def test_scheduler_displaces_lowest_precedence_when_full():
+    """
+    Test that a full queue sheds the request that would be admitted last.
+    """
+
+    async def run():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue_size=1)
+        release, occupant = await occupy(scheduler)
+
+        batch = asyncio.create_task(
+            scheduler.submit("gpt-4o", "batch", Priority.BATCH, Provider().send)
+        )
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(
+            scheduler.submit(
+                "gpt-4o", "interactive", Priority.INTERACTIVE, Provider().send
+            )
+        )
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejectedError):
+            await batch
+
+        release.set()
+        await occupant
+        return await interactive
+
+    response, _ = asyncio.run(run())
+    assert response.status_code == 200
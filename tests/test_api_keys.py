@@ -0,0 +1,188 @@
+"""Tests for virtual API key authentication."""
+
+import asyncio
+import uuid
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from symbiosis.projects import (
+    ApiKey,
+    ApiKeyAuthenticator,
+    AuthenticatedProject,
+    authenticated_project,
+    generate_api_key,
+    get_api_key_authenticator,
+    verify_api_key,
+)
+
+
+class KeyStore:
+    """Serves API keys from memory and counts the lookups."""
+
+    def __init__(self):
+        self.keys = []
+        self.lookups = 0
+
+    def add(self, project_id):
+        key, key_prefix, key_hash = generate_api_key()
+        api_key = ApiKey(
+            project_id=project_id, key_prefix=key_prefix, key_hash=key_hash
+        )
+        self.keys.append(api_key)
+        return key, api_key
+
+    async def load(self, key_prefix):
+        self.lookups += 1
+        return [
+            api_key
+            for api_key in self.keys
+            if api_key.key_prefix == key_prefix and api_key.revoked_at is None
+        ]
+
+
+@pytest.fixture
+def key_store():
+    """
+    Provide an in-memory store of API keys.
+
+    Returns:
+        KeyStore: The store of API keys
+    """
+    return KeyStore()
+
+
+def test_verify_api_key():
+    """
+    Test that a key only matches its own hash.
+    """
+    key, _, key_hash = generate_api_key()
+    other_key, _, _ = generate_api_key()
+
+    assert verify_api_key(key, key_hash)
+    assert not verify_api_key(other_key, key_hash)
+    assert not verify_api_key(key, "not-a-hash")
+
+
+def test_authenticate_caches_verified_keys(key_store):
+    """
+    Test that a verified key is served from the cache afterwards.
+
+    Args:
+        key_store: The store of API keys
+    """
+    project_id = uuid.uuid4()
+    key, api_key = key_store.add(project_id)
+    authenticator = ApiKeyAuthenticator(load_keys=key_store.load)
+
+    async def authenticate_concurrently():
+        return await asyncio.gather(
+            *[authenticator.authenticate(key) for _ in range(5)]
+        )
+
+    projects = asyncio.run(authenticate_concurrently())
+    project = asyncio.run(authenticator.authenticate(key))
+
+    assert project == AuthenticatedProject(project_id=project_id, key_id=api_key.id)
+    assert all(result == project for result in projects)
+    assert key_store.lookups == 1
+
+
+def test_authenticate_caches_unknown_keys(key_store):
+    """
+    Test that unknown keys are rejected without a lookup for every attempt.
+
+    Args:
+        key_store: The store of API keys
+    """
+    authenticator = ApiKeyAuthenticator(load_keys=key_store.load)
+    key, _, _ = generate_api_key()
+
+    assert asyncio.run(authenticator.authenticate(key)) is None
+    assert asyncio.run(authenticator.authenticate(key)) is None
+    assert key_store.lookups == 1
+
+
+def test_authenticate_survives_cancelled_first_request(key_store):
+    """
+    Test that cancelling the request that looks up a key doesn't fail the
+    requests waiting for the same key.
+
+    Args:
+        key_store: The store of API keys
+    """
+    project_id = uuid.uuid4()
+    key, _ = key_store.add(project_id)
+    authenticator = ApiKeyAuthenticator(load_keys=key_store.load)
+
+    async def cancel_first_request():
+        first = asyncio.create_task(authenticator.authenticate(key))
+        second = asyncio.create_task(authenticator.authenticate(key))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        return await second
+
+    project = asyncio.run(cancel_first_request())
+
+    assert project is not None
+    assert project.project_id == project_id
+    assert key_store.lookups == 1
+
+
+def test_invalidate_rejects_revoked_key(key_store):
+    """
+    Test that a revoked key is rejected once it's invalidated.
+
+    Args:
+        key_store: The store of API keys
+    """
+    key, api_key = key_store.add(uuid.uuid4())
+    authenticator = ApiKeyAuthenticator(load_keys=key_store.load)
+
+    assert asyncio.run(authenticator.authenticate(key)) is not None
+
+    key_store.keys.remove(api_key)
+    authenticator.invalidate(api_key.id)
+
+    assert asyncio.run(authenticator.authenticate(key)) is None
+
+
+@pytest.mark.parametrize("header", ["Authorization", "api-key"])
+def test_authenticated_project(key_store, header):
+    """
+    Test that the key is accepted as Bearer token and in the api-key header.
+
+    Args:
+        key_store: The store of API keys
+        header: The header to send the key in
+    """
+    project_id = uuid.uuid4()
+    key, _ = key_store.add(project_id)
+
+    app = FastAPI()
+    app.dependency_overrides[get_api_key_authenticator] = lambda: ApiKeyAuthenticator(
+        load_keys=key_store.load
+    )
+
+    @app.get("/protected")
+    async def protected_endpoint(
+        project: AuthenticatedProject = Depends(authenticated_project),  # noqa: B008
+    ):
+        return {"project_id": str(project.project_id)}
+
+    client = TestClient(app)
+    value = f"Bearer {key}" if header == "Authorization" else key
+
+    response = client.get("/protected", headers={header: value})
+    assert response.status_code == 200
+    assert response.json() == {"project_id": str(project_id)}
+
+    response = client.get("/protected", headers={header: value + "x"})
+    assert response.status_code == 401
+
+    assert client.get("/protected").status_code == 401
@@ -3,7 +3,12 @@
 from fastapi.testclient import TestClient
 from fastapi import FastAPI, Depends
 
-from symbiosis.auth import authenticated_user, get_token_validator, AuthenticatedUser
+from symbiosis.auth import (
+    AuthenticatedUser,
+    async_authenticated_user,
+    authenticated_user,
+    get_token_validator,
+)
 from symbiosis.auth.validation import TokenValidator
 
 
@@ -136,3 +141,43 @@ def test_authenticated_user_invalid_token(token_validator: TokenValidator):
     # Assert the response is 401 Unauthorized
     assert response.status_code == 401
     assert response.json()["detail"] == "Invalid token"
+
+
+def test_async_authenticated_user_happy_flow(oidc_stub):
+    """
+    Test the happy flow for the async_authenticated_user function.
+
+    This test verifies that the async dependency validates the Bearer token
+    on the event loop and returns an AuthenticatedUser with the claims.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+    """
+    app = FastAPI()
+
+    token_validator = TokenValidator(discovery_url=oidc_stub.discovery_url)
+    app.dependency_overrides[get_token_validator] = lambda: token_validator
+
+    @app.get("/protected")
+    async def protected_endpoint(
+        user: AuthenticatedUser = Depends(async_authenticated_user),  # noqa: B008
+    ):
+        return {"user": user.claims}
+
+    client = TestClient(app)
+
+    response = client.get(
+        "/protected",
+        headers={"Authorization": f"Bearer {oidc_stub.issue_token()}"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["user"]["sub"] == "test-user"
+
+    response = client.get(
+        "/protected",
+        headers={"Authorization": "Bearer invalid.token.here"}
+    )
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid token"
@@ -0,0 +1,149 @@
+"""Tests for load balancing across the deployments of a model."""
+
+import random
+
+import httpx
+import pytest
+
+from symbiosis.providers import LoadBalancer, balancing
+
+
+class Clock:
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replace the clock of the load balancer.
+
+    Args:
+        monkeypatch: Fixture to patch the load balancer module
+
+    Returns:
+        Clock: The clock used by the load balancer
+    """
+    clock = Clock()
+    monkeypatch.setattr(balancing, "time", clock)
+    return clock
+
+
+def respond(balancer, deployment, clock, latency, status_code=200):
+    """
+    Record a request to a deployment that took the given time.
+
+    Args:
+        balancer: The load balancer
+        deployment: The deployment receiving the request
+        clock: The clock used by the load balancer
+        latency: Seconds until the response arrived
+        status_code: The status code of the response
+    """
+    with balancer.track(deployment) as attempt:
+        clock.now += latency
+        attempt.status_code = status_code
+
+
+def choices(balancer, deployments, count=200):
+    """
+    Count how often each deployment is chosen.
+
+    Args:
+        balancer: The load balancer
+        deployments: The deployments to choose from
+        count: The number of choices
+
+    Returns:
+        dict: The number of times each deployment was chosen
+    """
+    chosen = dict.fromkeys(deployments, 0)
+
+    for _ in range(count):
+        chosen[balancer.choose(deployments)] += 1
+
+    return chosen
+
+
+def test_balancer_prefers_faster_deployment(clock):
+    """
+    Test that the deployment with the lowest latency wins the comparison.
+
+    Args:
+        clock: The clock used by the load balancer
+    """
+    balancer = LoadBalancer(rng=random.Random(1))
+    respond(balancer, "east", clock, 0.2)
+    respond(balancer, "west", clock, 3.0)
+
+    assert choices(balancer, ["east", "west"]) == {"east": 200, "west": 0}
+
+
+def test_balancer_avoids_throttled_deployment(clock):
+    """
+    Test that a response with status 429 counts as a very slow response.
+
+    Args:
+        clock: The clock used by the load balancer
+    """
+    balancer = LoadBalancer(rng=random.Random(1))
+    respond(balancer, "east", clock, 0.1, status_code=429)
+    respond(balancer, "west", clock, 2.0)
+
+    assert balancer.choose(["east", "west"]) == "west"
+
+
+def test_balancer_ejects_and_readmits_failing_deployment(clock):
+    """
+    Test that a failing deployment is ejected and admitted again gradually.
+
+    Args:
+        clock: The clock used by the load balancer
+    """
+    balancer = LoadBalancer(
+        failure_threshold=2,
+        ejection_time=10,
+        ramp_up_time=10,
+        rng=random.Random(1),
+    )
+    deployments = ["east", "west", "north"]
+
+    for deployment in deployments:
+        respond(balancer, deployment, clock, 1.0)
+
+    error = httpx.ConnectError("refused")
+
+    with pytest.raises(httpx.ConnectError), balancer.track("east"):
+        raise error
+
+    respond(balancer, "east", clock, 0.0, status_code=503)
+
+    assert choices(balancer, deployments)["east"] == 0
+
+    clock.now += 10.5
+
+    assert choices(balancer, deployments)["east"] == 0
+
+    clock.now += 10
+
+    assert choices(balancer, deployments)["east"] > 0
+
+
+def test_balancer_falls_back_when_all_deployments_are_ejected(clock):
+    """
+    Test that requests still go somewhere when every deployment is ejected.
+
+    Args:
+        clock: The clock used by the load balancer
+    """
+    balancer = LoadBalancer(failure_threshold=1)
+
+    for deployment in ("east", "west"):
+        respond(balancer, deployment, clock, 0.1, status_code=500)
+
+    assert balancer.choose(["east", "west"]) in {"east", "west"}
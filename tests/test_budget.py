@@ -0,0 +1,256 @@
+"""Tests for the budget filter and the cost ledger."""
+
+import asyncio
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from symbiosis.catalog import ModelEntry, ProjectEntry
+from symbiosis.filters import (
+    BudgetFilter,
+    FilterError,
+    RequestContext,
+    SpendTracker,
+    calculate_cost,
+)
+from symbiosis.projects import AuthenticatedProject
+from symbiosis.projects.ledger import CostLedger, CostRecord
+from symbiosis.providers.tokens import TokenUsage
+
+MODEL = ModelEntry(
+    alias="gpt-4o",
+    provider="openai",
+    deployment="gpt-4o",
+    prompt_token_price=Decimal("2.50"),
+    completion_token_price=Decimal("10.00"),
+)
+
+
+class LedgerWriter:
+    """Collects written batches, optionally failing the first write."""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    async def __call__(self, records):
+        if self.failures:
+            self.failures -= 1
+            msg = "INSERT"
+            raise OperationalError(msg, {}, ConnectionError())
+
+        self.batches.append(list(records))
+
+
+def create_context(budget, max_tokens=1000):
+    """
+    Create the context of a request from a project with a budget.
+
+    Args:
+        budget: The monthly budget of the project
+        max_tokens: The maximum number of completion tokens
+
+    Returns:
+        RequestContext: The context of the request
+    """
+    project_id = uuid.uuid4()
+
+    return RequestContext(
+        project=AuthenticatedProject(project_id=project_id, key_id=uuid.uuid4()),
+        project_settings=ProjectEntry(
+            id=project_id, name="test", monthly_budget=budget
+        ),
+        model=MODEL,
+        body={"max_tokens": max_tokens},
+        prompt_tokens=1000,
+    )
+
+
+@pytest.fixture
+def writer():
+    """
+    Provide a writer collecting the batches written to the ledger.
+
+    Returns:
+        LedgerWriter: The writer
+    """
+    return LedgerWriter()
+
+
+@pytest.fixture
+def ledger(writer):
+    """
+    Provide a cost ledger writing to memory.
+
+    Args:
+        writer: The writer collecting the batches
+
+    Returns:
+        CostLedger: The ledger
+    """
+    return CostLedger(write=writer)
+
+
+@pytest.fixture
+def budget_filter(ledger):
+    """
+    Provide a budget filter without any spend.
+
+    Args:
+        ledger: The cost ledger
+
+    Returns:
+        BudgetFilter: The filter
+    """
+
+    async def load_spend(_):
+        return {}
+
+    return BudgetFilter(SpendTracker(load_spend=load_spend, ledger=ledger), ledger)
+
+
+def test_calculate_cost():
+    """
+    Test that the cost is calculated from the prices per million tokens.
+    """
+    assert calculate_cost(MODEL, 1_000_000, 100_000) == Decimal("3.5")
+
+
+def test_budget_filter_records_cost(budget_filter, ledger):
+    """
+    Test that the cost of a request is recorded in the ledger.
+
+    Args:
+        budget_filter: The budget filter
+        ledger: The cost ledger
+    """
+    context = create_context(budget=Decimal(1))
+
+    async def handle_request():
+        await budget_filter.before_request(context)
+        await budget_filter.after_response(context, TokenUsage(1000, 500))
+
+    asyncio.run(handle_request())
+
+    assert ledger.pending_costs() == {context.project.project_id: Decimal("0.0075")}
+
+
+def test_budget_filter_rejects_exhausted_budget(budget_filter):
+    """
+    Test that requests are rejected once their cost would exceed the budget.
+
+    Args:
+        budget_filter: The budget filter
+    """
+    # A request may cost up to 0.0025 + 0.01 = 0.0125.
+    context = create_context(budget=Decimal("0.02"))
+
+    async def handle_requests():
+        await budget_filter.before_request(context)
+
+        # The first request is still in flight, so its cost is reserved.
+        with pytest.raises(FilterError) as error:
+            await budget_filter.before_request(context)
+
+        assert error.value.status_code == 402
+
+        await budget_filter.after_response(context, TokenUsage(1000, 100))
+        await budget_filter.before_request(context)
+
+    asyncio.run(handle_requests())
+
+
+def test_ledger_flushes_in_batches(ledger, writer):
+    """
+    Test that pending records are written in a single batch.
+
+    Args:
+        ledger: The cost ledger
+        writer: The writer collecting the batches
+    """
+    project_id = uuid.uuid4()
+
+    for _ in range(3):
+        ledger.record(
+            CostRecord(
+                project_id=project_id,
+                key_id=uuid.uuid4(),
+                model="gpt-4o",
+                prompt_tokens=10,
+                completion_tokens=10,
+                cost=Decimal(1),
+            )
+        )
+
+    assert ledger.pending_costs() == {project_id: Decimal(3)}
+
+    asyncio.run(ledger.flush())
+
+    assert [len(batch) for batch in writer.batches] == [3]
+    assert len(ledger) == 0
+
+
+def test_ledger_keeps_records_when_write_fails():
+    """
+    Test that records are written on the next flush when a write fails.
+    """
+    writer = LedgerWriter(failures=1)
+    ledger = CostLedger(write=writer)
+    ledger.record(
+        CostRecord(
+            project_id=uuid.uuid4(),
+            key_id=uuid.uuid4(),
+            model="gpt-4o",
+            prompt_tokens=10,
+            completion_tokens=10,
+            cost=Decimal(1),
+        )
+    )
+
+    asyncio.run(ledger.flush())
+    assert len(ledger) == 1
+
+    asyncio.run(ledger.flush())
+    assert len(writer.batches) == 1
+    assert len(ledger) == 0
+
+
+def test_resync_counts_records_written_during_reload():
+    """
+    Test that records written while the spend is reloaded are still counted.
+    """
+    writer = LedgerWriter()
+    ledger = CostLedger(write=writer)
+    project_id = uuid.uuid4()
+
+    async def load_spend(_):
+        spent = {}
+
+        for record in (record for batch in writer.batches for record in batch):
+            spent[record.project_id] = spent.get(record.project_id, 0) + record.cost
+
+        # The query sees the ledger as it was when it started.
+        await asyncio.sleep(0.01)
+        return spent
+
+    tracker = SpendTracker(load_spend=load_spend, ledger=ledger)
+    ledger.record(
+        CostRecord(
+            project_id=project_id,
+            key_id=uuid.uuid4(),
+            model="gpt-4o",
+            prompt_tokens=10,
+            completion_tokens=10,
+            cost=Decimal(1),
+        )
+    )
+
+    async def resync_while_flushing():
+        await asyncio.gather(tracker.resync(), ledger.flush())
+
+    asyncio.run(resync_while_flushing())
+
+    assert tracker.spent(project_id) == Decimal(1)
+    assert len(writer.batches) == 1
@@ -0,0 +1,35 @@
+"""Tests for the in-process caching utilities."""
+
+import time
+
+from symbiosis.caching import TTLCache
+
+
+def test_cache_evicts_least_recently_used_entry():
+    """
+    Test that the cache evicts the least recently used entry when full.
+    """
+    cache = TTLCache("test-lru", maxsize=2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_cache_expires_entries():
+    """
+    Test that entries are not returned after their expiration time.
+    """
+    cache = TTLCache("test-expiry", maxsize=10, ttl=60)
+
+    cache.set("expired", 1, expires_at=time.time() - 1)
+    cache.set("valid", 2)
+
+    assert cache.get("expired") is None
+    assert cache.get("valid") == 2
+    assert len(cache) == 1
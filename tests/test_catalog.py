@@ -0,0 +1,123 @@
+"""Tests for the in-memory model catalog."""
+
+import asyncio
+import uuid
+
+import pytest
+
+from symbiosis.catalog import (
+    CatalogSnapshot,
+    Deployment,
+    ModelCatalog,
+    ModelEntry,
+    ProjectEntry,
+)
+
+PROJECT_ID = uuid.uuid4()
+
+MODELS = [
+    ModelEntry(alias="gpt-4o", provider="openai", deployment="gpt-4o"),
+    ModelEntry(alias="gpt-4o-mini", provider="openai", deployment="gpt-4o-mini"),
+    ModelEntry(alias="my-gpt", provider="azure-openai", deployment="my-gpt"),
+]
+
+
+@pytest.fixture
+def snapshot():
+    """
+    Build a snapshot with three models and a project that can use one of them.
+
+    Returns:
+        CatalogSnapshot: The indexed snapshot
+    """
+    return CatalogSnapshot.build(
+        models=MODELS,
+        projects=[
+            ProjectEntry(id=PROJECT_ID, name="test", models=frozenset({"gpt-4o"}))
+        ],
+    )
+
+
+def test_snapshot_indexes_models_by_provider(snapshot):
+    """
+    Test that the snapshot indexes the models by provider.
+
+    Args:
+        snapshot: The catalog snapshot
+    """
+    assert [model.alias for model in snapshot.providers["openai"]] == [
+        "gpt-4o",
+        "gpt-4o-mini",
+    ]
+    assert snapshot.resolve("my-gpt").provider == "azure-openai"
+
+
+def test_snapshot_indexes_additional_deployments():
+    """
+    Test that models are indexed by the providers of all their deployments.
+    """
+    model = ModelEntry(
+        alias="gpt-4o",
+        provider="azure-openai",
+        deployment="gpt-4o-us",
+        additional_deployments=(
+            Deployment("azure-openai-westeurope", "gpt-4o-eu"),
+            Deployment("azure-openai", "gpt-4o-us-2"),
+        ),
+    )
+    snapshot = CatalogSnapshot.build(models=[model], projects=[])
+
+    assert [str(deployment) for deployment in model.deployments] == [
+        "azure-openai/gpt-4o-us",
+        "azure-openai-westeurope/gpt-4o-eu",
+        "azure-openai/gpt-4o-us-2",
+    ]
+    assert snapshot.providers["azure-openai"] == (model,)
+    assert snapshot.providers["azure-openai-westeurope"] == (model,)
+
+
+def test_snapshot_resolves_only_models_of_project(snapshot):
+    """
+    Test that a project can only resolve the models it has access to.
+
+    Args:
+        snapshot: The catalog snapshot
+    """
+    assert snapshot.resolve("gpt-4o", PROJECT_ID).deployment == "gpt-4o"
+    assert snapshot.resolve("my-gpt", PROJECT_ID) is None
+    assert snapshot.resolve("gpt-4o", uuid.uuid4()) is None
+
+
+def test_snapshot_is_read_only(snapshot):
+    """
+    Test that the indexes of a snapshot can't be modified.
+
+    Args:
+        snapshot: The catalog snapshot
+    """
+    with pytest.raises(TypeError):
+        snapshot.models["new"] = MODELS[0]
+
+
+def test_reload_swaps_snapshot():
+    """
+    Test that reloading the catalog replaces the snapshot with a new version.
+    """
+    loaded_models = [MODELS[:1], MODELS]
+
+    async def load(version):
+        return CatalogSnapshot.build(
+            models=loaded_models[version - 1], projects=[], version=version
+        )
+
+    catalog = ModelCatalog(load=load)
+
+    asyncio.run(catalog.reload())
+    first_snapshot = catalog.snapshot
+
+    asyncio.run(catalog.reload())
+
+    assert first_snapshot.version == 1
+    assert list(first_snapshot.models) == ["gpt-4o"]
+    assert catalog.snapshot.version == 2
+    assert len(catalog.snapshot.models) == 3
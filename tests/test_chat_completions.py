@@ -0,0 +1,610 @@
+"""Tests for the OpenAI compatible chat completions endpoint."""
+
+import asyncio
+import gzip
+import json
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from symbiosis.catalog import (
+    CatalogSnapshot,
+    Deployment,
+    ModelCatalog,
+    ModelEntry,
+    ProjectEntry,
+    get_catalog,
+)
+from symbiosis.filters import (
+    Filter,
+    FilterPipeline,
+    InMemoryRateLimitStore,
+    RateLimiter,
+    RateLimitFilter,
+    get_filter_pipeline,
+)
+from symbiosis.projects import AuthenticatedProject, authenticated_project
+from symbiosis.providers import (
+    AdmissionScheduler,
+    AzureOpenAIProvider,
+    Dispatcher,
+    LoadBalancer,
+    OpenAIProvider,
+    RetryBudget,
+    RetryPolicy,
+    get_admission_scheduler,
+    get_dispatcher,
+    get_providers,
+)
+from symbiosis.requestlog import RequestLogger, get_request_logger
+from symbiosis.responsecache import ResponseCache, get_response_cache
+from symbiosis.server import v1
+
+PROJECT_ID = uuid.uuid4()
+
+SSE_CHUNKS = [
+    b'data: {"choices":[{"delta":{"content":"Hello"}}]}\n\n',
+    b'data: {"choices":[{"delta":{"content":" world"}}]}\n\n',
+    b"data: [DONE]\n\n",
+]
+
+
+class UpstreamStub:
+    """Records upstream requests and answers them like the OpenAI API."""
+
+    def __init__(self):
+        self.requests = []
+        self.failures = []
+        self.compress = False
+        self.drop = False
+
+    async def stream_chunks(self):
+        for chunk in SSE_CHUNKS:
+            yield chunk
+
+            if self.drop:
+                msg = "Connection dropped"
+                raise httpx.ReadError(msg)
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        body = json.loads(request.content)
+
+        if self.failures and self.drop:
+            return httpx.Response(self.failures.pop(0), content=self.stream_chunks())
+
+        if self.failures:
+            return httpx.Response(self.failures.pop(0), json={"error": {}})
+
+        if body.get("stream") and self.compress:
+            return httpx.Response(
+                200,
+                headers={
+                    "content-type": "text/event-stream",
+                    "content-encoding": "gzip",
+                },
+                content=gzip.compress(b"".join(SSE_CHUNKS)),
+            )
+
+        if body.get("stream"):
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                content=self.stream_chunks(),
+            )
+
+        return httpx.Response(200, json={"model": body.get("model"), "choices": []})
+
+
+class OutcomeFilter(Filter):
+    """Records the outcomes of the requests it passes."""
+
+    def __init__(self):
+        self.outcomes = []
+
+    async def before_request(self, context):
+        pass
+
+    async def after_response(self, context, usage):  # noqa: ARG002
+        self.outcomes.append(usage)
+
+
+@pytest.fixture
+def upstream():
+    """
+    Provide a stub for the upstream model provider.
+
+    Returns:
+        UpstreamStub: The stub answering requests to the provider
+    """
+    return UpstreamStub()
+
+
+@pytest.fixture
+def catalog():
+    """
+    Provide a model catalog with one model per provider for the test project.
+
+    Returns:
+        ModelCatalog: The loaded model catalog
+    """
+
+    async def load(version):
+        return CatalogSnapshot.build(
+            models=[
+                ModelEntry(alias="gpt-4o", provider="openai", deployment="gpt-4o-0806"),
+                ModelEntry(
+                    alias="my-gpt", provider="azure-openai", deployment="my-gpt-prod"
+                ),
+                ModelEntry(alias="o1", provider="openai", deployment="o1"),
+            ],
+            projects=[
+                ProjectEntry(
+                    id=PROJECT_ID,
+                    name="test",
+                    models=frozenset({"gpt-4o", "my-gpt"}),
+                    requests_per_minute=2,
+                    response_cache_ttl=60,
+                )
+            ],
+            version=version,
+        )
+
+    catalog = ModelCatalog(load=load)
+    asyncio.run(catalog.reload())
+
+    return catalog
+
+
+@pytest.fixture
+def filters():
+    """
+    Provide the filters applied to requests, without any filters by default.
+
+    Returns:
+        list: The filters
+    """
+    return []
+
+
+@pytest.fixture
+def request_logger():
+    """
+    Provide a request logger that is never flushed.
+
+    Returns:
+        RequestLogger: The request logger
+    """
+
+    async def write(_):
+        pass
+
+    return RequestLogger(write=write)
+
+
+@pytest.fixture
+def response_cache():
+    """
+    Provide a response cache that only keeps responses in memory.
+
+    Returns:
+        ResponseCache: The response cache
+    """
+    return ResponseCache()
+
+
+@pytest.fixture
+def client(upstream, catalog, filters, request_logger, response_cache):
+    """
+    Create a test client for the /v1 API backed by stub providers.
+
+    Args:
+        upstream: The stub answering requests to the providers
+        catalog: The model catalog
+        filters: The filters applied to requests
+        request_logger: The request logger
+        response_cache: The response cache
+
+    Returns:
+        TestClient: Client for an app serving the /v1 router
+    """
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    providers = {
+        "openai": OpenAIProvider(http_client, api_key="sk-test"),
+        "azure-openai": AzureOpenAIProvider(
+            http_client, endpoint="https://example.openai.azure.com", api_key="key"
+        ),
+    }
+    dispatcher = Dispatcher(
+        LoadBalancer(), policy=RetryPolicy(base_delay=0), budget=RetryBudget(ratio=1)
+    )
+    scheduler = AdmissionScheduler(throttle_time=0.01)
+
+    app = FastAPI()
+    app.include_router(v1.router)
+    app.dependency_overrides[get_providers] = lambda: providers
+    app.dependency_overrides[get_catalog] = lambda: catalog
+    app.dependency_overrides[get_filter_pipeline] = lambda: FilterPipeline(filters)
+    app.dependency_overrides[get_request_logger] = lambda: request_logger
+    app.dependency_overrides[get_response_cache] = lambda: response_cache
+    app.dependency_overrides[get_dispatcher] = lambda: dispatcher
+    app.dependency_overrides[get_admission_scheduler] = lambda: scheduler
+    app.dependency_overrides[authenticated_project] = lambda: AuthenticatedProject(
+        project_id=PROJECT_ID, key_id=uuid.uuid4()
+    )
+
+    return TestClient(app)
+
+
+def test_chat_completions_relays_stream(client, upstream):
+    """
+    Test that streamed completions are relayed as Server-Sent Events.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o", "stream": True, "messages": []},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.content == b"".join(SSE_CHUNKS)
+
+    upstream_request = upstream.requests[0]
+    assert str(upstream_request.url) == "https://api.openai.com/v1/chat/completions"
+    assert upstream_request.headers["authorization"] == "Bearer sk-test"
+    assert json.loads(upstream_request.content)["model"] == "gpt-4o-0806"
+
+
+def test_chat_completions_decodes_compressed_stream(client, upstream, request_logger):
+    """
+    Test that a stream the provider compresses is relayed decoded and counted.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+        request_logger: The request logger
+    """
+    upstream.compress = True
+
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o", "stream": True, "messages": []},
+    )
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.content == b"".join(SSE_CHUNKS)
+    assert upstream.requests[0].headers["accept-encoding"] == "identity"
+    assert request_logger._queue[0].completion_tokens is not None
+
+
+def test_chat_completions_completes_dropped_stream(client, upstream, request_logger):
+    """
+    Test that a stream failing partway is still logged but not cached.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+        request_logger: The request logger
+    """
+    upstream.drop = True
+    request = {"model": "gpt-4o", "stream": True, "temperature": 0, "messages": []}
+
+    with pytest.raises(httpx.ReadError):
+        client.post("/v1/chat/completions", json=request)
+
+    upstream.drop = False
+    response = client.post("/v1/chat/completions", json=request)
+
+    assert response.headers["x-symbiosis-cache"] == "miss"
+    assert len(upstream.requests) == 2
+    assert [record.streamed for record in request_logger._queue] == [True, True]
+
+
+def test_chat_completions_releases_filters_on_failure(client, filters, upstream):
+    """
+    Test that filters are told a request failed when reading the response fails.
+
+    Args:
+        client: Test client for the /v1 API
+        filters: The filters applied to requests
+        upstream: The stub answering requests to the providers
+    """
+    outcome_filter = OutcomeFilter()
+    filters.append(outcome_filter)
+    upstream.failures = [400]
+    upstream.drop = True
+
+    with pytest.raises(httpx.ReadError):
+        client.post(
+            "/v1/chat/completions",
+            json={"model": "gpt-4o", "stream": True, "messages": []},
+        )
+
+    assert outcome_filter.outcomes == [None]
+
+
+def test_chat_completions_forwards_to_azure_deployment(client, upstream):
+    """
+    Test that requests for Azure OpenAI are sent to the deployment endpoint.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "my-gpt", "messages": []},
+    )
+
+    assert response.status_code == 200
+
+    upstream_request = upstream.requests[0]
+    assert (
+        upstream_request.url.path == "/openai/deployments/my-gpt-prod/chat/completions"
+    )
+    assert upstream_request.headers["api-key"] == "key"
+
+
+def test_chat_completions_forwards_body_as_received(client, upstream):
+    """
+    Test that the body is forwarded untouched when no field is replaced.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    content = (
+        b'{ "messages": [{"role": "user", "content": "caf\\u00e9"}],\n'
+        b'"model": "my-gpt"}'
+    )
+
+    response = client.post(
+        "/v1/chat/completions",
+        content=content,
+        headers={"content-type": "application/json"},
+    )
+
+    assert response.status_code == 200
+    assert upstream.requests[0].content == content
+    assert upstream.requests[0].headers["content-type"] == "application/json"
+
+
+def test_resolve_model_skips_unconfigured_providers():
+    """
+    Test that only deployments at configured providers receive requests.
+    """
+    snapshot = CatalogSnapshot.build(
+        models=[
+            ModelEntry(
+                alias="gpt-4o",
+                provider="openai",
+                deployment="gpt-4o",
+                additional_deployments=(
+                    Deployment("azure-openai-westeurope", "gpt-4o-eu"),
+                    Deployment("azure-openai", "gpt-4o-us"),
+                ),
+            )
+        ],
+        projects=[
+            ProjectEntry(id=PROJECT_ID, name="test", models=frozenset({"gpt-4o"}))
+        ],
+    )
+    providers = {"azure-openai": None, "openai": None}
+
+    model, deployments = v1.resolve_model("gpt-4o", snapshot, providers, PROJECT_ID)
+
+    assert model.alias == "gpt-4o"
+    assert deployments == (
+        Deployment("openai", "gpt-4o"),
+        Deployment("azure-openai", "gpt-4o-us"),
+    )
+
+
+def test_chat_completions_unknown_model(client):
+    """
+    Test that requests for an unknown model return 404.
+
+    Args:
+        client: Test client for the /v1 API
+    """
+    response = client.post(
+        "/v1/chat/completions", json={"model": "unknown-model", "messages": []}
+    )
+
+    assert response.status_code == 404
+
+
+def test_chat_completions_model_outside_project(client, upstream):
+    """
+    Test that requests for a model the project can't use return 404.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    response = client.post("/v1/chat/completions", json={"model": "o1", "messages": []})
+
+    assert response.status_code == 404
+    assert upstream.requests == []
+
+
+def test_chat_completions_rate_limited(client, filters, upstream):
+    """
+    Test that requests over the rate limit of the project are rejected.
+
+    Args:
+        client: Test client for the /v1 API
+        filters: The filters applied to requests
+        upstream: The stub answering requests to the providers
+    """
+    filters.append(RateLimitFilter(RateLimiter(InMemoryRateLimitStore())))
+    request = {"model": "gpt-4o", "messages": []}
+
+    assert client.post("/v1/chat/completions", json=request).status_code == 200
+    assert client.post("/v1/chat/completions", json=request).status_code == 200
+
+    response = client.post("/v1/chat/completions", json=request)
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "30"
+    assert len(upstream.requests) == 2
+
+
+def test_chat_completions_logs_request(client, request_logger):
+    """
+    Test that completed requests are queued for the request log.
+
+    Args:
+        client: Test client for the /v1 API
+        request_logger: The request logger
+    """
+    response = client.post(
+        "/v1/chat/completions", json={"model": "my-gpt", "messages": []}
+    )
+
+    assert response.status_code == 200
+    assert len(request_logger) == 1
+
+
+def test_chat_completions_serves_cached_response(client, upstream):
+    """
+    Test that identical deterministic requests are answered from the cache.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    request = {"model": "gpt-4o", "temperature": 0, "messages": []}
+
+    first = client.post("/v1/chat/completions", json=request)
+    second = client.post("/v1/chat/completions", json=request)
+
+    assert first.headers["x-symbiosis-cache"] == "miss"
+    assert second.headers["x-symbiosis-cache"] == "hit"
+    assert second.content == first.content
+    assert len(upstream.requests) == 1
+
+
+def test_chat_completions_replays_cached_stream(client, upstream, request_logger):
+    """
+    Test that cached streamed responses are replayed as Server-Sent Events.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+        request_logger: The request logger
+    """
+    request = {"model": "gpt-4o", "stream": True, "temperature": 0, "messages": []}
+
+    client.post("/v1/chat/completions", json=request)
+    response = client.post("/v1/chat/completions", json=request)
+
+    assert response.headers["x-symbiosis-cache"] == "hit"
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.content == b"".join(SSE_CHUNKS)
+    assert len(upstream.requests) == 1
+    assert [record.cache_hit for record in request_logger._queue] == [False, True]
+
+
+def test_chat_completions_skips_cache_for_sampled_requests(client, upstream):
+    """
+    Test that requests with a non-zero temperature aren't cached.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    request = {"model": "gpt-4o", "temperature": 0.7, "messages": []}
+
+    response = client.post("/v1/chat/completions", json=request)
+    client.post("/v1/chat/completions", json=request)
+
+    assert "x-symbiosis-cache" not in response.headers
+    assert len(upstream.requests) == 2
+
+
+def test_chat_completions_retries_failed_requests(client, upstream):
+    """
+    Test that requests failing with a server error are retried.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    upstream.failures = [503, 502]
+
+    response = client.post(
+        "/v1/chat/completions", json={"model": "gpt-4o", "messages": []}
+    )
+
+    assert response.status_code == 200
+    assert len(upstream.requests) == 3
+
+
+def test_chat_completions_rejects_requests_with_open_circuit(client, upstream):
+    """
+    Test that requests are rejected while the circuit of the provider is open.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    upstream.failures = [500] * 6
+
+    for _ in range(2):
+        response = client.post(
+            "/v1/chat/completions", json={"model": "gpt-4o", "messages": []}
+        )
+        assert response.status_code == 500
+
+    response = client.post(
+        "/v1/chat/completions", json={"model": "gpt-4o", "messages": []}
+    )
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) > 0
+    assert len(upstream.requests) == 5
+
+
+def test_chat_completions_queues_throttled_requests(client, upstream):
+    """
+    Test that requests throttled by the provider are queued and sent again.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    upstream.failures = [429] * 3
+
+    response = client.post(
+        "/v1/chat/completions", json={"model": "gpt-4o", "messages": []}
+    )
+
+    assert response.status_code == 200
+    assert len(upstream.requests) == 4
+
+
+def test_chat_completions_rejects_invalid_deadline(client, upstream):
+    """
+    Test that a deadline that isn't a number of seconds is rejected.
+
+    Args:
+        client: Test client for the /v1 API
+        upstream: The stub answering requests to the providers
+    """
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o", "messages": []},
+        headers={v1.DEADLINE_HEADER: "soon"},
+    )
+
+    assert response.status_code == 422
+    assert upstream.requests == []
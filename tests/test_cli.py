@@ -0,0 +1,124 @@
+"""Tests for the command line interface."""
+
+import pytest
+from typer.testing import CliRunner
+
+from symbiosis import cli
+
+
+@pytest.fixture
+def uvicorn_calls(monkeypatch):
+    """
+    Record calls to uvicorn.run instead of starting a server.
+
+    Returns:
+        list: The keyword arguments of each call to uvicorn.run
+    """
+    calls = []
+
+    def run(app, **kwargs):
+        assert app == "symbiosis.server:app"
+        calls.append(kwargs)
+
+    monkeypatch.setattr(cli.uvicorn, "run", run)
+
+    return calls
+
+
+def test_serve_defaults_to_production_mode(uvicorn_calls, monkeypatch):
+    """
+    Test that serve runs one worker per CPU core without reloading.
+
+    Args:
+        uvicorn_calls: Recorded calls to uvicorn.run
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr(cli.os, "cpu_count", lambda: 8)
+
+    result = CliRunner().invoke(cli.app, ["serve"])
+
+    assert result.exit_code == 0
+    assert uvicorn_calls[0]["workers"] == 8
+    assert uvicorn_calls[0]["timeout_graceful_shutdown"] == 30
+    assert "reload" not in uvicorn_calls[0]
+
+
+def test_serve_dev_mode_reloads(uvicorn_calls):
+    """
+    Test that --dev runs a single reloading process.
+
+    Args:
+        uvicorn_calls: Recorded calls to uvicorn.run
+    """
+    result = CliRunner().invoke(cli.app, ["serve", "--dev"])
+
+    assert result.exit_code == 0
+    assert uvicorn_calls[0]["reload"] is True
+    assert "workers" not in uvicorn_calls[0]
+
+
+def test_serve_dev_mode_rejects_tuning_options(uvicorn_calls):
+    """
+    Test that --dev can't be combined with options it doesn't use.
+
+    Args:
+        uvicorn_calls: Recorded calls to uvicorn.run
+    """
+    result = CliRunner().invoke(cli.app, ["serve", "--dev", "--workers", "4"])
+
+    assert result.exit_code == 2
+    assert "--workers" in result.output
+    assert uvicorn_calls == []
+
+
+def test_serve_rejects_unsupported_reuse_port(uvicorn_calls, monkeypatch):
+    """
+    Test that --reuse-port fails clearly where SO_REUSEPORT doesn't exist.
+
+    Args:
+        uvicorn_calls: Recorded calls to uvicorn.run
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.delattr(cli.socket, "SO_REUSEPORT", raising=False)
+
+    result = CliRunner().invoke(cli.app, ["serve", "--reuse-port"])
+
+    assert result.exit_code == 2
+    assert uvicorn_calls == []
+
+
+def test_serve_passes_tuning_options(uvicorn_calls):
+    """
+    Test that the tuning options are passed to uvicorn.
+
+    Args:
+        uvicorn_calls: Recorded calls to uvicorn.run
+    """
+    result = CliRunner().invoke(
+        cli.app,
+        [
+            "serve",
+            "--workers",
+            "2",
+            "--loop",
+            "uvloop",
+            "--http",
+            "httptools",
+            "--timeout-keep-alive",
+            "75",
+            "--backlog",
+            "4096",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert uvicorn_calls[0] == {
+        "host": "127.0.0.1",
+        "port": 4321,
+        "workers": 2,
+        "loop": "uvloop",
+        "http": "httptools",
+        "timeout_keep_alive": 75,
+        "backlog": 4096,
+        "timeout_graceful_shutdown": 30,
+    }
@@ -0,0 +1,122 @@
+"""Tests for coalescing identical requests in flight."""
+
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+from symbiosis.providers import (
+    CompletedResponse,
+    RequestCoalescer,
+    request_fingerprint,
+)
+
+PROJECT_ID = uuid.uuid4()
+
+RESPONSE = CompletedResponse(
+    status_code=200, content=b'{"choices":[]}', media_type="application/json"
+)
+
+
+class SlowProvider:
+    """Answers requests once released, counting the requests it received."""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def send(self):
+        self.calls += 1
+        await self.release.wait()
+
+        if self.error is not None:
+            raise self.error
+
+        return RESPONSE
+
+
+def test_fingerprint_ignores_layout_and_user():
+    """
+    Test that equivalent bodies have the same fingerprint.
+    """
+    first = {"model": "a", "temperature": 0.0, "messages": [], "user": "x"}
+    second = {"messages": [], "temperature": 0, "model": "b"}
+
+    assert request_fingerprint(
+        PROJECT_ID, "openai", "gpt-4o", first
+    ) == request_fingerprint(PROJECT_ID, "openai", "gpt-4o", second)
+    assert request_fingerprint(
+        PROJECT_ID, "openai", "gpt-4o", first
+    ) != request_fingerprint(uuid.uuid4(), "openai", "gpt-4o", first)
+
+
+def test_coalescer_shares_one_request():
+    """
+    Test that identical requests in flight share a single upstream request.
+    """
+
+    async def run():
+        coalescer = RequestCoalescer()
+        provider = SlowProvider()
+        requests = [
+            asyncio.create_task(coalescer.complete("key", "openai", provider.send))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        provider.release.set()
+
+        return await asyncio.gather(*requests), provider.calls, len(coalescer)
+
+    results, calls, in_flight = asyncio.run(run())
+
+    assert calls == 1
+    assert in_flight == 0
+    assert results == [(RESPONSE, False), (RESPONSE, True), (RESPONSE, True)]
+
+
+def test_coalescer_shares_errors():
+    """
+    Test that a failed upstream request fails every waiting request.
+    """
+
+    async def run():
+        coalescer = RequestCoalescer()
+        provider = SlowProvider(error=httpx.ConnectError("refused"))
+        requests = [
+            asyncio.create_task(coalescer.complete("key", "openai", provider.send))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        provider.release.set()
+
+        return await asyncio.gather(*requests, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, httpx.ConnectError) for result in results)
+
+
+def test_coalescer_survives_cancelled_first_request():
+    """
+    Test that waiting requests get the response when the first one goes away.
+    """
+
+    async def run():
+        coalescer = RequestCoalescer()
+        provider = SlowProvider()
+        first = asyncio.create_task(coalescer.complete("key", "openai", provider.send))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(coalescer.complete("key", "openai", provider.send))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        provider.release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        return await second
+
+    assert asyncio.run(run()) == (RESPONSE, True)
@@ -0,0 +1,230 @@
+"""Tests for compiling the filters of projects into chains."""
+
+import asyncio
+import uuid
+
+import pytest
+
+from symbiosis.catalog import CatalogSnapshot, ModelEntry, ProjectEntry
+from symbiosis.filters import (
+    Filter,
+    FilterError,
+    FilterPipeline,
+    RequestContext,
+    compile_chain,
+)
+from symbiosis.projects import AuthenticatedProject
+
+PROJECT = ProjectEntry(id=uuid.uuid4(), name="project")
+
+MODEL = ModelEntry(alias="gpt-4o", provider="openai", deployment="gpt-4o")
+
+
+class RecordingFilter(Filter):
+    """Records the requests and outcomes it sees in a shared log."""
+
+    def __init__(
+        self, log, name, *, cost=0, concurrent=False, reject=False, error=None
+    ):
+        self.log = log
+        self.name = name
+        self.cost = cost
+        self.concurrent = concurrent
+        self.reject = reject
+        self.error = error
+        self.project_ids = None
+
+    def applies_to(self, project):
+        return self.project_ids is None or project.id in self.project_ids
+
+    async def before_request(self, context):  # noqa: ARG002
+        self.log.append(("before", self.name))
+        await asyncio.sleep(0)
+
+        if self.reject:
+            raise FilterError(status_code=400, detail=self.name)
+
+        if self.error is not None:
+            raise self.error
+
+        self.log.append(("passed", self.name))
+
+    async def after_response(self, context, usage):  # noqa: ARG002
+        self.log.append(("after", self.name, usage))
+
+
+class HangingFilter(RecordingFilter):
+    """Never finishes checking a request."""
+
+    async def before_request(self, context):  # noqa: ARG002
+        self.log.append(("before", self.name))
+        await asyncio.Event().wait()
+
+
+def create_context():
+    """
+    Create the context of a request.
+
+    Returns:
+        RequestContext: The context of the request
+    """
+    return RequestContext(
+        project=AuthenticatedProject(project_id=PROJECT.id, key_id=uuid.uuid4()),
+        project_settings=PROJECT,
+        model=MODEL,
+        body={},
+    )
+
+
+def test_compile_orders_by_cost_and_groups_concurrent_filters():
+    """
+    Test that cheap filters come first and concurrent filters share a stage.
+    """
+    log = []
+    expensive = RecordingFilter(log, "expensive", cost=10)
+    first = RecordingFilter(log, "first", cost=5, concurrent=True)
+    second = RecordingFilter(log, "second", cost=5, concurrent=True)
+    cheap = RecordingFilter(log, "cheap")
+    skipped = RecordingFilter(log, "skipped")
+    skipped.project_ids = set()
+
+    chain = compile_chain([expensive, first, second, cheap, skipped], PROJECT)
+
+    assert chain.stages == ((cheap,), (first, second), (expensive,))
+
+
+def test_chain_runs_concurrent_filters_together():
+    """
+    Test that the filters of a stage start before any of them finishes.
+    """
+    log = []
+    chain = compile_chain(
+        [
+            RecordingFilter(log, "first", concurrent=True),
+            RecordingFilter(log, "second", concurrent=True),
+        ],
+        PROJECT,
+    )
+
+    asyncio.run(chain.before_request(create_context()))
+
+    assert log == [
+        ("before", "first"),
+        ("before", "second"),
+        ("passed", "first"),
+        ("passed", "second"),
+    ]
+
+
+def test_chain_releases_passed_filters_on_rejection():
+    """
+    Test that a rejection tells the filters that passed, and skips the rest.
+    """
+    log = []
+    chain = compile_chain(
+        [
+            RecordingFilter(log, "cheap"),
+            RecordingFilter(log, "passed", cost=1, concurrent=True),
+            RecordingFilter(log, "rejects", cost=1, concurrent=True, reject=True),
+            RecordingFilter(log, "expensive", cost=2),
+        ],
+        PROJECT,
+    )
+
+    with pytest.raises(FilterError, match="rejects"):
+        asyncio.run(chain.before_request(create_context()))
+
+    assert log == [
+        ("before", "cheap"),
+        ("passed", "cheap"),
+        ("before", "passed"),
+        ("before", "rejects"),
+        ("passed", "passed"),
+        ("after", "passed", None),
+        ("after", "cheap", None),
+    ]
+
+
+def test_chain_releases_passed_filters_on_failure():
+    """
+    Test that a filter failing with another error also releases the filters
+    that passed.
+    """
+    log = []
+    chain = compile_chain(
+        [
+            RecordingFilter(log, "cheap"),
+            RecordingFilter(log, "fails", cost=1, error=RuntimeError("broken")),
+        ],
+        PROJECT,
+    )
+
+    with pytest.raises(RuntimeError, match="broken"):
+        asyncio.run(chain.before_request(create_context()))
+
+    assert log[-1] == ("after", "cheap", None)
+
+
+def test_chain_releases_passed_filters_on_cancellation():
+    """
+    Test that a request cancelled while it's checked releases the filters
+    that passed, also within a concurrent stage.
+    """
+    log = []
+    chain = compile_chain(
+        [
+            RecordingFilter(log, "cheap"),
+            RecordingFilter(log, "passed", cost=1, concurrent=True),
+            HangingFilter(log, "hangs", cost=1, concurrent=True),
+        ],
+        PROJECT,
+    )
+
+    async def cancel_while_checking():
+        task = asyncio.create_task(chain.before_request(create_context()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_checking())
+
+    assert log[-2:] == [("after", "passed", None), ("after", "cheap", None)]
+
+
+def test_chain_tells_filters_the_first_outcome_only():
+    """
+    Test that the filters are told about the outcome of a request only once.
+    """
+    log = []
+    chain = compile_chain([RecordingFilter(log, "cheap")], PROJECT)
+    context = create_context()
+
+    async def complete_twice():
+        await chain.before_request(context)
+        await chain.after_response(context, None)
+        await chain.after_response(context, None)
+
+    asyncio.run(complete_twice())
+
+    assert log.count(("after", "cheap", None)) == 1
+
+
+def test_pipeline_compiles_once_per_snapshot():
+    """
+    Test that chains are kept until the catalog publishes a new snapshot.
+    """
+    log = []
+    request_filter = RecordingFilter(log, "filter")
+    pipeline = FilterPipeline([request_filter])
+    snapshot = CatalogSnapshot.build([MODEL], [PROJECT])
+
+    chain = pipeline.chain(snapshot, PROJECT.id)
+    assert pipeline.chain(snapshot, PROJECT.id) is chain
+    assert chain.filters == (request_filter,)
+
+    request_filter.project_ids = set()
+    new_snapshot = CatalogSnapshot.build([MODEL], [PROJECT], version=1)
+
+    assert pipeline.chain(new_snapshot, PROJECT.id).filters == ()
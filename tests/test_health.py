@@ -0,0 +1,153 @@
+"""Tests for the health checks behind the probes."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from symbiosis.auth.validation import TokenValidator
+from symbiosis.providers import AzureOpenAIProvider, OpenAIProvider
+from symbiosis.server.health import (
+    CachedCheck,
+    HealthMonitor,
+    check_providers,
+    check_token_validator,
+)
+
+
+def create_providers(azure_status_code):
+    """
+    Create providers answering every request with a fixed status code.
+
+    Args:
+        azure_status_code: The status code of the Azure OpenAI provider
+
+    Returns:
+        dict: The providers, keyed by provider name
+    """
+
+    def respond(request):
+        if request.url.host == "api.openai.com":
+            return httpx.Response(200, json={"data": []})
+
+        return httpx.Response(azure_status_code)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    return {
+        "openai": OpenAIProvider(client, api_key="sk-test"),
+        "azure-openai": AzureOpenAIProvider(
+            client, endpoint="https://example.openai.azure.com", api_key="key"
+        ),
+    }
+
+
+def test_cached_check_reports_latest_run():
+    """
+    Test that a check reports the result of its latest run.
+    """
+    outcomes = [None, ValueError("Unreachable")]
+
+    async def run():
+        outcome = outcomes.pop(0)
+
+        if outcome is not None:
+            raise outcome
+
+    async def results():
+        check = CachedCheck("dependency", run, timeout=1)
+        before = await check()
+        await check.run()
+        passed = await check()
+        await check.run()
+        return before, passed, await check()
+
+    before, passed, failed = asyncio.run(results())
+
+    assert not before.passed
+    assert passed.passed
+    assert not failed.passed
+    assert failed.details == "Unreachable"
+
+
+def test_cached_check_fails_when_run_times_out():
+    """
+    Test that a check that hangs fails after its timeout.
+    """
+
+    async def results():
+        check = CachedCheck("dependency", asyncio.Event().wait, timeout=0.01)
+        await check.run()
+        return await check()
+
+    result = asyncio.run(results())
+
+    assert not result.passed
+    assert result.details == "TimeoutError"
+
+
+def test_monitor_passes_while_checks_run_on_time():
+    """
+    Test that liveness fails when the monitor stops running checks.
+    """
+
+    async def results():
+        calls = []
+
+        async def run():
+            calls.append(time.monotonic())
+
+        check = CachedCheck("dependency", run, timeout=1)
+        monitor = HealthMonitor([check], interval=0.01)
+        not_started = await monitor()
+
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        running = await monitor()
+        ready = await check()
+
+        await monitor.close()
+        await asyncio.sleep(0.05)
+        return not_started, running, ready, await monitor(), len(calls)
+
+    not_started, running, ready, stopped, calls = asyncio.run(results())
+
+    assert not not_started.passed
+    assert running.passed
+    assert ready.passed
+    assert not stopped.passed
+    assert calls > 1
+
+
+@pytest.mark.parametrize("status_code", [500, 401])
+def test_providers_pass_while_one_is_reachable(status_code):
+    """
+    Test that a single unreachable provider is reported but doesn't fail.
+
+    Args:
+        status_code: The status code of the unreachable provider
+    """
+    details = asyncio.run(check_providers(create_providers(status_code)))
+
+    assert details == "Unreachable: azure-openai"
+
+
+def test_providers_fail_when_none_is_reachable():
+    """
+    Test that the check fails when no provider can be reached.
+    """
+    providers = create_providers(503)
+    del providers["openai"]
+
+    with pytest.raises(ValueError, match="None of the providers"):
+        asyncio.run(check_providers(providers))
+
+
+def test_oidc_fails_without_signing_keys():
+    """
+    Test that the OIDC check fails until the signing keys were fetched.
+    """
+    validator = TokenValidator(discovery_url="https://idp.example.com/.well-known")
+
+    with pytest.raises(ValueError, match="signing keys"):
+        check_token_validator(validator)
@@ -0,0 +1,82 @@
+"""Tests for the shared provider HTTP clients."""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from prometheus_client import REGISTRY
+
+from symbiosis.providers.http import create_http_client
+
+
+@pytest.fixture
+def upstream_url():
+    """
+    Start a local HTTP server answering every request with a small body.
+
+    Returns:
+        str: The URL of the server
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+    server.server_close()
+
+
+def get_metric(name, provider):
+    return REGISTRY.get_sample_value(name, {"provider": provider})
+
+
+def test_provider_settings_override_defaults(monkeypatch):
+    """
+    Test that provider specific settings take precedence over shared ones.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setenv("PROVIDER_MAX_CONNECTIONS", "50")
+    monkeypatch.setenv("PROVIDER_READ_TIMEOUT", "120")
+    monkeypatch.setenv("TEST_MAX_CONNECTIONS", "7")
+
+    client = create_http_client("test-settings", "TEST")
+
+    assert get_metric("symbiosis_provider_pool_max_connections", "test-settings") == 7
+    assert client.timeout.read == 120
+
+
+def test_active_requests_are_tracked_until_response_is_closed(upstream_url):
+    """
+    Test that a request counts as active until its response is closed.
+
+    Args:
+        upstream_url: URL of a local HTTP server
+    """
+    client = create_http_client("test-active", "TEST")
+    metric = "symbiosis_provider_pool_active_requests"
+
+    async def send_request():
+        request = client.build_request("GET", upstream_url)
+        response = await client.send(request, stream=True)
+        active_while_streaming = get_metric(metric, "test-active")
+        await response.aread()
+        await response.aclose()
+        await client.aclose()
+        return active_while_streaming
+
+    assert asyncio.run(send_request()) == 1
+    assert get_metric(metric, "test-active") == 0
@@ -0,0 +1,144 @@
+"""Tests for the rate limiting filter."""
+
+import asyncio
+import uuid
+
+import pytest
+
+from symbiosis.catalog import ModelEntry, ProjectEntry
+from symbiosis.filters import (
+    FilterError,
+    InMemoryRateLimitStore,
+    RateLimiter,
+    RateLimitFilter,
+    RequestContext,
+)
+from symbiosis.projects import AuthenticatedProject
+
+
+class CountingStore(InMemoryRateLimitStore):
+    """Counts the roundtrips to the shared store."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def take(self, *args, **kwargs):
+        self.calls += 1
+        return await super().take(*args, **kwargs)
+
+
+def test_acquire_spends_local_lease():
+    """
+    Test that most requests are served from the local lease.
+    """
+    store = CountingStore()
+    limiter = RateLimiter(store, lease_fraction=0.1)
+
+    async def acquire_many():
+        return [await limiter.acquire("bucket", 1000, 1) for _ in range(100)]
+
+    assert all(asyncio.run(acquire_many()))
+    assert store.calls == 1
+
+
+def test_replicas_share_the_limit():
+    """
+    Test that processes sharing a store never exceed the limit together.
+    """
+    store = InMemoryRateLimitStore()
+    replicas = [RateLimiter(store, lease_fraction=0.1) for _ in range(3)]
+
+    async def acquire_all():
+        return [
+            await replica.acquire("bucket", 60, 1)
+            for _ in range(30)
+            for replica in replicas
+        ]
+
+    assert sum(asyncio.run(acquire_all())) == 60
+
+
+def test_charge_takes_bucket_into_debt():
+    """
+    Test that tokens charged after the fact delay later requests.
+    """
+    store = InMemoryRateLimitStore()
+    limiter = RateLimiter(store, lease_fraction=0.1)
+
+    async def charge_and_acquire():
+        await limiter.charge("bucket", 600, 1000)
+        return await limiter.acquire("bucket", 600, 1)
+
+    assert not asyncio.run(charge_and_acquire())
+
+
+def test_expired_leases_return_unused_tokens():
+    """
+    Test that the unused tokens of expired leases go back to the bucket, so
+    replicas together are admitted the whole limit.
+    """
+    store = InMemoryRateLimitStore()
+    replicas = [
+        RateLimiter(store, lease_fraction=0.5, lease_ttl=0.05) for _ in range(3)
+    ]
+
+    async def admitted_throughput():
+        admitted = [await replica.acquire("bucket", 60, 1) for replica in replicas]
+        await asyncio.sleep(0.1)
+
+        while await replicas[0].acquire("bucket", 60, 1):
+            admitted.append(True)
+
+        return sum(admitted)
+
+    assert asyncio.run(admitted_throughput()) == 60
+
+
+def test_close_returns_unused_tokens():
+    """
+    Test that closing a limiter returns its unused leased tokens.
+    """
+    store = InMemoryRateLimitStore()
+    limiter = RateLimiter(store, lease_fraction=0.5)
+
+    async def acquire_and_close():
+        await limiter.acquire("bucket", 60, 1)
+        await limiter.close()
+        return await store.take("bucket", 60, 1, 60)
+
+    assert asyncio.run(acquire_and_close()) >= 59
+
+
+def test_filter_gives_back_tokens_of_passed_limits():
+    """
+    Test that a request rejected by the limit of its key doesn't count
+    against the limit of its project.
+    """
+    project = ProjectEntry(id=uuid.uuid4(), name="project", requests_per_minute=2)
+    model = ModelEntry(alias="gpt-4o", provider="openai", deployment="gpt-4o")
+    rate_limit_filter = RateLimitFilter(RateLimiter(InMemoryRateLimitStore()))
+    key_ids = [uuid.uuid4(), uuid.uuid4()]
+
+    def create_context(key_id):
+        return RequestContext(
+            project=AuthenticatedProject(
+                project_id=project.id, key_id=key_id, requests_per_minute=1
+            ),
+            project_settings=project,
+            model=model,
+            body={},
+        )
+
+    async def request_with_keys():
+        await rate_limit_filter.before_request(create_context(key_ids[0]))
+
+        with pytest.raises(FilterError):
+            await rate_limit_filter.before_request(create_context(key_ids[0]))
+
+        await rate_limit_filter.before_request(create_context(key_ids[1]))
+
+        with pytest.raises(FilterError):
+            await rate_limit_filter.before_request(create_context(uuid.uuid4()))
+
+    asyncio.run(request_with_keys())
@@ -0,0 +1,54 @@
+"""Tests for request bodies forwarded to the providers."""
+
+import pytest
+
+from symbiosis.providers import RequestBody
+
+CONTENT = b'{"model": "gpt-4o",  "messages": [], "temperature": 0}'
+
+
+def test_parse_keeps_content():
+    """
+    Test that a parsed body keeps the bytes it was parsed from.
+    """
+    body = RequestBody.parse(CONTENT)
+
+    assert body.content is CONTENT
+    assert body["model"] == "gpt-4o"
+    assert dict(body) == {"model": "gpt-4o", "messages": [], "temperature": 0}
+
+
+@pytest.mark.parametrize("content", [b"[]", b"not json", b""])
+def test_parse_rejects_invalid_bodies(content):
+    """
+    Test that only JSON objects are request bodies.
+
+    Args:
+        content: The invalid body
+    """
+    with pytest.raises(ValueError):  # noqa: PT011
+        RequestBody.parse(content)
+
+
+def test_replace_keeps_unchanged_body():
+    """
+    Test that replacing fields with their own values doesn't encode again.
+    """
+    body = RequestBody.parse(CONTENT)
+
+    assert body.replace(model="gpt-4o") is body
+
+
+def test_replace_encodes_changed_body():
+    """
+    Test that replacing a field encodes the body again.
+    """
+    body = RequestBody.parse(CONTENT)
+    replaced = body.replace(model="gpt-4o-0806")
+
+    assert RequestBody.parse(replaced.content) == {
+        "model": "gpt-4o-0806",
+        "messages": [],
+        "temperature": 0,
+    }
+    assert body["model"] == "gpt-4o"
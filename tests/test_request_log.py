@@ -0,0 +1,180 @@
+"""Tests for the request log."""
+
+import asyncio
+import uuid
+
+import asyncpg
+from sqlalchemy.exc import OperationalError
+
+from symbiosis.requestlog import OverflowPolicy, RequestLogger, RequestLogRecord
+from symbiosis.wal import WriteAheadLog
+
+
+class Database:
+    """Collects written batches, failing while it's unavailable."""
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.available = True
+        self.error = error or OperationalError("COPY", {}, ConnectionError())
+
+    async def write(self, records):
+        if not self.available:
+            raise self.error
+
+        self.batches.append(list(records))
+
+
+def create_record(response_body=b'{"choices":[]}'):
+    """
+    Create a request log record.
+
+    Args:
+        response_body: The body of the response
+
+    Returns:
+        RequestLogRecord: The record
+    """
+    return RequestLogRecord(
+        project_id=uuid.uuid4(),
+        key_id=uuid.uuid4(),
+        model="gpt-4o",
+        provider="openai",
+        status_code=200,
+        streamed=False,
+        latency_ms=12.5,
+        prompt_tokens=10,
+        completion_tokens=None,
+        request_body=b'{"model":"gpt-4o"}',
+        response_body=response_body,
+    )
+
+
+def test_record_json_roundtrip():
+    """
+    Test that records survive serialization to JSON.
+    """
+    record = create_record()
+    streamed_record = create_record(response_body=None)
+
+    assert RequestLogRecord.from_json(record.to_json()) == record
+    assert RequestLogRecord.from_json(streamed_record.to_json()) == streamed_record
+
+
+def test_flush_writes_batches():
+    """
+    Test that queued records are written in batches.
+    """
+    database = Database()
+    request_logger = RequestLogger(write=database.write, batch_size=2)
+
+    for _ in range(5):
+        request_logger.log(create_record())
+
+    asyncio.run(request_logger.flush())
+
+    assert [len(batch) for batch in database.batches] == [2, 2, 1]
+    assert len(request_logger) == 0
+
+
+def test_drop_policy_discards_overflow():
+    """
+    Test that records beyond the queue size are dropped with the drop policy.
+    """
+    database = Database()
+    request_logger = RequestLogger(write=database.write, max_queue_size=3)
+
+    for _ in range(5):
+        request_logger.log(create_record())
+
+    asyncio.run(request_logger.flush())
+
+    assert sum(len(batch) for batch in database.batches) == 3
+
+
+def test_spill_policy_replays_records(tmp_path):
+    """
+    Test that overflow and failed batches are spilled to disk and replayed.
+
+    Args:
+        tmp_path: Temporary directory for the write-ahead log
+    """
+    database = Database()
+    database.available = False
+    request_logger = RequestLogger(
+        write=database.write,
+        max_queue_size=2,
+        overflow_policy=OverflowPolicy.SPILL,
+        wal=WriteAheadLog("test", tmp_path),
+    )
+
+    records = [create_record() for _ in range(3)]
+
+    for record in records:
+        request_logger.log(record)
+
+    asyncio.run(request_logger.flush())
+
+    assert len(request_logger) == 0
+    assert database.batches == []
+
+    database.available = True
+    asyncio.run(request_logger.replay())
+
+    assert {record for batch in database.batches for record in batch} == set(records)
+
+
+def test_spill_policy_spills_batches_failing_in_asyncpg(tmp_path):
+    """
+    Test that errors raised by asyncpg itself spill the batch and keep the
+    background tasks running.
+
+    Args:
+        tmp_path: Temporary directory for the write-ahead log
+    """
+    database = Database(asyncpg.exceptions.ConnectionDoesNotExistError("closed"))
+    database.available = False
+    request_logger = RequestLogger(
+        write=database.write,
+        flush_interval=0.01,
+        overflow_policy=OverflowPolicy.SPILL,
+        wal=WriteAheadLog("test", tmp_path),
+        replay_interval=0.01,
+    )
+    record = create_record()
+
+    async def run():
+        request_logger.start()
+        request_logger.log(record)
+        await asyncio.sleep(0.05)
+        running = all(not task.done() for task in request_logger._tasks)
+        database.available = True
+        await asyncio.sleep(0.05)
+        await request_logger.close()
+        return running
+
+    assert asyncio.run(run())
+    assert database.batches == [[record]]
+
+
+def test_replay_picks_up_records_of_previous_run(tmp_path):
+    """
+    Test that records spilled before a restart are replayed by the new logger.
+
+    Args:
+        tmp_path: Temporary directory for the write-ahead log
+    """
+    database = Database()
+    record = create_record()
+    previous_wal = WriteAheadLog("test", tmp_path)
+    previous_wal.append([record.to_json().encode()])
+    previous_wal.close()
+
+    request_logger = RequestLogger(
+        write=database.write,
+        overflow_policy=OverflowPolicy.SPILL,
+        wal=WriteAheadLog("test", tmp_path),
+    )
+    asyncio.run(request_logger.replay())
+
+    assert database.batches == [[record]]
@@ -0,0 +1,388 @@
+"""Tests for retries, hedging, and circuit breakers."""
+
+import asyncio
+import email.utils
+import random
+import time
+
+import httpx
+import pytest
+
+from symbiosis.catalog import Deployment
+from symbiosis.providers import (
+    CircuitOpenError,
+    CompletedResponse,
+    Dispatcher,
+    LoadBalancer,
+    RetryBudget,
+    RetryPolicy,
+    resilience,
+)
+from symbiosis.providers.resilience import (
+    CircuitBreaker,
+    CircuitState,
+    parse_retry_after,
+)
+
+PRIMARY = Deployment("primary", "gpt-4o")
+SECONDARY = Deployment("secondary", "gpt-4o")
+
+
+class Clock:
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replace the clock of the circuit breakers and retry budgets.
+
+    Args:
+        monkeypatch: Fixture to patch the resilience module
+
+    Returns:
+        Clock: The clock used by the resilience module
+    """
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+
+class FakeProvider:
+    """Answers requests with scripted outcomes, then with status 200."""
+
+    def __init__(self, name, outcomes=(), delays=()):
+        self.name = name
+        self.outcomes = list(outcomes)
+        self.delays = list(delays)
+        self.calls = 0
+        self.closed = 0
+
+    async def _outcome(self):
+        self.calls += 1
+
+        if self.delays:
+            await asyncio.sleep(self.delays.pop(0))
+
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        return outcome
+
+    async def complete_chat(self, _deployment, _body):
+        status_code, headers = await self._status_and_headers()
+        return CompletedResponse(
+            status_code=status_code,
+            content=self.name.encode(),
+            media_type="application/json",
+            headers=httpx.Headers(headers),
+        )
+
+    async def chat_completions(self, _deployment, _body):
+        status_code, headers = await self._status_and_headers()
+        response = httpx.Response(status_code, headers=headers)
+        response.aclose = self._close
+        return response
+
+    async def _status_and_headers(self):
+        outcome = await self._outcome()
+        return outcome if isinstance(outcome, tuple) else (outcome, {})
+
+    async def _close(self):
+        self.closed += 1
+
+
+def dispatcher(**kwargs):
+    """
+    Create a dispatcher that retries without waiting.
+
+    Args:
+        **kwargs: Overrides of the dispatcher settings
+
+    Returns:
+        Dispatcher: The dispatcher
+    """
+    kwargs.setdefault("policy", RetryPolicy(base_delay=0))
+    kwargs.setdefault("budget", RetryBudget(ratio=1))
+    return Dispatcher(LoadBalancer(rng=random.Random(1)), **kwargs)
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    """
+    Test that the circuit opens, lets one probe through, and closes again.
+
+    Args:
+        clock: The clock used by the resilience module
+    """
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.is_available()
+    assert breaker.retry_after == 30
+
+    clock.now += 30
+    assert breaker.is_available()
+    breaker.before_request()
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert not breaker.is_available()
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_breaker_reopens_when_probe_fails(clock):
+    """
+    Test that a failed probe opens the circuit for another reset timeout.
+
+    Args:
+        clock: The clock used by the resilience module
+    """
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_request()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.retry_after == 30
+
+
+def test_breaker_keeps_probe_when_other_request_is_released(clock):
+    """
+    Test that a request sent before the circuit opened doesn't end the probe
+    when it's cancelled.
+
+    Args:
+        clock: The clock used by the resilience module
+    """
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+
+    earlier = breaker.before_request()
+    breaker.record_failure()
+    clock.now += 30
+    probe = breaker.before_request()
+
+    breaker.release(probe=earlier)
+    assert not breaker.is_available()
+
+    breaker.release(probe=probe)
+    assert breaker.is_available()
+
+
+def test_retry_budget_limits_retries(clock):
+    """
+    Test that retries are limited to the budget earned by requests.
+
+    Args:
+        clock: The clock used by the resilience module
+    """
+    budget = RetryBudget(ratio=0.5, min_per_second=1)
+
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    clock.now += 1
+    assert budget.withdraw()
+
+
+def test_parse_retry_after():
+    """
+    Test that Retry-After headers are parsed as seconds or dates.
+    """
+    retry_at = email.utils.formatdate(time.time() + 60, usegmt=True)
+
+    assert parse_retry_after("2.5") == 2.5
+    assert 55 < parse_retry_after(retry_at) <= 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_policy_delays():
+    """
+    Test that delays are jittered, honor Retry-After, and end eventually.
+    """
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=10)
+    rng = random.Random(1)
+
+    assert 0 <= policy.delay(1, None, rng) <= 1
+    assert 0 <= policy.delay(2, None, rng) <= 2
+    assert policy.delay(1, 5, rng) == 5
+    assert policy.delay(1, 11, rng) is None
+    assert policy.delay(3, None, rng) is None
+
+
+def test_dispatcher_retries_at_another_deployment():
+    """
+    Test that a request failing with a transport error is retried.
+    """
+    providers = {
+        "primary": FakeProvider("primary", [httpx.ConnectError("refused")]),
+        "secondary": FakeProvider("secondary", [httpx.ConnectError("refused")]),
+    }
+
+    response, deployment = asyncio.run(
+        dispatcher().complete(providers, [PRIMARY, SECONDARY], {})
+    )
+
+    assert response.status_code == 200
+    assert providers["primary"].calls + providers["secondary"].calls == 3
+    assert providers[deployment.provider].calls == 2
+
+
+def test_dispatcher_returns_failure_without_retries():
+    """
+    Test that client errors aren't retried and exhausted retries return.
+    """
+    providers = {"primary": FakeProvider("primary", [400])}
+    response, _ = asyncio.run(dispatcher().complete(providers, [PRIMARY], {}))
+
+    assert response.status_code == 400
+    assert providers["primary"].calls == 1
+
+    providers = {"primary": FakeProvider("primary", [503] * 3)}
+    response, _ = asyncio.run(dispatcher().complete(providers, [PRIMARY], {}))
+
+    assert response.status_code == 503
+    assert providers["primary"].calls == 3
+
+
+def test_dispatcher_respects_retry_budget():
+    """
+    Test that requests aren't retried once the retry budget is spent.
+    """
+    providers = {"primary": FakeProvider("primary", [503] * 3)}
+    budget = RetryBudget(ratio=0, min_per_second=0)
+
+    response, _ = asyncio.run(
+        dispatcher(budget=budget).complete(providers, [PRIMARY], {})
+    )
+
+    assert response.status_code == 503
+    assert providers["primary"].calls == 1
+
+
+def test_dispatcher_gives_up_on_long_retry_after():
+    """
+    Test that requests aren't retried when the provider asks for a long wait.
+    """
+    providers = {"primary": FakeProvider("primary", [(503, {"retry-after": "60"})])}
+
+    response, _ = asyncio.run(dispatcher().complete(providers, [PRIMARY], {}))
+
+    assert response.status_code == 503
+    assert providers["primary"].calls == 1
+
+
+def test_dispatcher_leaves_throttled_requests_to_admission():
+    """
+    Test that throttled requests are returned without retries, so only the
+    admission scheduler sends them again.
+    """
+    providers = {
+        "primary": FakeProvider("primary", [429]),
+        "secondary": FakeProvider("secondary", [429]),
+    }
+
+    response, _ = asyncio.run(
+        dispatcher().complete(providers, [PRIMARY, SECONDARY], {})
+    )
+
+    assert response.status_code == 429
+    assert providers["primary"].calls + providers["secondary"].calls == 1
+
+
+def test_dispatcher_rejects_requests_with_open_circuits():
+    """
+    Test that no request is sent while the circuits of all providers are open.
+    """
+    providers = {"primary": FakeProvider("primary", [500] * 2)}
+    dispatch = dispatcher(failure_threshold=2, policy=RetryPolicy(max_attempts=1))
+
+    for _ in range(2):
+        asyncio.run(dispatch.complete(providers, [PRIMARY], {}))
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(dispatch.complete(providers, [PRIMARY], {}))
+
+    assert providers["primary"].calls == 2
+
+
+def test_dispatcher_ends_probe_failing_with_other_errors(clock):
+    """
+    Test that a probe failing with an error other than a transport error
+    doesn't keep the circuit half open forever.
+
+    Args:
+        clock: The clock used by the resilience module
+    """
+    providers = {"primary": FakeProvider("primary", [500, httpx.DecodingError("gzip")])}
+    dispatch = dispatcher(
+        failure_threshold=1, reset_timeout=30, policy=RetryPolicy(max_attempts=1)
+    )
+    asyncio.run(dispatch.complete(providers, [PRIMARY], {}))
+    clock.now += 30
+
+    with pytest.raises(httpx.DecodingError):
+        asyncio.run(dispatch.complete(providers, [PRIMARY], {}))
+
+    assert dispatch.breaker("primary").state == CircuitState.OPEN
+
+    clock.now += 30
+    response, _ = asyncio.run(dispatch.complete(providers, [PRIMARY], {}))
+
+    assert response.status_code == 200
+
+
+def test_dispatcher_closes_retried_streams():
+    """
+    Test that streams are retried before they start, closing failed responses.
+    """
+    providers = {"primary": FakeProvider("primary", [502])}
+
+    response, _ = asyncio.run(dispatcher().open_stream(providers, [PRIMARY], {}))
+
+    assert response.status_code == 200
+    assert providers["primary"].calls == 2
+    assert providers["primary"].closed == 1
+
+
+def test_dispatcher_hedges_slow_requests():
+    """
+    Test that a slow request is hedged and the faster response wins.
+    """
+    providers = {"primary": FakeProvider("primary")}
+    dispatch = dispatcher(hedge_percentile=0.95, min_hedge_delay=0.01)
+
+    async def run():
+        for _ in range(20):
+            await dispatch.complete(providers, [PRIMARY], {})
+
+        providers["primary"].delays = [10]
+        return await dispatch.complete(providers, [PRIMARY], {})
+
+    started_at = time.monotonic()
+    response, _ = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert providers["primary"].calls == 22
+    assert time.monotonic() - started_at < 5
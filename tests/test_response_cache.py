@@ -0,0 +1,145 @@
+"""Tests for the cache of deterministic responses."""
+
+import asyncio
+import time
+import uuid
+
+
+from symbiosis.catalog import ModelEntry
+from symbiosis.responsecache import (
+    CachedResponse,
+    ResponseCache,
+    ResponseCacheStore,
+    ResponseRecorder,
+    cache_key,
+    replay_stream,
+)
+
+PROJECT_ID = uuid.uuid4()
+MODEL = ModelEntry(alias="gpt-4o", provider="openai", deployment="gpt-4o-0806")
+
+
+class MemoryStore(ResponseCacheStore):
+    """Shared store keeping responses in a dictionary."""
+
+    def __init__(self):
+        self.responses = {}
+        self.failing = False
+
+    async def get(self, key):
+        if self.failing:
+            raise ConnectionRefusedError
+
+        return self.responses.get(key)
+
+    async def set(self, key, response):
+        self.responses[key] = response
+
+
+def create_response(content=b"{}", ttl=60):
+    """
+    Create a cached response.
+
+    Args:
+        content: The body of the response
+        ttl: Seconds until the response expires
+
+    Returns:
+        CachedResponse: The response
+    """
+    return CachedResponse(
+        content=content,
+        media_type="application/json",
+        streamed=False,
+        prompt_tokens=10,
+        completion_tokens=5,
+        expires_at=time.time() + ttl,
+    )
+
+
+def test_cache_key_ignores_field_order():
+    """
+    Test that the key depends on the content of the body, not its layout.
+    """
+    first = {"model": "gpt-4o", "temperature": 0, "messages": [{"role": "user"}]}
+    second = {"messages": [{"role": "user"}], "temperature": 0.0, "model": "gpt-4o"}
+
+    assert cache_key(PROJECT_ID, MODEL, first) == cache_key(PROJECT_ID, MODEL, second)
+    assert cache_key(uuid.uuid4(), MODEL, first) != cache_key(PROJECT_ID, MODEL, first)
+
+
+def test_cache_key_requires_deterministic_request():
+    """
+    Test that requests that sample the completion aren't cacheable.
+    """
+    assert cache_key(PROJECT_ID, MODEL, {"messages": []}) is None
+    assert cache_key(PROJECT_ID, MODEL, {"temperature": 1, "messages": []}) is None
+    assert cache_key(PROJECT_ID, MODEL, {"temperature": 0, "n": 2}) is None
+
+
+def test_replay_stream_yields_events():
+    """
+    Test that a cached stream is replayed one event at a time.
+    """
+
+    async def replay():
+        return [event async for event in replay_stream(b"data: 1\n\ndata: 2\n\n")]
+
+    assert asyncio.run(replay()) == [b"data: 1\n\n", b"data: 2\n\n"]
+
+
+def test_recorder_only_keeps_complete_small_responses():
+    """
+    Test that incomplete and oversized streams aren't recorded.
+    """
+    recorder = ResponseRecorder(max_size=8)
+    recorder.feed(b"data:")
+
+    assert recorder.content is None
+
+    recorder.finish()
+
+    assert recorder.content == b"data:"
+
+    recorder.feed(b" too long")
+
+    assert recorder.content is None
+
+
+def test_cache_reads_through_to_shared_store():
+    """
+    Test that responses of other replicas are found in the shared store.
+    """
+    store = MemoryStore()
+    store.responses["key"] = create_response()
+    cache = ResponseCache(store=store)
+
+    assert asyncio.run(cache.get("key")) == store.responses["key"]
+
+    store.responses.clear()
+
+    assert asyncio.run(cache.get("key")) is not None
+
+
+def test_cache_treats_store_failures_as_miss():
+    """
+    Test that an unavailable shared store doesn't fail requests.
+    """
+    store = MemoryStore()
+    store.failing = True
+    cache = ResponseCache(store=store)
+
+    assert asyncio.run(cache.get("key")) is None
+
+
+def test_cache_skips_large_and_expires_old_responses():
+    """
+    Test that responses over the size limit or past their TTL aren't served.
+    """
+    cache = ResponseCache(max_entry_size=4)
+
+    asyncio.run(cache.set("large", create_response(content=b"12345")))
+    asyncio.run(cache.set("expired", create_response(ttl=-1)))
+
+    assert asyncio.run(cache.get("large")) is None
+    assert asyncio.run(cache.get("expired")) is None
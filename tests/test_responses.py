@@ -0,0 +1,60 @@
+"""Tests for the JSON responses of the gateway."""
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from symbiosis.server.responses import ORJSONResponse, http_exception_handler
+
+
+def create_client():
+    """
+    Create a test client for an app configured like the gateway.
+
+    Returns:
+        TestClient: Client for an app with orjson responses
+    """
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_exception_handler(HTTPException, http_exception_handler)
+
+    @app.get("/completion")
+    def completion():
+        return {"choices": [{"message": {"content": "Grüße"}}]}
+
+    @app.get("/throttled")
+    def throttled():
+        raise HTTPException(
+            status_code=429, detail="Too many requests", headers={"Retry-After": "3"}
+        )
+
+    @app.get("/not-modified")
+    def not_modified():
+        raise HTTPException(status_code=304)
+
+    return TestClient(app)
+
+
+def test_default_response_is_encoded_with_orjson():
+    """
+    Test that returned content is encoded as compact UTF-8 JSON.
+    """
+    response = create_client().get("/completion")
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == '{"choices":[{"message":{"content":"Grüße"}}]}'.encode()
+
+
+def test_http_exceptions_keep_detail_and_headers():
+    """
+    Test that errors respond like the default FastAPI handler.
+    """
+    client = create_client()
+    response = client.get("/throttled")
+
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests"}
+    assert response.headers["retry-after"] == "3"
+
+    response = client.get("/not-modified")
+
+    assert response.status_code == 304
+    assert response.content == b""
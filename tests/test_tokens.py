@@ -0,0 +1,189 @@
+"""Tests for counting the tokens of requests and responses."""
+
+import json
+import threading
+import time
+
+from symbiosis.providers.tokens import (
+    StreamingUsageCounter,
+    TokenizerRegistry,
+    TokenUsage,
+    count_prompt_tokens,
+    estimate_tokens,
+    parse_usage,
+)
+
+
+def count_words(text):
+    """
+    Count the words of a text, standing in for a tokenizer.
+
+    Args:
+        text: The text
+
+    Returns:
+        int: The number of words
+    """
+    return len(text.split())
+
+
+def sse_event(data):
+    """
+    Encode a Server-Sent Event with JSON data.
+
+    Args:
+        data: The data of the event
+
+    Returns:
+        bytes: The encoded event
+    """
+    return f"data: {json.dumps(data)}\n\n".encode()
+
+
+def test_count_prompt_tokens():
+    """
+    Test that prompt tokens include the overhead of the chat format.
+    """
+    body = {
+        "messages": [
+            {"role": "system", "content": "Be brief"},
+            {"role": "user", "content": [{"type": "text", "text": "Hello there"}]},
+        ]
+    }
+
+    assert count_prompt_tokens(body, count_words) == 3 + 2 * 3 + 4
+
+
+def test_parse_usage_prefers_reported_usage():
+    """
+    Test that the usage reported by the provider is used when available.
+    """
+    reported = json.dumps(
+        {"usage": {"prompt_tokens": 12, "completion_tokens": 34}}
+    ).encode()
+    unreported = json.dumps(
+        {"choices": [{"message": {"content": "one two three"}}]}
+    ).encode()
+
+    assert parse_usage(reported, 1, count_words) == TokenUsage(12, 34)
+    assert parse_usage(unreported, 5, count_words) == TokenUsage(5, 3)
+
+
+def test_parse_usage_counts_choices_without_message():
+    """
+    Test that choices whose message is null count no completion tokens.
+    """
+    content = json.dumps(
+        {
+            "choices": [
+                {"message": None, "finish_reason": "content_filter"},
+                {"message": {"content": "one two"}},
+            ]
+        }
+    ).encode()
+
+    assert parse_usage(content, 5, count_words) == TokenUsage(5, 2)
+
+
+def test_streaming_counter_handles_split_events():
+    """
+    Test that completion tokens are counted across arbitrary chunk boundaries.
+    """
+    stream = b"".join(
+        [
+            sse_event({"choices": [{"delta": {"role": "assistant"}}]}),
+            sse_event({"choices": [{"delta": {"content": "Hello big"}}]}),
+            sse_event({"choices": [{"delta": {"content": " world"}}]}),
+            b"data: [DONE]\n\n",
+        ]
+    )
+    counter = StreamingUsageCounter(prompt_tokens=7, count=count_words)
+
+    for start in range(0, len(stream), 5):
+        counter.feed(stream[start : start + 5])
+
+    assert counter.usage == TokenUsage(prompt_tokens=7, completion_tokens=3)
+
+
+def test_streaming_counter_prefers_reported_usage():
+    """
+    Test that usage reported in the final event replaces the counted tokens.
+    """
+    counter = StreamingUsageCounter(prompt_tokens=7, count=count_words)
+    counter.feed(sse_event({"choices": [{"delta": {"content": "Hi"}}]}))
+    usage = {"prompt_tokens": 9, "completion_tokens": 1}
+    counter.feed(sse_event({"choices": [], "usage": usage}))
+
+    assert counter.usage == TokenUsage(prompt_tokens=9, completion_tokens=1)
+
+
+def wait_for_counter(registry, model, estimate):
+    """
+    Wait until the registry stops returning the estimating counter.
+
+    Args:
+        registry: The tokenizer registry
+        model: The name of the model
+        estimate: The counter used while the tokenizer loads
+
+    Returns:
+        TokenCounter: The counter of the loaded tokenizer
+    """
+    deadline = time.monotonic() + 5
+
+    while registry.counter(model) is estimate and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    return registry.counter(model)
+
+
+def test_registry_estimates_until_tokenizer_is_loaded():
+    """
+    Test that tokens are estimated while the tokenizer loads in the background.
+    """
+    release = threading.Event()
+    loaded = []
+
+    class Encoding:
+        def encode_ordinary(self, text):
+            return text.split()
+
+    def load(name):
+        release.wait()
+        loaded.append(name)
+        return Encoding()
+
+    registry = TokenizerRegistry(load=load)
+    estimate = registry.counter("gpt-4o")
+
+    assert estimate is estimate_tokens
+    assert registry.counter("gpt-4o")("a b c") == 2
+
+    release.set()
+    counter = wait_for_counter(registry, "gpt-4o", estimate)
+
+    assert counter("a b c") == 3
+    assert loaded == ["o200k_base"]
+
+
+def test_registry_keeps_estimating_when_loading_fails():
+    """
+    Test that a tokenizer that fails to load falls back to estimating tokens.
+    """
+    attempts = []
+
+    def load(name):
+        attempts.append(name)
+        msg = "No network access"
+        raise OSError(msg)
+
+    registry = TokenizerRegistry(load=load)
+    registry.counter("my-custom-model")
+
+    deadline = time.monotonic() + 5
+
+    while not attempts and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert registry.counter("my-custom-model")("abcdefgh") == 2
+    assert attempts == ["o200k_base"]
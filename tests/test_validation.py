@@ -0,0 +1,181 @@
+"""Tests for the caching behavior of the token validator."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import pytest
+
+from symbiosis.auth.validation import TokenValidator
+
+
+def test_validate_reuses_cached_configuration_and_keys(oidc_stub):
+    """
+    Test that repeated validations don't contact the identity provider.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+    """
+    validator = TokenValidator(discovery_url=oidc_stub.discovery_url)
+
+    for _ in range(5):
+        claims = validator.validate(oidc_stub.issue_token())
+        assert claims["sub"] == "test-user"
+
+    assert oidc_stub.hits["/.well-known/openid-configuration"] == 1
+    assert oidc_stub.hits["/jwks"] == 1
+
+
+def test_validate_refetches_keys_once_for_unknown_kid(oidc_stub):
+    """
+    Test that concurrent tokens with a new key ID share a single key refetch.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+    """
+    validator = TokenValidator(
+        discovery_url=oidc_stub.discovery_url, min_refetch_interval=0
+    )
+    validator.validate(oidc_stub.issue_token())
+
+    oidc_stub.rotate_key()
+    token = oidc_stub.issue_token()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(validator.validate, [token] * 16))
+
+    assert all(claims["sub"] == "test-user" for claims in results)
+    assert oidc_stub.hits["/jwks"] == 2
+
+
+def test_validate_rejects_unknown_kid_without_refetch_storm(oidc_stub):
+    """
+    Test that unknown key IDs are rate limited to protect the identity provider.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+    """
+    validator = TokenValidator(discovery_url=oidc_stub.discovery_url)
+    validator.validate(oidc_stub.issue_token())
+
+    token = jwt.encode(
+        {"sub": "attacker"}, "secret", algorithm="HS256", headers={"kid": "unknown"}
+    )
+
+    for _ in range(10):
+        with pytest.raises(jwt.InvalidTokenError):
+            validator.validate(token)
+
+    assert oidc_stub.hits["/jwks"] == 1
+
+
+def test_background_refresh_keeps_cache_warm(oidc_stub):
+    """
+    Test that the background refresh fetches the configuration before it expires.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+    """
+    validator = TokenValidator(discovery_url=oidc_stub.discovery_url, config_ttl=1)
+
+    async def run_refresh():
+        await validator.start()
+        await asyncio.sleep(1.5)
+        await validator.close()
+
+    asyncio.run(run_refresh())
+
+    assert oidc_stub.hits["/.well-known/openid-configuration"] >= 2
+    assert oidc_stub.hits["/jwks"] >= 2
+
+    claims = validator.validate(oidc_stub.issue_token())
+    assert claims["sub"] == "test-user"
+
+
+def test_avalidate_reuses_cached_configuration_and_keys(oidc_stub):
+    """
+    Test that the async validation path caches the configuration and keys.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+    """
+    validator = TokenValidator(discovery_url=oidc_stub.discovery_url)
+
+    async def validate_concurrently():
+        tokens = [oidc_stub.issue_token() for _ in range(10)]
+        results = await asyncio.gather(*map(validator.avalidate, tokens))
+        await validator.close()
+        return results
+
+    results = asyncio.run(validate_concurrently())
+
+    assert all(claims["sub"] == "test-user" for claims in results)
+    assert oidc_stub.hits["/.well-known/openid-configuration"] == 1
+    assert oidc_stub.hits["/jwks"] == 1
+
+
+def test_avalidate_rejects_invalid_token(oidc_stub):
+    """
+    Test that the async validation path rejects malformed tokens.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+    """
+    validator = TokenValidator(discovery_url=oidc_stub.discovery_url)
+
+    async def validate_invalid_token():
+        try:
+            await validator.avalidate("invalid.token.here")
+        finally:
+            await validator.close()
+
+    with pytest.raises(jwt.InvalidTokenError):
+        asyncio.run(validate_invalid_token())
+
+
+def test_validate_skips_verification_for_cached_token(oidc_stub, monkeypatch):
+    """
+    Test that a repeated token is served from the verified-token cache.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    validator = TokenValidator(discovery_url=oidc_stub.discovery_url)
+    token = oidc_stub.issue_token()
+
+    decode_calls = []
+    original_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decode_calls.append(kwargs)
+        return original_decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+
+    for _ in range(3):
+        assert validator.validate(token)["sub"] == "test-user"
+
+    assert len(decode_calls) == 1
+
+
+def test_key_rotation_invalidates_cached_tokens(oidc_stub):
+    """
+    Test that tokens signed with a rotated-out key are no longer accepted.
+
+    Args:
+        oidc_stub: In-process OIDC provider
+    """
+    validator = TokenValidator(
+        discovery_url=oidc_stub.discovery_url, min_refetch_interval=0
+    )
+    old_kid = oidc_stub.current_kid
+    old_token = oidc_stub.issue_token()
+    validator.validate(old_token)
+
+    oidc_stub.rotate_key()
+    del oidc_stub.keys[old_kid]
+    validator.validate(oidc_stub.issue_token())
+
+    with pytest.raises(jwt.InvalidTokenError):
+        validator.validate(old_token)
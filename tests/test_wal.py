@@ -0,0 +1,136 @@
+"""Tests for the write-ahead log."""
+
+import asyncio
+
+import pytest
+
+from symbiosis.wal import WriteAheadLog
+
+
+class Sink:
+    """Collects replayed batches, failing after a number of batches."""
+
+    def __init__(self, fail_after=None):
+        self.batches = []
+        self.fail_after = fail_after
+
+    async def write(self, batch):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            msg = "database unavailable"
+            raise OSError(msg)
+
+        self.batches.append(batch)
+
+    @property
+    def records(self):
+        return [record for batch in self.batches for record in batch]
+
+
+def test_replay_in_order_across_segments(tmp_path):
+    """
+    Test that records are replayed in order and segments are removed.
+
+    Args:
+        tmp_path: Temporary directory for the log
+    """
+    wal = WriteAheadLog("test", tmp_path, segment_size=64)
+    payloads = [f"record-{index}".encode() for index in range(20)]
+
+    for index in range(0, 20, 4):
+        wal.append(payloads[index : index + 4])
+
+    assert len(list(tmp_path.glob("*/*.wal"))) > 1
+
+    sink = Sink()
+    assert asyncio.run(wal.replay(sink.write, batch_size=3)) == 20
+
+    assert sink.records == payloads
+    assert list(tmp_path.glob("*/*")) == []
+    assert len(wal) == 0
+
+    wal.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_append_discards_records_beyond_max_size(tmp_path):
+    """
+    Test that the log doesn't grow beyond its maximum size.
+
+    Args:
+        tmp_path: Temporary directory for the log
+    """
+    wal = WriteAheadLog("test", tmp_path, max_size=50)
+
+    assert wal.append([b"x" * 20, b"y" * 20, b"z" * 20]) == 1
+    assert len(wal) <= 50
+
+
+def test_replay_resumes_after_failure(tmp_path):
+    """
+    Test that an interrupted replay continues without duplicating records.
+
+    Args:
+        tmp_path: Temporary directory for the log
+    """
+    wal = WriteAheadLog("test", tmp_path)
+    payloads = [f"record-{index}".encode() for index in range(10)]
+    wal.append(payloads)
+
+    sink = Sink(fail_after=2)
+
+    with pytest.raises(OSError, match="unavailable"):
+        asyncio.run(wal.replay(sink.write, batch_size=3))
+
+    sink.fail_after = None
+    asyncio.run(wal.replay(sink.write, batch_size=3))
+
+    assert sink.records == payloads
+
+
+def test_replay_skips_torn_record(tmp_path):
+    """
+    Test that a partially written record left by a previous run is skipped.
+
+    Args:
+        tmp_path: Temporary directory for the log
+    """
+    previous_wal = WriteAheadLog("test", tmp_path)
+    previous_wal.append([b"first", b"second"])
+    previous_wal.close()
+
+    [segment] = tmp_path.glob("*/*.wal")
+    segment.write_bytes(segment.read_bytes()[:-3])
+
+    wal = WriteAheadLog("test", tmp_path)
+    sink = Sink()
+    asyncio.run(wal.replay(sink.write))
+
+    assert sink.records == [b"first"]
+
+
+def test_replay_takes_over_segments_of_closed_logs_only(tmp_path):
+    """
+    Test that logs sharing a directory never replay each other's open
+    segments, but take over the segments of logs that were closed.
+
+    Args:
+        tmp_path: Temporary directory shared by the logs
+    """
+    open_wal = WriteAheadLog("test", tmp_path)
+    closed_wal = WriteAheadLog("test", tmp_path)
+    wal = WriteAheadLog("test", tmp_path)
+
+    open_wal.append([b"open"])
+    closed_wal.append([b"closed-1", b"closed-2"])
+    closed_wal.close()
+    wal.append([b"own"])
+
+    sink = Sink()
+    assert asyncio.run(wal.replay(sink.write)) == 3
+
+    assert sorted(sink.records) == [b"closed-1", b"closed-2", b"own"]
+    assert not closed_wal._owned.exists()
+
+    open_wal.append([b"open-2"])
+    assert asyncio.run(open_wal.replay(sink.write)) == 2
+    assert sink.records[-2:] == [b"open", b"open-2"]